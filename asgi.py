@@ -0,0 +1,213 @@
+# ASGI entrypoint for the async request path: one event loop multiplexes many
+# pipelines, with LLM and GitHub calls awaited instead of holding a thread.
+#
+#   uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+import asyncio
+import json
+import time
+from urllib.parse import parse_qs
+
+from utils import (
+    validate_request,
+    format_pipeline_error,
+    create_job,
+    new_job_id,
+    run_job_async,
+    get_job,
+    accepted_response,
+    duplicate_response,
+    claim_request,
+    release_request,
+    get_request_record,
+    request_stale,
+    start_dispatcher,
+    warm_clients,
+    collect_stats,
+    render_metrics,
+    STEP_DURATION,
+)
+from utils.config import (
+    ASYNC_JOBS,
+    ASYNC_MAX_JOBS,
+    IDEMPOTENCY_WAIT_TIMEOUT,
+    close_async_openai_client,
+)
+from utils.http_transport import close_async_clients
+
+_running = {}
+_DUPLICATE_POLL_INTERVAL = 2.0
+
+
+async def _send(send, status, body, content_type="application/json"):
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode()
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", content_type.encode()),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+async def _wait_for_duplicate(job_id, data, claim_id):
+    # Same contract as wait_for_duplicate, but without holding an executor thread:
+    # awaits the original job's task when it runs on this loop, otherwise polls
+    # the store with short reads between sleeps
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        task = _running.get(job_id)
+        if task is not None:
+            await asyncio.wait({task}, timeout=max(0.0, deadline - time.monotonic()))
+        job = get_job(job_id)
+        if job is not None:
+            return duplicate_response(job_id, job=job)
+
+        record = await asyncio.to_thread(get_request_record, data)
+        if record is None or request_stale(record):
+            state, previous = await asyncio.to_thread(claim_request, data, claim_id)
+            if state == "new":
+                return None
+            if state == "completed":
+                return 200, dict(previous, idempotent_replay=True)
+            # Another duplicate took the request over first; follow that job instead
+            job_id = previous["job_id"]
+            continue
+        if record["status"] == "completed" or time.monotonic() >= deadline:
+            return duplicate_response(job_id, record=record)
+        await asyncio.sleep(_DUPLICATE_POLL_INTERVAL)
+
+
+async def handle_request(scope, receive):
+    try:
+        data = json.loads(await _read_body(receive) or b"null")
+    except ValueError:
+        data = None
+    if not data:
+        return 400, {"status": "error", "message": "No JSON data provided"}
+
+    try:
+        return await _process(scope, data)
+    except Exception as e:
+        print(f"Error processing request: {str(e)}")
+        import traceback
+
+        traceback.print_exc()
+        return 500, format_pipeline_error(e, data)
+
+
+async def _process(scope, data):
+    started = time.perf_counter()
+    is_valid, message = validate_request(data)
+    STEP_DURATION.observe(
+        time.perf_counter() - started,
+        step="validation",
+        stage="validation",
+        outcome="ok" if is_valid else "error",
+    )
+    if not is_valid:
+        return 400, {"status": "error", "message": message}
+
+    query = parse_qs(scope.get("query_string", b"").decode())
+    async_mode = ASYNC_JOBS or query.get("async", [""])[0].lower() in ("1", "true", "yes")
+
+    job_id = new_job_id()
+    state, previous = await asyncio.to_thread(claim_request, data, job_id)
+    if state == "completed":
+        print(f"Duplicate request for task: {data['task']}, returning stored result")
+        return 200, dict(previous, idempotent_replay=True)
+    if state == "in_flight":
+        print(f"Duplicate request for task: {data['task']}, attaching to job {previous['job_id']}")
+        if async_mode:
+            return 200, accepted_response(previous["job_id"], data)
+        reply = await _wait_for_duplicate(previous["job_id"], data, job_id)
+        if reply is not None:
+            return reply
+        print(f"Job {previous['job_id']} left no result, running task: {data['task']} as job {job_id}")
+
+    if len(_running) >= ASYNC_MAX_JOBS:
+        await asyncio.to_thread(release_request, data, job_id)
+        return 503, {"status": "error", "message": "Job queue is full, retry later"}
+
+    create_job(data, job_id)
+    task = asyncio.ensure_future(run_job_async(job_id))
+    _running[job_id] = task
+    task.add_done_callback(lambda _: _running.pop(job_id, None))
+
+    if async_mode:
+        print(f"Queued job {job_id} for task: {data['task']}, round: {data['round']}")
+        return 200, accepted_response(job_id, data)
+
+    # A dropped client connection must not cancel the pipeline it started
+    job = await asyncio.shield(task)
+    if job["status"] == "failed":
+        return 500, job["error"]
+    return 200, job["result"]
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Resume evaluation notifications left pending by a previous process
+            start_dispatcher()
+            warm_clients()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _running:
+                print(f"Waiting for {len(_running)} running jobs to finish...")
+                await asyncio.wait(set(_running.values()))
+            await close_async_clients()
+            await close_async_openai_client()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    method, path = scope["method"], scope["path"]
+    if path == "/api-endpoint" and method == "POST":
+        status, body = await handle_request(scope, receive)
+        await _send(send, status, body)
+    elif path.startswith("/jobs/") and method == "GET":
+        job = get_job(path[len("/jobs/"):])
+        if job is None:
+            await _send(send, 404, {"status": "error", "message": "Job not found"})
+        else:
+            await _send(send, 200, job)
+    elif path == "/stats" and method == "GET":
+        await _send(send, 200, await asyncio.to_thread(collect_stats))
+    elif path == "/metrics" and method == "GET":
+        metrics = await asyncio.to_thread(render_metrics)
+        await _send(send, 200, metrics.encode(), "text/plain; version=0.0.4")
+    elif path == "/health" and method == "GET":
+        await _send(send, 200, {"status": "healthy"})
+    elif path == "/" and method == "GET":
+        await _send(
+            send,
+            200,
+            {
+                "message": "Welcome to LLM Code Deployment API",
+                "endpoints": ["/api-endpoint (POST)", "/jobs/<job_id> (GET)", "/stats (GET)", "/metrics (GET)", "/health (GET)"],
+            },
+        )
+    else:
+        await _send(send, 404, {"status": "error", "message": "Not found"})
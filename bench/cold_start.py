@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# Cold-start benchmark: imports main in fresh interpreters, as a serverless
+# instance would, and times the import and the first /health request.
+#
+#   python -m bench.cold_start --runs 10 --max-ms 500
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from typing import Any, Dict, List
+
+# Modules that must not be loaded before the first request needs them
+HEAVY_MODULES = ("openai", "github")
+
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+response = main.app.test_client().get("/health")
+answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_health_ms": (answered - imported) * 1000,
+    "status": response.status_code,
+    "heavy_loaded": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def probe(repo_root: str) -> Dict[str, Any]:
+    env = dict(
+        os.environ,
+        STATE_DIR=tempfile.mkdtemp(prefix="llm-deploy-cold-"),
+        # Measure the import path alone, without the background client warmup racing it
+        WARM_CLIENTS="false",
+        PYTHONDONTWRITEBYTECODE="1",
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE % (HEAVY_MODULES,)],
+        cwd=repo_root,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "median": round(statistics.median(values), 1),
+        "min": round(min(values), 1),
+        "max": round(max(values), 1),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of main.app")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument("--max-ms", type=float, help="fail if the median import time exceeds this")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    samples = [probe(repo_root) for _ in range(args.runs)]
+    heavy = sorted({m for s in samples for m in s["heavy_loaded"]})
+    report = {
+        "runs": args.runs,
+        "import_ms": summarize([s["import_ms"] for s in samples]),
+        "first_health_ms": summarize([s["first_health_ms"] for s in samples]),
+        "health_status": sorted({s["status"] for s in samples}),
+        "heavy_modules_loaded": heavy,
+    }
+
+    print(f"import main:    {report['import_ms']['median']} ms median "
+          f"(min {report['import_ms']['min']}, max {report['import_ms']['max']}) over {args.runs} runs")
+    print(f"first /health:  {report['first_health_ms']['median']} ms median")
+    if heavy:
+        print(f"Warning: {', '.join(heavy)} imported at startup")
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+
+    over_budget = args.max_ms is not None and report["import_ms"]["median"] > args.max_ms
+    if over_budget:
+        print(f"Median import time exceeds the {args.max_ms} ms budget")
+    return 1 if over_budget or heavy or report["health_status"] != [200] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# Local stand-in for the GitHub REST, Git Data and Pages endpoints the deploy path uses
+
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+
+def _sha(kind: str, data: bytes) -> str:
+    return hashlib.sha1(f"{kind} {len(data)}\0".encode() + data).hexdigest()
+
+
+class FakeGitHub:
+    def __init__(
+        self,
+        login: str = "bench-user",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        pages_build_seconds: float = 1.0,
+    ):
+        self.login = login
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.pages_build_seconds = pages_build_seconds
+        self.base_url = ""
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self.notifications = 0
+        self.blobs: Dict[str, bytes] = {}
+        self.trees: Dict[str, Dict[str, str]] = {}
+        self.commits: Dict[str, Dict[str, Any]] = {}
+        self.repos: Dict[str, Dict[str, Any]] = {}
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _put_blob(self, data: bytes) -> str:
+        sha = _sha("blob", data)
+        self.blobs[sha] = data
+        return sha
+
+    def _put_tree(self, entries: Dict[str, str]) -> str:
+        sha = _sha("tree", json.dumps(sorted(entries.items())).encode())
+        self.trees[sha] = dict(entries)
+        return sha
+
+    def _put_commit(self, message: str, tree: str, parents) -> str:
+        body = json.dumps([message, tree, parents, time.time()]).encode()
+        sha = _sha("commit", body)
+        self.commits[sha] = {"message": message, "tree": tree, "parents": list(parents)}
+        return sha
+
+    def _repo_json(self, full_name: str) -> Dict[str, Any]:
+        owner, name = full_name.split("/")
+        return {
+            "id": abs(hash(full_name)) % 10**9,
+            "name": name,
+            "full_name": full_name,
+            "owner": {"login": owner, "type": "User"},
+            "private": False,
+            "default_branch": "main",
+            "url": f"{self.base_url}/repos/{full_name}",
+            "html_url": f"{self.base_url}/html/{full_name}",
+        }
+
+    def _commit_json(self, full_name: str, sha: str) -> Dict[str, Any]:
+        commit = self.commits[sha]
+        repo_url = f"{self.base_url}/repos/{full_name}"
+        return {
+            "sha": sha,
+            "url": f"{repo_url}/git/commits/{sha}",
+            "message": commit["message"],
+            "tree": {"sha": commit["tree"], "url": f"{repo_url}/git/trees/{commit['tree']}"},
+            "parents": [{"sha": p, "url": f"{repo_url}/git/commits/{p}"} for p in commit["parents"]],
+        }
+
+    def _tree_json(self, full_name: str, sha: str) -> Dict[str, Any]:
+        return {
+            "sha": sha,
+            "url": f"{self.base_url}/repos/{full_name}/git/trees/{sha}",
+            "truncated": False,
+            "tree": [
+                {"path": path, "mode": "100644", "type": "blob", "sha": blob, "size": len(self.blobs[blob])}
+                for path, blob in sorted(self.trees[sha].items())
+            ],
+        }
+
+    def _ref_json(self, full_name: str, branch: str) -> Dict[str, Any]:
+        sha = self.repos[full_name]["refs"][branch]
+        return {
+            "ref": f"refs/heads/{branch}",
+            "url": f"{self.base_url}/repos/{full_name}/git/refs/heads/{branch}",
+            "object": {"sha": sha, "type": "commit", "url": f"{self.base_url}/repos/{full_name}/git/commits/{sha}"},
+        }
+
+    def _create_repo(self, name: str) -> Tuple[int, Any]:
+        full_name = f"{self.login}/{name}"
+        if full_name in self.repos:
+            return 422, {"message": "Repository creation failed.", "errors": [{"message": "name already exists on this account"}]}
+        tree = self._put_tree({"README.md": self._put_blob(f"# {name}\n".encode())})
+        commit = self._put_commit("Initial commit", tree, [])
+        self.repos[full_name] = {"refs": {"main": commit}, "pages": None, "builds": []}
+        return 201, self._repo_json(full_name)
+
+    def _queue_build(self, full_name: str):
+        repo = self.repos[full_name]
+        if repo["pages"] is not None and "main" in repo["refs"]:
+            repo["builds"].append({"commit": repo["refs"]["main"], "queued_at": time.time()})
+
+    def _latest_build(self, full_name: str) -> Optional[Dict[str, Any]]:
+        builds = self.repos[full_name]["builds"]
+        if not builds:
+            return None
+        build = builds[-1]
+        done = time.time() - build["queued_at"] >= self.pages_build_seconds
+        return {"commit": build["commit"], "status": "built" if done else "building", "error": {"message": None}}
+
+    def _site_live(self, full_name: str) -> bool:
+        return any(
+            time.time() - build["queued_at"] >= self.pages_build_seconds
+            for build in self.repos.get(full_name, {}).get("builds", [])
+        )
+
+    def handle(self, method: str, path: str, query: Dict[str, Any], body: Any) -> Tuple[int, Any]:
+        with self.lock:
+            return self._route(method, path, query, body)
+
+    def _route(self, method: str, path: str, query, body) -> Tuple[int, Any]:
+        if path == "/user" and method == "GET":
+            return 200, {"login": self.login, "id": 1, "type": "User", "url": f"{self.base_url}/user"}
+        if path == "/user/repos" and method == "POST":
+            return self._create_repo(body["name"])
+        if method == "POST" and path == "/evaluate":
+            self.notifications += 1
+            return 200, {"ok": True}
+
+        m = re.match(r"^/pages/([^/]+)/([^/]+)/?$", path)
+        if m:
+            live = self._site_live(f"{m.group(1)}/{m.group(2)}")
+            return (200, "<html>live</html>") if live else (404, "Not Found")
+
+        m = re.match(r"^/repos/([^/]+)/([^/]+)(/.*)?$", path)
+        if not m:
+            return 404, {"message": "Not Found"}
+        full_name, rest = f"{m.group(1)}/{m.group(2)}", m.group(3) or ""
+        if full_name not in self.repos:
+            return 404, {"message": "Not Found"}
+        repo = self.repos[full_name]
+
+        if rest == "" and method == "GET":
+            return 200, self._repo_json(full_name)
+
+        m = re.match(r"^/git/refs?/heads/(.+)$", rest)
+        if m:
+            branch = m.group(1)
+            if method == "GET":
+                if branch not in repo["refs"]:
+                    return 404, {"message": "Not Found"}
+                return 200, self._ref_json(full_name, branch)
+            if method == "PATCH":
+                repo["refs"][branch] = body["sha"]
+                if branch == "main":
+                    self._queue_build(full_name)
+                return 200, self._ref_json(full_name, branch)
+        if rest == "/git/refs" and method == "POST":
+            branch = body["ref"].rsplit("/", 1)[-1]
+            repo["refs"][branch] = body["sha"]
+            if branch == "main":
+                self._queue_build(full_name)
+            return 201, self._ref_json(full_name, branch)
+
+        m = re.match(r"^/git/commits/([0-9a-f]+)$", rest)
+        if m and method == "GET":
+            return 200, self._commit_json(full_name, m.group(1))
+        if rest == "/git/commits" and method == "POST":
+            sha = self._put_commit(body["message"], body["tree"], body.get("parents", []))
+            return 201, self._commit_json(full_name, sha)
+
+        m = re.match(r"^/git/trees/([0-9a-f]+)$", rest)
+        if m and method == "GET":
+            return 200, self._tree_json(full_name, m.group(1))
+        if rest == "/git/trees" and method == "POST":
+            entries = dict(self.trees.get(body.get("base_tree"), {}))
+            for element in body["tree"]:
+                if element.get("content") is not None:
+                    entries[element["path"]] = self._put_blob(element["content"].encode("utf-8"))
+                elif element.get("sha") is None:
+                    entries.pop(element["path"], None)
+                else:
+                    entries[element["path"]] = element["sha"]
+            return 201, self._tree_json(full_name, self._put_tree(entries))
+        if rest == "/git/blobs" and method == "POST":
+            data = body["content"]
+            raw = base64.b64decode(data) if body.get("encoding") == "base64" else data.encode("utf-8")
+            sha = self._put_blob(raw)
+            return 201, {"sha": sha, "url": f"{self.base_url}/repos/{full_name}/git/blobs/{sha}"}
+
+        m = re.match(r"^/contents/(.+)$", rest)
+        if m and method == "GET":
+            branch = (query.get("ref") or ["main"])[0]
+            commit = repo["refs"].get(branch)
+            blob = commit and self.trees[self.commits[commit]["tree"]].get(m.group(1))
+            if not blob:
+                return 404, {"message": "Not Found"}
+            return 200, {
+                "type": "file",
+                "path": m.group(1),
+                "sha": blob,
+                "encoding": "base64",
+                "content": base64.b64encode(self.blobs[blob]).decode("ascii"),
+            }
+
+        if rest == "/pages":
+            if method == "GET":
+                if repo["pages"] is None:
+                    return 404, {"message": "Not Found"}
+                return 200, {"source": repo["pages"], "status": "built"}
+            if method in ("POST", "PATCH"):
+                created = repo["pages"] is None
+                repo["pages"] = body["source"]
+                if created:
+                    self._queue_build(full_name)
+                return (201 if created else 204), {"source": repo["pages"]}
+        if rest == "/pages/builds/latest" and method == "GET":
+            build = self._latest_build(full_name)
+            return (200, build) if build else (404, {"message": "Not Found"})
+        if rest == "/pages/builds" and method == "POST":
+            self._queue_build(full_name)
+            return 201, {"status": "queued"}
+
+        return 404, {"message": f"Fake GitHub does not implement {method} {path}"}
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeGitHub":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _serve(self):
+                parts = urlsplit(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                body = json.loads(raw) if raw else {}
+                with fake.lock:
+                    fake.calls[f"{self.command} {_route_name(parts.path)}"] += 1
+
+                delay = fake.latency + random.uniform(0, fake.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if fake.error_rate and random.random() < fake.error_rate and parts.path != "/evaluate":
+                    status, payload = 502, {"message": "Injected failure"}
+                else:
+                    status, payload = fake.handle(self.command, parts.path, parse_qs(parts.query), body)
+
+                if isinstance(payload, str):
+                    data, content_type = payload.encode("utf-8"), "text/html"
+                else:
+                    data, content_type = json.dumps(payload).encode("utf-8"), "application/json"
+                headers = {
+                    "Content-Type": content_type,
+                    "X-RateLimit-Limit": "5000",
+                    "X-RateLimit-Remaining": "4999",
+                    "X-RateLimit-Reset": str(int(time.time()) + 3600),
+                }
+                if self.command == "GET" and status == 200:
+                    etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+                    headers["ETag"] = etag
+                    if self.headers.get("If-None-Match") == etag:
+                        status, data = 304, b""
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _serve
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://{host}:{self._server.server_address[1]}"
+        threading.Thread(target=self._server.serve_forever, name="fake-github", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+def _route_name(path: str) -> str:
+    # Collapse owner/repo/SHA segments so call counts group by endpoint
+    path = re.sub(r"^/repos/[^/]+/[^/]+", "/repos/:repo", path)
+    path = re.sub(r"^/pages/[^/]+/[^/]+/?", "/pages/:site", path)
+    path = re.sub(r"/[0-9a-f]{40}", "/:sha", path)
+    return re.sub(r"/contents/.+$", "/contents/:path", path)
@@ -0,0 +1,159 @@
+# Local stand-in for the OpenAI-compatible chat completions API
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+_EXISTING_CODE = re.compile(r"```html\n(.*?)\n```", re.DOTALL)
+
+
+class FakeOpenAI:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        html_bytes: int = 4000,
+        chunk_chars: int = 200,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.html_bytes = html_bytes
+        self.chunk_chars = chunk_chars
+        self.base_url = ""
+        self.lock = threading.Lock()
+        self.calls: Counter = Counter()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def _html(self, prompt: str) -> str:
+        ids = re.findall(r"#([A-Za-z][\w-]*)", prompt)
+        elements = "\n".join(f'  <div id="{i}">0</div>' for i in dict.fromkeys(ids))
+        filler = "  <!-- " + "x" * max(0, self.html_bytes - 300) + " -->"
+        return (
+            "<!DOCTYPE html>\n<html>\n<head>\n  <title>Bench App</title>\n</head>\n<body>\n"
+            f"{elements}\n{filler}\n  <script>console.log('ready');</script>\n</body>\n</html>"
+        )
+
+    def complete(self, messages: List[Dict[str, str]]) -> Dict[str, Any]:
+        system = messages[0]["content"] if messages else ""
+        prompt = messages[-1]["content"] if messages else ""
+
+        if "documentation" in system:
+            kind, content = "readme", "# Bench App\n\nGenerated for benchmarking.\n\n## License\n\nMIT\n"
+        elif "<<<<<<< SEARCH" in prompt:
+            kind = "patch"
+            match = _EXISTING_CODE.search(prompt)
+            anchor = "</body>" if match and match.group(1).count("</body>") == 1 else "missing-anchor"
+            content = (
+                f"<<<<<<< SEARCH\n{anchor}\n=======\n"
+                f"  <p id=\"revision\">revised</p>\n{anchor}\n>>>>>>> REPLACE"
+            )
+        else:
+            kind, content = "code", self._html(prompt)
+
+        with self.lock:
+            self.calls[kind] += 1
+        return {
+            "content": content,
+            "usage": {
+                "prompt_tokens": (len(system) + len(prompt)) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(system) + len(prompt) + len(content)) // 4,
+            },
+        }
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> "FakeOpenAI":
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: Dict[str, Any]):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+
+                delay = fake.latency + random.uniform(0, fake.jitter)
+                if delay > 0:
+                    time.sleep(delay)
+                if fake.error_rate and random.random() < fake.error_rate:
+                    with fake.lock:
+                        fake.calls["error"] += 1
+                    self._send(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+                    return
+
+                result = fake.complete(body.get("messages", []))
+                model = body.get("model", "fake-model")
+                created = int(time.time())
+                if not body.get("stream"):
+                    self._send(
+                        200,
+                        {
+                            "id": "chatcmpl-bench",
+                            "object": "chat.completion",
+                            "created": created,
+                            "model": model,
+                            "choices": [
+                                {
+                                    "index": 0,
+                                    "message": {"role": "assistant", "content": result["content"]},
+                                    "finish_reason": "stop",
+                                }
+                            ],
+                            "usage": result["usage"],
+                        },
+                    )
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                content = result["content"]
+                for start in range(0, len(content), fake.chunk_chars):
+                    chunk = {
+                        "id": "chatcmpl-bench",
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"content": content[start:start + fake.chunk_chars]},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://{host}:{self._server.server_address[1]}/v1"
+        threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
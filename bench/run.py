@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# Offline benchmark: drives main.app end to end against local fake OpenAI and
+# GitHub servers, so deploy-path overhead can be measured reproducibly.
+#
+#   python -m bench.run --jobs 20 --concurrency 4 --llm-latency 0.5
+
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from bench.fake_github import FakeGitHub
+from bench.fake_openai import FakeOpenAI
+
+BENCH_SECRET = "bench-secret"
+ROUND2_BRIEF = "Add a paragraph #revision that says revised, keeping everything else working."
+_STEP_ERROR = re.compile(r"Failed at step '([^']+)'")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark of the deploy pipeline")
+    parser.add_argument("--jobs", type=int, default=10, help="tasks to deploy")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--rounds", type=int, choices=(1, 2), default=2, help="also send a round-2 revision per task")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="seconds added to every LLM response")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="extra random LLM latency, 0..N seconds")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="fraction of LLM calls answered with 500")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="seconds added to every GitHub response")
+    parser.add_argument("--github-jitter", type=float, default=0.0, help="extra random GitHub latency, 0..N seconds")
+    parser.add_argument("--github-error-rate", type=float, default=0.0, help="fraction of GitHub calls answered with 502")
+    parser.add_argument("--pages-build-seconds", type=float, default=0.5, help="time a fake Pages build takes")
+    parser.add_argument("--html-bytes", type=int, default=4000, help="size of the generated page")
+    parser.add_argument("--streaming", action="store_true", help="stream app generation")
+    parser.add_argument(
+        "--github-write-rate",
+        type=float,
+        default=100.0,
+        help="GitHub write token bucket rate; the default removes pacing, use 1 for production behaviour",
+    )
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own log output")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    return parser.parse_args(argv)
+
+
+def configure_environment(args, github: FakeGitHub, openai: FakeOpenAI, state_dir: str):
+    # utils.config reads the environment at import time, so this runs before main is imported
+    os.environ.update(
+        {
+            "GITHUB_TOKEN": "bench-token",
+            "GITHUB_USERNAME": github.login,
+            "GITHUB_API_URL": github.base_url,
+            "PAGES_URL_TEMPLATE": github.base_url + "/pages/{owner}/{repo}/",
+            "OPENAI_API_KEY": "bench-key",
+            "OPENAI_BASE_URL": openai.base_url,
+            "GEMINI_API_KEY": "",
+            "SECRET": BENCH_SECRET,
+            "STATE_DIR": state_dir,
+            "ASYNC_JOBS": "false",
+            "LLM_CACHE": "off",
+            "LLM_STREAMING": "true" if args.streaming else "false",
+            "PAGES_POLL_MIN": "0.1",
+            "PAGES_POLL_MAX": "1",
+            "GITHUB_WRITE_RATE": str(args.github_write_rate),
+            "GITHUB_WRITE_BURST": str(max(3, int(args.github_write_rate))),
+        }
+    )
+
+
+def load_payloads() -> List[Dict[str, Any]]:
+    from instructor import send_task
+
+    return [
+        value
+        for name, value in vars(send_task).items()
+        if name.startswith("test_request_") and isinstance(value, dict)
+    ]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def summarize(values: List[float]) -> Dict[str, Any]:
+    return {
+        "count": len(values),
+        "mean": round(sum(values) / len(values), 3) if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 3) if values else None,
+    }
+
+
+def run(args) -> Dict[str, Any]:
+    github = FakeGitHub(
+        latency=args.github_latency,
+        jitter=args.github_jitter,
+        error_rate=args.github_error_rate,
+        pages_build_seconds=args.pages_build_seconds,
+    ).start()
+    openai = FakeOpenAI(
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        error_rate=args.llm_error_rate,
+        html_bytes=args.html_bytes,
+    ).start()
+    state_dir = tempfile.mkdtemp(prefix="llm-deploy-bench-")
+    configure_environment(args, github, openai, state_dir)
+
+    import main
+
+    payloads = load_payloads()
+    run_id = str(int(time.time()))
+    results: List[Dict[str, Any]] = []
+    results_lock = threading.Lock()
+    local = threading.local()
+
+    def send(payload: Dict[str, Any]) -> Dict[str, Any]:
+        if not hasattr(local, "client"):
+            local.client = main.app.test_client()
+        started = time.perf_counter()
+        response = local.client.post("/api-endpoint", json=payload)
+        elapsed = time.perf_counter() - started
+        body = response.get_json(silent=True) or {}
+        failed_step = None
+        if response.status_code != 200:
+            match = _STEP_ERROR.search(str(body.get("message", "")))
+            failed_step = match.group(1) if match else f"HTTP {response.status_code}"
+        record = {
+            "round": payload["round"],
+            "status": response.status_code,
+            "seconds": elapsed,
+            "timings": body.get("timings") or {},
+            "failed_step": failed_step,
+        }
+        with results_lock:
+            results.append(record)
+        return record
+
+    def job(index: int):
+        base = payloads[index % len(payloads)]
+        task = f"bench-{run_id}-{index}-{base['task']}"[:90]
+        payload = dict(
+            base,
+            secret=BENCH_SECRET,
+            task=task,
+            round=1,
+            nonce=f"{task}-r1",
+            evaluation_url=f"{github.base_url}/evaluate",
+        )
+        if send(payload)["status"] == 200 and args.rounds == 2:
+            send(dict(payload, round=2, nonce=f"{task}-r2", brief=ROUND2_BRIEF))
+
+    print(
+        f"Running {args.jobs} job(s) x {args.rounds} round(s) at concurrency {args.concurrency} "
+        f"(state in {state_dir})",
+        file=sys.stderr,
+    )
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(job, range(args.jobs)))
+        wall = time.perf_counter() - started
+
+        # Notifications are delivered by the background outbox; give it a moment to drain
+        expected = sum(1 for r in results if r["status"] == 200)
+        deadline = time.time() + 10
+        while github.notifications < expected and time.time() < deadline:
+            time.sleep(0.1)
+
+    ok = [r for r in results if r["status"] == 200]
+    steps: Dict[str, List[float]] = defaultdict(list)
+    for r in ok:
+        for step, seconds in r["timings"].items():
+            steps[step].append(seconds)
+
+    github_calls = dict(sorted(github.calls.items()))
+    api_calls = sum(n for name, n in github.calls.items() if "/pages/:site" not in name and "/evaluate" not in name)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k != "json_path"},
+        "wall_seconds": round(wall, 3),
+        "requests": len(results),
+        "succeeded": len(ok),
+        "failed": len(results) - len(ok),
+        "failures_by_step": dict(Counter(r["failed_step"] for r in results if r["failed_step"])),
+        "throughput_rps": round(len(results) / wall, 3) if wall else None,
+        "latency": {
+            f"round{n}": summarize([r["seconds"] for r in results if r["round"] == n])
+            for n in range(1, args.rounds + 1)
+        },
+        "steps": {step: summarize(values) for step, values in sorted(steps.items())},
+        "github": {
+            "api_calls": api_calls,
+            "api_calls_per_request": round(api_calls / len(results), 2) if results else None,
+            "by_endpoint": github_calls,
+        },
+        "llm_calls": dict(openai.calls),
+        "notifications_delivered": github.notifications,
+    }
+
+    github.stop()
+    openai.stop()
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    print(
+        f"\n{report['succeeded']}/{report['requests']} requests succeeded in {report['wall_seconds']}s "
+        f"({report['throughput_rps']} req/s)"
+    )
+    if report["failures_by_step"]:
+        print("Failures by step: " + ", ".join(f"{k}={v}" for k, v in report["failures_by_step"].items()))
+
+    print(f"\n{'latency (s)':<24}{'p50':>8}{'p95':>8}{'p99':>8}{'mean':>8}")
+    rows = list(report["latency"].items()) + [(f"  step {k}", v) for k, v in report["steps"].items()]
+    for name, stats in rows:
+        print(
+            f"{name:<24}"
+            + "".join(f"{'-' if stats[k] is None else stats[k]:>8}" for k in ("p50", "p95", "p99", "mean"))
+        )
+
+    github = report["github"]
+    print(f"\nGitHub API calls: {github['api_calls']} ({github['api_calls_per_request']} per request)")
+    for endpoint, count in github["by_endpoint"].items():
+        print(f"  {count:>5}  {endpoint}")
+    print("LLM calls: " + ", ".join(f"{k}={v}" for k, v in sorted(report["llm_calls"].items())))
+    print(f"Notifications delivered: {report['notifications_delivered']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json_path}")
+    return 0 if report["failed"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+# Production server: `gunicorn` picks this file up from the working directory.
+#
+#   gunicorn              # or: gunicorn -c gunicorn.conf.py
+#
+# The pipeline spends nearly all of its time waiting on the LLM and GitHub, so
+# one process with many threads carries the load; job status and metrics are
+# per process, so extra workers need sticky routing for /jobs/<job_id> polling.
+
+import os
+
+# utils.config reads the environment on import, so flag the pre-fork mode first
+os.environ["PREFORK"] = "true"
+
+from utils.config import NOTIFY_DEADLINE, PORT  # noqa: E402
+
+wsgi_app = "main:app"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{PORT}")
+worker_class = "gthread"
+workers = int(os.getenv("GUNICORN_WORKERS", 1))
+# A synchronous /api-endpoint request holds its thread for the whole pipeline
+threads = int(os.getenv("GUNICORN_THREADS", 32))
+
+# Import the app, config and SDK clients once in the master; workers fork warm
+preload_app = True
+
+# gthread workers heartbeat from their main loop, so this only reaps a wedged
+# worker; it still outlasts any request that can matter to the evaluator
+timeout = int(NOTIFY_DEADLINE) + 30
+# On shutdown or reload, in-flight requests and jobs get the evaluation window to finish
+graceful_timeout = int(NOTIFY_DEADLINE)
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    from utils import http_transport, state
+    from utils.outbox import start_dispatcher
+
+    # Nothing should be inherited that the master might also use
+    state.reset_connections()
+    http_transport.close_sessions()
+    start_dispatcher()
+
+
+def worker_exit(server, worker):
+    from utils.job_queue import drain_jobs
+
+    # Pending notifications are in the outbox and resume in the next worker, but
+    # async jobs only live in this process
+    drain_jobs()
@@ -1,5 +1,13 @@
 #!/usr/bin/env python3
 
+import argparse
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
 import json
 import os
@@ -123,6 +131,27 @@ test_request_dark_mode = {
 
 test_request = test_request_calculator
 
+# Short name -> (display name, payload), as offered by select_test_example
+EXAMPLES = {
+    "calculator": ("Calculator App", test_request_calculator),
+    "sales": ("Sales Summary", test_request_sales_summary),
+    "github-user": ("GitHub User Created", test_request_github_user),
+    "markdown": ("Markdown to HTML", test_request_markdown_to_html),
+    "counter": ("Counter App", test_request_counter_app),
+    "dark-mode": ("Dark Mode Toggle", test_request_dark_mode),
+}
+
+# Round 2 briefs for each example
+ROUND2_BRIEFS = {
+    "Counter App": "Add a decrement button #decrement-btn that decreases the counter by 1, and a reset button #reset-btn that sets the counter back to 0. Update the UI to be more visually appealing.",
+    "Calculator App": "Update the calculator to also support square root and percentage operations. Add a clear button to reset the calculator.",
+    "Sales Summary": "Add a Bootstrap table #product-sales that lists each product with its total sales and keeps #total-sales accurate after render.",
+    "GitHub User Created": "Show an aria-live alert #github-status that reports when a lookup starts, succeeds, or fails.",
+    "Markdown to HTML": "Add a dark mode toggle and improve the styling with better typography and spacing.",
+    "Dark Mode Toggle": "Add smooth transitions between light and dark modes, and save the user's preference in localStorage.",
+}
+DEFAULT_ROUND2_BRIEF = "Add new features and improve the user interface."
+
 
 def test_health():
     print("Testing health endpoint...")
@@ -184,21 +213,7 @@ def test_round_2(base_request=None, brief=None, example_name=None):
     if base_request is None:
         base_request = test_request
     if brief is None:
-        # Provide appropriate Round 2 briefs based on the example
-        if example_name == "Counter App":
-            brief = "Add a decrement button #decrement-btn that decreases the counter by 1, and a reset button #reset-btn that sets the counter back to 0. Update the UI to be more visually appealing."
-        elif example_name == "Calculator App":
-            brief = "Update the calculator to also support square root and percentage operations. Add a clear button to reset the calculator."
-        elif example_name == "Sales Summary":
-            brief = "Add a Bootstrap table #product-sales that lists each product with its total sales and keeps #total-sales accurate after render."
-        elif example_name == "GitHub User Created":
-            brief = "Show an aria-live alert #github-status that reports when a lookup starts, succeeds, or fails."
-        elif example_name == "Markdown to HTML":
-            brief = "Add a dark mode toggle and improve the styling with better typography and spacing."
-        elif example_name == "Dark Mode Toggle":
-            brief = "Add smooth transitions between light and dark modes, and save the user's preference in localStorage."
-        else:
-            brief = "Add new features and improve the user interface."
+        brief = ROUND2_BRIEFS.get(example_name, DEFAULT_ROUND2_BRIEF)
 
     print("\n" + "=" * 60)
     print("Testing Round 2 (Revision) endpoint...")
@@ -276,6 +291,203 @@ def select_test_example():
         return None, None
 
 
+_STEP_ERROR = re.compile(r"Failed at step '([^']+)'")
+
+
+def parse_mix(mix):
+    # "calculator=3,counter=1" -> {"calculator": 3.0, "counter": 1.0}
+    if not mix:
+        return {name: 1.0 for name in EXAMPLES}
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in EXAMPLES:
+            raise ValueError(f"Unknown example '{name}', expected one of {', '.join(EXAMPLES)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _failure_reason(status_code, body):
+    match = _STEP_ERROR.search(str(body.get("message", "")))
+    return match.group(1) if match else f"HTTP {status_code}"
+
+
+def send_timed(session, url, payload, timeout):
+    # Returns (seconds, failing step or None); follows async-mode job ids until they finish
+    started = time.perf_counter()
+    try:
+        response = session.post(url, json=payload, timeout=timeout)
+        body = response.json() if response.content else {}
+        if response.status_code == 200 and body.get("status") == "accepted":
+            job_url = url.rsplit("/", 1)[0] + f"/jobs/{body['job_id']}"
+            deadline = time.time() + timeout
+            while True:
+                job = session.get(job_url, timeout=timeouts["test_health"]).json()
+                if job.get("status") == "completed":
+                    break
+                if job.get("status") == "failed":
+                    return time.perf_counter() - started, _failure_reason(500, job.get("error") or {})
+                if time.time() > deadline:
+                    return time.perf_counter() - started, "timeout"
+                time.sleep(1)
+        elif response.status_code != 200:
+            return time.perf_counter() - started, _failure_reason(response.status_code, body)
+    except (requests.RequestException, ValueError) as e:
+        return time.perf_counter() - started, type(e).__name__
+    return time.perf_counter() - started, None
+
+
+def run_load(url, total, concurrency, rate=None, mix=None, round2_ratio=1.0, evaluation_url=None, seed=None):
+    weights = parse_mix(mix)
+    rng = random.Random(seed)
+    run_id = uuid.uuid4().hex[:8]
+    results = []
+    lock = threading.Lock()
+    local = threading.local()
+
+    def record(example, round_number, seconds, failed_step):
+        with lock:
+            results.append(
+                {"example": example, "round": round_number, "seconds": seconds, "failed_step": failed_step}
+            )
+
+    def job(index, example, with_round2):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        name, base = EXAMPLES[example]
+        task = f"{base['task']}-load-{run_id}-{index}"
+        payload = dict(base, task=task, round=1, nonce=uuid.uuid4().hex)
+        if evaluation_url:
+            payload["evaluation_url"] = evaluation_url
+
+        seconds, failed_step = send_timed(local.session, url, payload, timeouts["round1"])
+        record(example, 1, seconds, failed_step)
+        if failed_step is None and with_round2:
+            payload = dict(payload, round=2, nonce=uuid.uuid4().hex, brief=ROUND2_BRIEFS.get(name, DEFAULT_ROUND2_BRIEF))
+            seconds, failed_step = send_timed(local.session, url, payload, timeouts["round2"])
+            record(example, 2, seconds, failed_step)
+
+    names, name_weights = list(weights), list(weights.values())
+    plan = [
+        (index, rng.choices(names, name_weights)[0], rng.random() < round2_ratio)
+        for index in range(total)
+    ]
+
+    print(
+        f"Sending {total} task(s) to {url} with concurrency {concurrency}"
+        + (f" at {rate}/s" if rate else "")
+        + f", mix {weights}, round 2 ratio {round2_ratio}"
+    )
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for index, example, with_round2 in plan:
+            if rate:
+                # Open-loop pacing: task i starts at i / rate unless every worker is busy
+                delay = started + index / rate - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(job, index, example, with_round2)
+    wall = time.perf_counter() - started
+
+    return summarize_load(results, wall)
+
+
+def summarize_load(results, wall):
+    failures = [r for r in results if r["failed_step"]]
+    by_step = {}
+    for r in failures:
+        by_step[r["failed_step"]] = by_step.get(r["failed_step"], 0) + 1
+
+    def latency(rows):
+        values = [r["seconds"] for r in rows]
+        return {
+            "count": len(values),
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        }
+
+    return {
+        "requests": len(results),
+        "errors": len(failures),
+        "error_rate": len(failures) / len(results) if results else 0.0,
+        "errors_by_step": by_step,
+        "wall_seconds": wall,
+        "throughput_rps": len(results) / wall if wall else 0.0,
+        "completed_per_minute": 60 * (len(results) - len(failures)) / wall if wall else 0.0,
+        "latency": {
+            "all": latency(results),
+            "round1": latency([r for r in results if r["round"] == 1]),
+            "round2": latency([r for r in results if r["round"] == 2]),
+        },
+    }
+
+
+def print_load_report(report):
+    print("\n" + "=" * 60)
+    print("Load test results")
+    print("=" * 60)
+    print(f"Requests: {report['requests']} in {report['wall_seconds']:.1f}s")
+    print(
+        f"Throughput: {report['throughput_rps']:.3f} req/s "
+        f"({report['completed_per_minute']:.1f} successful/min)"
+    )
+    print(f"Errors: {report['errors']} ({report['error_rate']:.1%})")
+    for step, count in sorted(report["errors_by_step"].items(), key=lambda item: -item[1]):
+        print(f"  {step}: {count} ({count / report['requests']:.1%})")
+    print("\nLatency (s)      count     p50     p95     p99")
+    for name, stats in report["latency"].items():
+        if stats["count"]:
+            print(
+                f"  {name:<12}{stats['count']:>7}"
+                + "".join(f"{stats[k]:>8.2f}" for k in ("p50", "p95", "p99"))
+            )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send test tasks to the deployment API")
+    parser.add_argument("--load", action="store_true", help="run a non-interactive load test instead of the interactive demo")
+    parser.add_argument("--url", default=API_URL, help="API endpoint to send tasks to")
+    parser.add_argument("--tasks", type=int, default=10, help="number of round 1 tasks to send")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum tasks in flight")
+    parser.add_argument("--rate", type=float, help="target task starts per second (default: as fast as concurrency allows)")
+    parser.add_argument(
+        "--mix",
+        help=f"weighted examples, e.g. calculator=3,counter=1 (examples: {', '.join(EXAMPLES)}; default: all equally)",
+    )
+    parser.add_argument("--round2-ratio", type=float, default=1.0, help="fraction of successful tasks followed by round 2")
+    parser.add_argument("--evaluation-url", help="override evaluation_url in every payload")
+    parser.add_argument("--seed", type=int, help="seed for the example mix")
+    parser.add_argument("--json", dest="json_path", help="also write the report to this file")
+    return parser.parse_args()
+
+
+def main_load(args):
+    report = run_load(
+        args.url,
+        args.tasks,
+        args.concurrency,
+        rate=args.rate,
+        mix=args.mix,
+        round2_ratio=args.round2_ratio,
+        evaluation_url=args.evaluation_url,
+        seed=args.seed,
+    )
+    print_load_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport written to {args.json_path}")
+
+
 def main():
     print("=" * 60)
     print("LLM Code Deployment System - Test Suite")
@@ -324,4 +536,8 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.load:
+        main_load(args)
+    else:
+        main()
\ No newline at end of file
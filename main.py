@@ -1,22 +1,41 @@
 import os
-from flask import Flask, request, jsonify
+import time
+from flask import Flask, Response, request, jsonify
 from utils import (
     load_config,
     validate_config,
     validate_request,
-    generate_app_code,
-    create_or_update_repo,
-    update_readme,
-    notify_evaluation_api,
+    format_pipeline_error,
+    create_job,
+    new_job_id,
+    run_job,
+    submit_job,
+    get_job,
+    accepted_response,
+    wait_for_duplicate,
+    claim_request,
+    release_request,
+    collect_stats,
+    start_dispatcher,
+    warm_clients,
+    render_metrics,
+    STEP_DURATION,
 )
+from utils.config import ASYNC_JOBS, DEBUG, PREFORK
 
 app = Flask(__name__)
 
+# Resume evaluation notifications left pending by a previous process. Under
+# gunicorn each worker starts its own from post_fork, as threads do not survive fork
+if not PREFORK:
+    start_dispatcher()
+# Import the OpenAI/GitHub SDKs and build their clients off the request path
+warm_clients()
+
 
 @app.route("/api-endpoint", methods=["POST"])
 def handle_request():
     data = None
-    current_step = "initialization"
 
     try:
         data = request.get_json()
@@ -24,139 +43,87 @@ def handle_request():
         if not data:
             return jsonify({"status": "error", "message": "No JSON data provided"}), 400
 
-        current_step = "validation"
+        started = time.perf_counter()
         is_valid, message = validate_request(data)
+        STEP_DURATION.observe(
+            time.perf_counter() - started,
+            step="validation",
+            stage="validation",
+            outcome="ok" if is_valid else "error",
+        )
         if not is_valid:
             return jsonify({"status": "error", "message": message}), 400
 
-        email = data["email"]
-        task = data["task"]
-        round_num = data["round"]
-        nonce = data["nonce"]
-        brief = data["brief"]
-        checks = data["checks"]
-        evaluation_url = data["evaluation_url"]
-        attachments = data.get("attachments", [])
-
-        print(f"Processing request for {email}, task: {task}, round: {round_num}")
-
-        existing_code = ""
-        if round_num > 1:
-            current_step = "fetching existing code"
-            try:
-                from utils.github_manager import get_existing_code
-
-                existing_code = get_existing_code(task)
-                if existing_code:
-                    print(
-                        f"Successfully fetched existing code from Round {round_num - 1}"
-                    )
-                else:
-                    print(
-                        f"No existing code found (this is OK for first-time Round {round_num})"
-                    )
-            except Exception as e:
-                print(f"Warning: Could not fetch existing code: {str(e)}")
-                print("Continuing without existing code (generating fresh)...")
-
-        current_step = "generating code"
-        print("Generating app code with LLM...")
-        try:
-            code_files = generate_app_code(
-                brief, checks, attachments, existing_code, round_num
-            )
-        except Exception as e:
-            raise RuntimeError(f"Code generation failed: {str(e)}")
-
-        current_step = "creating/updating repository"
-        print("Creating/updating GitHub repository...")
-        try:
-            repo_info = create_or_update_repo(task, code_files, round_num)
-        except Exception as e:
-            raise RuntimeError(f"Repository operation failed: {str(e)}")
-
-        current_step = "updating README"
-        print("Updating README...")
-        try:
-            update_readme(
-                repo_info["repo"],
-                task,
-                brief,
-                repo_info["repo_url"],
-                repo_info["pages_url"],
-            )
-        except Exception as e:
-            print(f"Warning: README update failed: {str(e)}")
-
-        current_step = "fetching commit info"
-        try:
-            commits = repo_info["repo"].get_commits()
-            latest_commit_sha = commits[0].sha
-        except Exception as e:
-            print(f"Warning: Could not fetch commits: {str(e)}")
-            latest_commit_sha = repo_info.get("commit_sha", "unknown")
-
-        eval_data = {
-            "email": email,
-            "task": task,
-            "round": round_num,
-            "nonce": nonce,
-            "repo_url": repo_info["repo_url"],
-            "commit_sha": latest_commit_sha,
-            "pages_url": repo_info["pages_url"],
-        }
-
-        current_step = "notifying evaluation API"
-        print("Notifying evaluation API...")
-        notify_result = False
-        try:
-            notify_result = notify_evaluation_api(evaluation_url, eval_data)
-        except Exception as e:
-            print(f"Warning: Evaluation API notification failed: {str(e)}")
-
-        response_data = {
-            "email": email,
-            "task": task,
-            "round": round_num,
-            "nonce": nonce,
-            "repo_url": repo_info["repo_url"],
-            "commit_sha": latest_commit_sha,
-            "pages_url": repo_info["pages_url"],
-        }
-
-        if not notify_result:
-            response_data["warning"] = "Failed to notify evaluation API after retries"
-
-        return jsonify(response_data), 200
+        async_mode = ASYNC_JOBS or request.args.get("async", "").lower() in (
+            "1",
+            "true",
+            "yes",
+        )
+
+        job_id = new_job_id()
+        state, previous = claim_request(data, job_id)
+        if state == "completed":
+            print(f"Duplicate request for task: {data['task']}, returning stored result")
+            return jsonify(dict(previous, idempotent_replay=True)), 200
+        if state == "in_flight":
+            print(f"Duplicate request for task: {data['task']}, attaching to job {previous['job_id']}")
+            if async_mode:
+                return jsonify(accepted_response(previous["job_id"], data)), 200
+            reply = wait_for_duplicate(previous["job_id"], data, job_id)
+            if reply is not None:
+                status, body = reply
+                return jsonify(body), status
+            print(f"Job {previous['job_id']} left no result, running task: {data['task']} as job {job_id}")
+
+        if async_mode:
+            if submit_job(data, job_id) is None:
+                release_request(data, job_id)
+                return (
+                    jsonify(
+                        {"status": "error", "message": "Job queue is full, retry later"}
+                    ),
+                    503,
+                )
+
+            print(f"Queued job {job_id} for task: {data['task']}, round: {data['round']}")
+            return jsonify(accepted_response(job_id, data)), 200
+
+        job = run_job(create_job(data, job_id))
+        if job["status"] == "failed":
+            return jsonify(job["error"]), 500
+
+        return jsonify(job["result"]), 200
 
     except Exception as e:
-        print(f"Error processing request at step '{current_step}': {str(e)}")
+        print(f"Error processing request: {str(e)}")
         import traceback
 
         traceback.print_exc()
 
-        error_message = str(e)
-        if current_step != "initialization":
-            error_message = f"Failed at step '{current_step}': {error_message}"
-
-        error_response = {"status": "error", "message": error_message}
+        return jsonify(format_pipeline_error(e, data)), 500
 
-        if data and all(k in data for k in ["email", "task", "round", "nonce"]):
-            error_response.update(
-                {
-                    "email": data["email"],
-                    "task": data["task"],
-                    "round": data["round"],
-                    "nonce": data["nonce"],
-                }
-            )
 
-        return jsonify(error_response), 500
+@app.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job), 200
 
 
 @app.route("/", methods=["GET"])
 def index():
-    return jsonify({"message": "Welcome to LLM Code Deployment API", "endpoints": ["/api-endpoint (POST)", "/health (GET)"]}), 200
+    return jsonify({"message": "Welcome to LLM Code Deployment API", "endpoints": ["/api-endpoint (POST)", "/jobs/<job_id> (GET)", "/stats (GET)", "/metrics (GET)", "/health (GET)"]}), 200
+
+
+@app.route("/stats", methods=["GET"])
+def stats():
+    return jsonify(collect_stats()), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/health", methods=["GET"])
@@ -170,7 +137,8 @@ def main():
     port = config["port"]
     print(f"Starting LLM Code Deployment API on port {port}")
     print(f"API endpoint: http://localhost:{port}/api-endpoint")
-    app.run(host="0.0.0.0", port=port, debug=True)
+    # Development server only; production runs under gunicorn (see gunicorn.conf.py)
+    app.run(host="0.0.0.0", port=port, debug=DEBUG)
 
 
 # Vercel deployment - the app variable is automatically detected
@@ -0,0 +1,107 @@
+import asyncio
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from utils import code_generator, model_router
+
+
+class _StalledAPI:
+    # Chat completions endpoint that never answers within the client timeout,
+    # counting requests per model as they arrive
+    def __init__(self, stall: float = 1.0):
+        self.stall = stall
+        self.requests: Counter = Counter()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+                api.requests[body["model"]] += 1
+                time.sleep(api.stall)
+                self.close_connection = True
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.base_url = f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+@pytest.fixture
+def stalled_api(monkeypatch):
+    api = _StalledAPI()
+    monkeypatch.setattr(model_router, "LLM_FAST_MODEL", "fast-model")
+    monkeypatch.setattr(model_router, "LLM_STRONG_MODEL", "strong-model")
+    monkeypatch.setattr(model_router, "LLM_FAST_TIMEOUT", 0.2)
+    monkeypatch.setattr(model_router, "LLM_STRONG_TIMEOUT", 0.2)
+    yield api
+    api.stop()
+
+
+def test_complete_tries_each_model_once_on_timeout(stalled_api, monkeypatch):
+    from openai import OpenAI
+
+    client = OpenAI(api_key="test", base_url=stalled_api.base_url)
+    monkeypatch.setattr(code_generator, "get_openai_client", lambda: client)
+
+    with pytest.raises(RuntimeError, match="All models failed for readme"):
+        code_generator._complete("readme", "fast", "test", "system", "prompt", use_cache=False)
+    assert stalled_api.requests == {"fast-model": 1, "strong-model": 1}
+
+
+def test_complete_async_tries_each_model_once_on_timeout(stalled_api, monkeypatch):
+    from openai import AsyncOpenAI
+
+    async def run():
+        client = AsyncOpenAI(api_key="test", base_url=stalled_api.base_url)
+        monkeypatch.setattr(code_generator, "get_async_openai_client", lambda: client)
+        try:
+            await code_generator._complete_async(
+                "readme", "fast", "test", "system", "prompt", use_cache=False
+            )
+        finally:
+            await client.close()
+
+    with pytest.raises(RuntimeError, match="All models failed for readme"):
+        asyncio.run(run())
+    assert stalled_api.requests == {"fast-model": 1, "strong-model": 1}
+
+
+def test_sync_and_async_revisions_fall_back_the_same_way(monkeypatch):
+    monkeypatch.setattr(code_generator, "LLM_REVISION_MODE", "patch")
+    monkeypatch.setattr(code_generator, "LLM_STREAMING", False)
+    calls = {"sync": [], "async": []}
+
+    def reply(kind, postprocess=None, **request):
+        calls[kind].append(request)
+        if postprocess is not None:
+            return postprocess("no search/replace blocks here")
+        return "```html\n<html>rewritten</html>\n```"
+
+    async def complete_async(**request):
+        return reply("async", **request)
+
+    monkeypatch.setattr(code_generator, "_complete", lambda **request: reply("sync", **request))
+    monkeypatch.setattr(code_generator, "_complete_async", complete_async)
+
+    existing = "<html>\n<body>old</body>\n</html>"
+    args = ("Add a footer", ["has footer"], None, existing, 2, False)
+    sync_files = code_generator.generate_app_code(*args)
+    async_files = asyncio.run(code_generator.generate_app_code_async(*args))
+
+    assert sync_files == async_files == {"index.html": "<html>rewritten</html>"}
+    assert calls["sync"] == calls["async"]
+    assert [request["reason"].endswith(", patch") for request in calls["sync"]] == [True, False]
@@ -0,0 +1,103 @@
+import pytest
+
+from utils.code_patch import PatchError, _find_loose, apply_patch, parse_patch, patch_document
+
+SOURCE = """<html>
+<body>
+  <h1>Title</h1>
+  <p>First</p>
+  <p>Second</p>
+</body>
+</html>
+"""
+
+
+def _block(search, replace):
+    return f"<<<<<<< SEARCH\n{search}\n=======\n{replace}\n>>>>>>> REPLACE"
+
+
+def test_parse_patch_reads_every_block():
+    text = "intro\n" + _block("a", "b") + "\n\n" + _block("c\nd", "e")
+    assert parse_patch(text) == [("a", "b"), ("c\nd", "e")]
+
+
+def test_parse_patch_allows_empty_replace():
+    assert parse_patch("<<<<<<< SEARCH\nremove me\n=======\n>>>>>>> REPLACE") == [
+        ("remove me", "")
+    ]
+
+
+def test_parse_patch_handles_crlf():
+    text = "<<<<<<< SEARCH\r\nold\r\n=======\r\nnew\r\n>>>>>>> REPLACE"
+    assert parse_patch(text) == [("old", "new")]
+
+
+def test_parse_patch_only_splits_on_a_whole_separator_line():
+    text = _block("<pre>\ntitle ========\n</pre>", "<pre>\n=======\n</pre>")
+    assert parse_patch(text) == [("<pre>\ntitle ========\n</pre>", "<pre>\n=======\n</pre>")]
+
+
+@pytest.mark.parametrize("text", ["", None, "<html></html>", "<<<<<<< SEARCH\nx\n"])
+def test_parse_patch_rejects_text_without_blocks(text):
+    with pytest.raises(PatchError):
+        parse_patch(text)
+
+
+def test_apply_patch_replaces_exact_match():
+    patched = apply_patch(SOURCE, [("  <h1>Title</h1>", "  <h1>New title</h1>")])
+    assert "<h1>New title</h1>" in patched
+    assert "<h1>Title</h1>" not in patched
+
+
+def test_apply_patch_applies_hunks_in_order():
+    patched = apply_patch(
+        SOURCE, [("<p>First</p>", "<p>One</p>"), ("<p>One</p>\n  <p>Second</p>", "<p>Both</p>")]
+    )
+    assert "<p>Both</p>" in patched
+    assert "Second" not in patched
+
+
+def test_apply_patch_rejects_ambiguous_search():
+    with pytest.raises(PatchError, match="matches 2 places"):
+        apply_patch(SOURCE, [("<p>", "<div>")])
+
+
+def test_apply_patch_rejects_empty_search():
+    with pytest.raises(PatchError, match="empty SEARCH"):
+        apply_patch(SOURCE, [("  \n", "x")])
+
+
+def test_apply_patch_rejects_missing_search():
+    with pytest.raises(PatchError, match="does not match"):
+        apply_patch(SOURCE, [("<p>Third</p>", "x")])
+
+
+def test_apply_patch_falls_back_to_trailing_whitespace_match():
+    source = SOURCE.replace("<p>First</p>", "<p>First</p>   ")
+    patched = apply_patch(source, [("  <p>First</p>\n  <p>Second</p>", "  <p>Merged</p>")])
+    assert "  <p>Merged</p>\n</body>" in patched
+
+
+def test_find_loose_keeps_the_last_line_break():
+    source = "a  \nb\t\nc\n"
+    begin, end = _find_loose(source, "a\nb")
+    assert source[begin:end] == "a  \nb"
+    assert source[end:] == "\t\nc\n"
+
+
+def test_find_loose_needs_a_unique_match():
+    assert _find_loose("x \ny\nx\t\ny\n", "x\ny") == (-1, -1)
+    assert _find_loose("x\n", "z") == (-1, -1)
+
+
+def test_patch_document_keeps_ascii_rules_in_the_page():
+    source = "<html>\n<body>\n<pre>\nTitle\n=======\n</pre>\n</body>\n</html>\n"
+    patched = patch_document(source, _block("Title", "New title"))
+    assert patched == source.replace("Title", "New title")
+
+
+def test_patch_document_rejects_leftover_blocks():
+    source = "<html>\n<body>\n<p>x</p>\n</body>\n</html>\n"
+    reply = _block("<p>x</p>", "<p>y</p>\n<<<<<<< SEARCH\nstray")
+    with pytest.raises(PatchError, match="patch markers"):
+        patch_document(source, reply)
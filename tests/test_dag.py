@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from utils.dag import Step, StepFailed, _required_steps, run_dag
+
+
+def _echo(name):
+    return lambda inputs: {"name": name, "inputs": sorted(inputs)}
+
+
+def test_run_dag_passes_dependency_outputs():
+    steps = [
+        Step("a", lambda inputs: 1),
+        Step("b", lambda inputs: 2),
+        Step("c", lambda inputs: inputs["a"] + inputs["b"], ["a", "b"]),
+    ]
+    results, timings = run_dag(steps)
+    assert results == {"a": 1, "b": 2, "c": 3}
+    assert set(timings) == {"a", "b", "c"}
+
+
+def test_run_dag_runs_independent_steps_concurrently():
+    barrier = threading.Barrier(2, timeout=5)
+    steps = [Step("a", lambda inputs: barrier.wait()), Step("b", lambda inputs: barrier.wait())]
+    results, _ = run_dag(steps)
+    assert sorted(results.values()) == [0, 1]
+
+
+def test_run_dag_rejects_unknown_dependency():
+    with pytest.raises(ValueError, match="unknown step 'missing'"):
+        run_dag([Step("a", _echo("a"), ["missing"])])
+
+
+def test_run_dag_wraps_the_failing_step():
+    def broken(inputs):
+        raise RuntimeError("boom")
+
+    with pytest.raises(StepFailed) as excinfo:
+        run_dag([Step("a", _echo("a")), Step("broken", broken, ["a"], label="breaking")])
+    assert excinfo.value.step.label == "breaking"
+    assert isinstance(excinfo.value.cause, RuntimeError)
+    assert str(excinfo.value) == "boom"
+
+
+def _pipeline(calls=None):
+    def fn(name):
+        def run(inputs):
+            if calls is not None:
+                calls.append(name)
+            return name.upper()
+
+        return run
+
+    return [
+        Step("repo", fn("repo")),
+        Step("code", fn("code"), ["repo"]),
+        Step("readme", fn("readme"), ["repo"]),
+        Step("deploy", fn("deploy"), ["code", "readme"]),
+        Step("notify", fn("notify"), ["deploy"]),
+    ]
+
+
+def _names(steps):
+    return [step.name for step in steps]
+
+
+def test_required_steps_without_checkpoints_is_everything():
+    steps = _pipeline()
+    assert _names(_required_steps(steps, {})) == _names(steps)
+
+
+def test_required_steps_skips_completed_and_their_unneeded_inputs():
+    steps = _pipeline()
+    assert _names(_required_steps(steps, {"deploy": "DEPLOY"})) == ["notify"]
+
+
+def test_required_steps_reruns_inputs_of_unfinished_steps():
+    steps = _pipeline()
+    required = _required_steps(steps, {"repo": "REPO", "code": "CODE"})
+    assert _names(required) == ["readme", "deploy", "notify"]
+
+
+def test_run_dag_resumes_from_completed_steps():
+    calls, saved = [], []
+    results, timings = run_dag(
+        _pipeline(calls),
+        completed={"repo": "REPO", "code": "CODE", "unknown": "ignored"},
+        on_complete=lambda step, output: saved.append((step.name, output)),
+    )
+    assert sorted(calls) == ["deploy", "notify", "readme"]
+    assert results["code"] == "CODE"
+    assert "unknown" not in results
+    assert set(timings) == {"readme", "deploy", "notify"}
+    assert sorted(saved) == [("deploy", "DEPLOY"), ("notify", "NOTIFY"), ("readme", "README")]
+
+
+def test_run_dag_reports_a_cycle():
+    steps = [Step("a", _echo("a"), ["b"]), Step("b", _echo("b"), ["a"]), Step("c", _echo("c"))]
+    with pytest.raises(ValueError, match="Dependency cycle between steps: a, b"):
+        run_dag(steps)
+
+
+def test_run_dag_fails_fast_without_waiting_for_siblings():
+    release = threading.Event()
+
+    def slow(inputs):
+        release.wait(5)
+        return "slow"
+
+    def broken(inputs):
+        raise RuntimeError("boom")
+
+    started = time.perf_counter()
+    try:
+        with pytest.raises(StepFailed):
+            run_dag([Step("slow", slow), Step("broken", broken)])
+        assert time.perf_counter() - started < 2
+    finally:
+        release.set()
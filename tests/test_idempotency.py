@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from utils import idempotency, job_queue, state
+
+DATA = {"task": "demo", "round": 1, "nonce": "n1"}
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(idempotency, "_initialized", False)
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_STALE_AFTER", 60)
+    state.reset_connections()
+    yield
+    state.reset_connections()
+
+
+def _age_claim(seconds):
+    idempotency._db().execute(
+        "UPDATE idempotency SET updated_at = ? WHERE key = ?",
+        (time.time() - seconds, idempotency.idempotency_key(DATA)),
+    )
+
+
+def test_duplicate_of_a_live_claim_is_in_flight():
+    assert idempotency.claim_request(DATA, "job-a") == ("new", None)
+    assert idempotency.claim_request(DATA, "job-b") == ("in_flight", {"job_id": "job-a"})
+
+
+def test_stale_claim_is_taken_over():
+    idempotency.claim_request(DATA, "job-a")
+    _age_claim(120)
+    assert idempotency.request_stale(idempotency.get_request_record(DATA))
+    assert idempotency.claim_request(DATA, "job-b") == ("new", None)
+    assert idempotency.get_request_record(DATA)["job_id"] == "job-b"
+
+
+def test_old_job_cannot_complete_or_release_the_new_claim():
+    idempotency.claim_request(DATA, "job-a")
+    _age_claim(120)
+    idempotency.claim_request(DATA, "job-b")
+
+    idempotency.complete_request(DATA, {"from": "job-a"}, "job-a")
+    idempotency.release_request(DATA, "job-a")
+    record = idempotency.get_request_record(DATA)
+    assert (record["status"], record["job_id"]) == ("in_flight", "job-b")
+
+    idempotency.complete_request(DATA, {"from": "job-b"}, "job-b")
+    record = idempotency.get_request_record(DATA)
+    assert (record["status"], record["response"]) == ("completed", {"from": "job-b"})
+
+
+def test_wait_for_request_returns_once_the_claim_is_stale():
+    idempotency.claim_request(DATA, "job-a")
+    _age_claim(120)
+    started = time.perf_counter()
+    record = idempotency.wait_for_request(DATA, timeout=5, poll_interval=1)
+    assert time.perf_counter() - started < 1
+    assert record["job_id"] == "job-a"
+    assert idempotency.request_stale(record)
+
+
+def test_duplicate_takes_over_a_stale_claim():
+    idempotency.claim_request(DATA, "job-a")
+    _age_claim(120)
+    assert job_queue.wait_for_duplicate("job-a", DATA, "job-b") is None
+    assert idempotency.get_request_record(DATA)["job_id"] == "job-b"
+
+
+def test_duplicate_takes_over_a_released_claim():
+    idempotency.claim_request(DATA, "job-a")
+    idempotency.release_request(DATA, "job-a")
+    assert job_queue.wait_for_duplicate("job-a", DATA, "job-b") is None
+    assert idempotency.get_request_record(DATA)["job_id"] == "job-b"
+
+
+def test_duplicate_replays_or_reports_a_live_claim(monkeypatch):
+    monkeypatch.setattr(job_queue, "IDEMPOTENCY_WAIT_TIMEOUT", 0)
+    idempotency.claim_request(DATA, "job-c")
+    status, body = job_queue.wait_for_duplicate("job-c", DATA, "job-b")
+    assert status == 409
+    assert body["job_id"] == "job-c"
+
+    idempotency.complete_request(DATA, {"ok": True}, "job-c")
+    assert job_queue.wait_for_duplicate("job-c", DATA, "job-b") == (
+        200,
+        {"ok": True, "idempotent_replay": True},
+    )
@@ -0,0 +1,63 @@
+import pytest
+
+from utils.llm_stream import FenceStripper
+
+
+def _run(chunks):
+    stripper = FenceStripper()
+    out = "".join(stripper.feed(chunk) for chunk in chunks)
+    return out + stripper.finish(), stripper
+
+
+def test_strips_fence_and_surrounding_text():
+    text = "Here you go:\n```html\n<html></html>\n```\nEnjoy!"
+    out, stripper = _run([text])
+    assert out == "<html></html>\n"
+    assert stripper.closed
+
+
+def test_matches_split_postprocessing():
+    text = "Sure\n```html\n<html>\n<body>x</body>\n</html>\n```\ntrailing"
+    expected = text.split("```html")[1].split("```")[0].lstrip("\n")
+    assert _run([text])[0] == expected
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 7])
+def test_fences_split_across_chunks(size):
+    text = "Intro\n```html\n<html><p>`code`</p></html>\n```\nafter"
+    chunks = [text[i:i + size] for i in range(0, len(text), size)]
+    out, stripper = _run(chunks)
+    assert out == "<html><p>`code`</p></html>\n"
+    assert stripper.closed
+
+
+def test_waits_for_the_rest_of_the_opening_line():
+    stripper = FenceStripper()
+    assert stripper.feed("``") == ""
+    assert stripper.feed("`ht") == ""
+    assert stripper.feed("ml\n<html>") == "<html>"
+    assert stripper.feed("</html>``") == "</html>"
+    assert stripper.feed("`") == ""
+    assert stripper.closed
+    assert stripper.finish() == ""
+
+
+def test_ignores_text_after_closing_fence():
+    stripper = FenceStripper()
+    stripper.feed("```html\n<html></html>\n```")
+    assert stripper.feed("\nmore ```html\n<html>again</html>") == ""
+    assert stripper.finish() == ""
+
+
+def test_bare_document_without_fence():
+    assert _run(["<html>", "<body></body>", "</html>"])[0] == "<html><body></body></html>"
+
+
+def test_unclosed_fence_keeps_everything_but_trailing_backticks():
+    out, stripper = _run(["```html\n<html>", "</html>\n``"])
+    assert out == "<html></html>\n"
+    assert stripper.closed
+
+
+def test_response_without_fence_or_markup_is_returned_whole():
+    assert _run(["plain ", "text"])[0] == "plain text"
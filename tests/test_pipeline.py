@@ -0,0 +1,33 @@
+import pytest
+
+from utils import idempotency, job_store, pipeline, state
+from utils.dag import Step
+
+DATA = {"task": "demo", "round": 1, "nonce": "n1"}
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(state, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(idempotency, "_initialized", False)
+    monkeypatch.setattr(job_store, "_initialized", False)
+    state.reset_connections()
+    yield
+    state.reset_connections()
+
+
+def test_checkpoints_resume_completed_steps():
+    _, on_complete = pipeline._checkpoints(DATA)
+    on_complete(Step("code", None, checkpoint=True), {"index.html": "<html></html>"})
+    on_complete(Step("deploy", None), {"commit_sha": "abc"})
+
+    completed, _ = pipeline._checkpoints(DATA)
+    assert completed == {"code": {"index.html": "<html></html>"}}
+
+
+def test_checkpoints_skip_a_step_that_gave_up():
+    _, on_complete = pipeline._checkpoints(DATA)
+    on_complete(Step("readme", None, checkpoint=True), None)
+
+    completed, _ = pipeline._checkpoints(DATA)
+    assert "readme" not in completed
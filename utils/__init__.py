@@ -1,7 +1,70 @@
 # LLM Code Deployment System - Utilities Package
 
-from .config import load_config, validate_config
-from .validation import validate_request
-from .code_generator import generate_app_code
-from .github_manager import create_or_update_repo, update_readme
-from .api_notifier import notify_evaluation_api
\ No newline at end of file
+import importlib
+
+# Public name -> submodule. Submodules are imported on first attribute access
+# so `import utils.config` (or a health check) doesn't load the whole pipeline
+_EXPORTS = {
+    "load_config": "config",
+    "validate_config": "config",
+    "warm_clients": "config",
+    "render_metrics": "metrics",
+    "STEP_DURATION": "metrics",
+    "validate_request": "validation",
+    "generate_app_code": "code_generator",
+    "get_cache_stats": "llm_cache",
+    "clear_cache": "llm_cache",
+    "get_stream_stats": "llm_stream",
+    "get_routing_stats": "model_router",
+    "get_revision_stats": "code_patch",
+    "get_transport_stats": "http_transport",
+    "get_github_cache_stats": "github_cache",
+    "get_etag_stats": "etag_cache",
+    "get_mirror_stats": "deploy_mirror",
+    "get_scheduler_stats": "github_scheduler",
+    "enqueue_notification": "outbox",
+    "start_dispatcher": "outbox",
+    "get_outbox_stats": "outbox",
+    "get_pages_stats": "pages_poller",
+    "collect_stats": "stats",
+    "create_or_update_repo": "github_manager",
+    "update_readme": "github_manager",
+    "deploy_files": "github_manager",
+    "notify_evaluation_api": "api_notifier",
+    "run_pipeline": "pipeline",
+    "run_pipeline_async": "pipeline_async",
+    "format_pipeline_error": "pipeline",
+    "PipelineError": "pipeline",
+    "create_job": "job_queue",
+    "new_job_id": "job_queue",
+    "run_job": "job_queue",
+    "run_job_async": "job_queue",
+    "submit_job": "job_queue",
+    "get_job": "job_queue",
+    "wait_for_job": "job_queue",
+    "drain_jobs": "job_queue",
+    "get_queue_stats": "job_queue",
+    "accepted_response": "job_queue",
+    "duplicate_response": "job_queue",
+    "wait_for_duplicate": "job_queue",
+    "claim_request": "idempotency",
+    "release_request": "idempotency",
+    "wait_for_request": "idempotency",
+    "get_request_record": "idempotency",
+    "request_stale": "idempotency",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module_name = _EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
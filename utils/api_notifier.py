@@ -2,18 +2,20 @@ import time
 from typing import Dict, Any
 import requests
 
+from . import http_transport
+
 
 def notify_evaluation_api(
-    evaluation_url: str, data: Dict[str, Any], max_retries: int = 5
+    evaluation_url: str, data: Dict[str, Any], max_retries: int = 5, timeout: float = 30
 ) -> bool:
     delay = 1
     for attempt in range(max_retries):
         try:
-            response = requests.post(
+            response = http_transport.post(
                 evaluation_url,
                 json=data,
                 headers={"Content-Type": "application/json"},
-                timeout=30,
+                timeout=timeout,
             )
 
             if response.status_code == 200:
@@ -0,0 +1,149 @@
+import binascii
+import mimetypes
+import posixpath
+import re
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import unquote_to_bytes
+
+from .config import (
+    ATTACHMENT_MAX_BYTES,
+    ATTACHMENT_MAX_TOTAL_BYTES,
+    ATTACHMENT_SAMPLE_CHARS,
+)
+
+# Files the deploy step writes itself; an attachment must not replace them
+_RESERVED_NAMES = {"index.html", "LICENSE", "README.md"}
+_UNSAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
+_TEXT_MIME_TYPES = {
+    "application/json",
+    "application/xml",
+    "application/javascript",
+    "image/svg+xml",
+}
+
+
+def _safe_name(name: str, index: int, taken: set) -> str:
+    base = posixpath.basename(str(name).replace("\\", "/")).strip(". ")
+    base = _UNSAFE_CHARS.sub("-", base) or f"attachment-{index + 1}"
+    candidate, counter = base, 1
+    while candidate in _RESERVED_NAMES or candidate in taken:
+        stem, ext = posixpath.splitext(base)
+        candidate = f"{stem}-{counter}{ext}"
+        counter += 1
+    taken.add(candidate)
+    return candidate
+
+
+def _decode_data_uri(url: str, remaining_budget: int):
+    header, sep, _ = url.partition(",")
+    if not sep:
+        raise ValueError("data URI has no payload")
+
+    params = header[len("data:"):].split(";")
+    mime_type = params[0].strip() or "text/plain"
+    is_base64 = "base64" in (p.strip().lower() for p in params[1:])
+
+    payload_start = len(header) + 1
+    encoded_size = len(url) - payload_start
+    estimated = encoded_size * 3 // 4 if is_base64 else encoded_size
+    limit = min(ATTACHMENT_MAX_BYTES, remaining_budget)
+    if estimated > limit:
+        raise ValueError(f"about {estimated} bytes exceeds the {limit} byte limit")
+
+    # Slice the payload through a memoryview so large URIs are not copied again
+    raw = memoryview(url.encode("ascii", errors="strict"))[payload_start:]
+    if is_base64:
+        content = binascii.a2b_base64(raw)
+    else:
+        content = unquote_to_bytes(raw.tobytes())
+
+    if len(content) > limit:
+        raise ValueError(f"{len(content)} bytes exceeds the {limit} byte limit")
+    return mime_type, content
+
+
+def decode_attachments(attachments: Optional[list]) -> List[Dict[str, Any]]:
+    decoded = []
+    taken: set = set()
+    budget = ATTACHMENT_MAX_TOTAL_BYTES
+
+    for index, att in enumerate(attachments or []):
+        if not isinstance(att, dict):
+            print(f"Skipping attachment #{index + 1}: not an object")
+            continue
+        url = str(att.get("url", ""))
+        name = _safe_name(att.get("name") or "", index, taken)
+
+        if not url.startswith("data:"):
+            # Remote attachments stay remote; the app can fetch them itself
+            decoded.append(
+                {
+                    "name": name,
+                    "mime_type": mimetypes.guess_type(name)[0] or "application/octet-stream",
+                    "size": None,
+                    "content": None,
+                    "url": url,
+                }
+            )
+            continue
+
+        try:
+            mime_type, content = _decode_data_uri(url, budget)
+        except (ValueError, binascii.Error, UnicodeEncodeError) as e:
+            print(f"Skipping attachment '{name}': {str(e)}")
+            taken.discard(name)
+            continue
+
+        budget -= len(content)
+        decoded.append(
+            {
+                "name": name,
+                "mime_type": mime_type,
+                "size": len(content),
+                "content": content,
+                "url": None,
+            }
+        )
+        print(f"Decoded attachment '{name}' ({mime_type}, {len(content)} bytes)")
+
+    return decoded
+
+
+def _as_text(attachment: Dict[str, Any]) -> Optional[str]:
+    mime_type = attachment["mime_type"]
+    if not (mime_type.startswith("text/") or mime_type in _TEXT_MIME_TYPES):
+        return None
+    try:
+        return attachment["content"].decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+def attachment_files(attachments: List[Dict[str, Any]]) -> Dict[str, Union[str, bytes]]:
+    # Text goes inline in the tree; anything else is uploaded as a base64 blob
+    files: Dict[str, Union[str, bytes]] = {}
+    for att in attachments:
+        if att["content"] is None:
+            continue
+        text = _as_text(att)
+        files[att["name"]] = text if text is not None else att["content"]
+    return files
+
+
+def describe_attachments(attachments: List[Dict[str, Any]]) -> str:
+    lines = []
+    for att in attachments:
+        if att["content"] is None:
+            lines.append(f"- {att['name']} ({att['mime_type']}): remote file at {att['url']}")
+            continue
+
+        lines.append(
+            f"- {att['name']} ({att['mime_type']}, {att['size']} bytes): "
+            f"committed next to index.html, load it with the relative path '{att['name']}'"
+        )
+        text = _as_text(att)
+        if text is not None:
+            sample = text[:ATTACHMENT_SAMPLE_CHARS]
+            truncated = "\n  ..." if len(text) > len(sample) else ""
+            lines.append("  Sample:\n  " + sample.replace("\n", "\n  ") + truncated)
+    return "\n".join(lines)
@@ -1,30 +1,239 @@
-from typing import Dict, Optional
+import asyncio
+from typing import Any, Callable, Dict, Optional
 
-from .config import get_openai_client
+from .attachments import describe_attachments
+from .code_patch import PATCH_FORMAT, PatchError, patch_document
+from .config import (
+    get_async_openai_client,
+    get_openai_client,
+    LLM_REVISION_MODE,
+    LLM_STREAMING,
+    LLM_STREAM_DEADLINE,
+)
+from .llm_cache import cache_enabled, cache_key, get_cached, put_cached
+from .llm_stream import stream_completion, stream_completion_async
+from .metrics import LLM_TOKENS, RETRIES
+from .tracing import current_span
+from .model_router import (
+    call_with_fallback,
+    call_with_fallback_async,
+    choose_tier,
+    models_for_tier,
+)
 
+_CODE_SYSTEM_PROMPT = "You are an expert web developer. Generate clean, functional, production-ready HTML applications that pass all specified checks."
+_REVISION_SYSTEM_PROMPT = "You are an expert web developer. You revise existing HTML applications with minimal, precise edits."
+_README_SYSTEM_PROMPT = "You are an expert at writing professional technical documentation."
+
+
+def _tier_cache_key(tier: str, system_prompt: str, prompt: str, temperature: float) -> str:
+    # Keyed by the tier's primary model on both sides, so a reply the fallback
+    # model produced is still found by the next lookup for the same tier
+    return cache_key(models_for_tier(tier)[0][0], system_prompt, prompt, temperature)
+
+
+def _cached_response(
+    caching: bool, tier: str, purpose: str, system_prompt: str, prompt: str, temperature: float
+) -> Optional[str]:
+    if not caching:
+        return None
+    primary_model = models_for_tier(tier)[0][0]
+    try:
+        cached = get_cached(_tier_cache_key(tier, system_prompt, prompt, temperature))
+        if cached is not None:
+            print(f"LLM cache hit ({primary_model}, {purpose})")
+        return cached
+    except Exception as e:
+        print(f"Warning: LLM cache lookup failed: {str(e)}")
+        return None
+
+
+def _store_response(
+    caching: bool, tier: str, system_prompt: str, prompt: str, temperature: float, content
+):
+    if caching and content:
+        try:
+            put_cached(_tier_cache_key(tier, system_prompt, prompt, temperature), content)
+        except Exception as e:
+            print(f"Warning: LLM cache store failed: {str(e)}")
+
+
+def _record_stream(span, model: str, purpose: str, stats):
+    # Streams carry no usage block, so count the character-based estimate
+    LLM_TOKENS.inc(stats["est_tokens"], model=model, purpose=purpose, kind="completion_estimated")
+    span.set_attributes(
+        **{"llm.completion_tokens_estimated": stats["est_tokens"], "llm.ttft": stats["ttft"]}
+    )
+
+
+def _record_usage(span, model: str, purpose: str, response) -> Optional[str]:
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        LLM_TOKENS.inc(usage.prompt_tokens or 0, model=model, purpose=purpose, kind="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens or 0, model=model, purpose=purpose, kind="completion")
+        span.set_attributes(
+            **{
+                "llm.prompt_tokens": usage.prompt_tokens,
+                "llm.completion_tokens": usage.completion_tokens,
+            }
+        )
+    return response.choices[0].message.content
+
+
+def _complete(
+    purpose: str,
+    tier: str,
+    reason: str,
+    system_prompt: str,
+    prompt: str,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    stream: bool = False,
+    stop_marker: Optional[str] = None,
+    postprocess: Optional[Callable[[Optional[str]], Optional[str]]] = None,
+) -> Optional[str]:
+    # postprocess validates the raw reply; a reply it rejects (None) is not cached
+    caching = cache_enabled(use_cache)
+    cached = _cached_response(caching, tier, purpose, system_prompt, prompt, temperature)
+    if cached is not None:
+        return postprocess(cached) if postprocess else cached
 
-def generate_app_code(
-    brief: str,
-    checks: list,
-    attachments: Optional[list] = None,
-    existing_code: Optional[str] = None,
-    round_num: int = 1,
-) -> Dict[str, str]:
     client = get_openai_client()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+    def call(model: str, timeout: float):
+        span = current_span()
+        span.set_attributes(
+            **{"llm.prompt_chars": len(system_prompt) + len(prompt), "llm.streaming": stream}
+        )
+        if stream:
+            # Fences are stripped while streaming, so the result is the bare document
+            content, stats = stream_completion(
+                client,
+                model,
+                messages,
+                temperature=temperature,
+                stop_marker=stop_marker,
+                deadline=min(timeout, LLM_STREAM_DEADLINE),
+            )
+            _record_stream(span, model, purpose, stats)
+        else:
+            # The router's fallback is the only retry; SDK retries would spend
+            # the timeout up to three times on the same model
+            response = client.with_options(max_retries=0).chat.completions.create(
+                model=model, messages=messages, temperature=temperature, timeout=timeout
+            )
+            content = _record_usage(span, model, purpose, response)
+        span.set_attribute("llm.response_chars", len(content or ""))
+        return model, content
+
+    _, content = call_with_fallback(purpose, tier, reason, call)
+    result = postprocess(content) if postprocess else content
+    if result is not None:
+        _store_response(caching, tier, system_prompt, prompt, temperature, content)
+    return result
+
+
+async def _complete_async(
+    purpose: str,
+    tier: str,
+    reason: str,
+    system_prompt: str,
+    prompt: str,
+    temperature: float = 0.7,
+    use_cache: bool = True,
+    stream: bool = False,
+    stop_marker: Optional[str] = None,
+    postprocess: Optional[Callable[[Optional[str]], Optional[str]]] = None,
+) -> Optional[str]:
+    # postprocess validates the raw reply; a reply it rejects (None) is not cached
+    caching = cache_enabled(use_cache)
+    cached = await asyncio.to_thread(
+        _cached_response, caching, tier, purpose, system_prompt, prompt, temperature
+    )
+    if cached is not None:
+        return postprocess(cached) if postprocess else cached
+
+    client = get_async_openai_client()
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+    async def call(model: str, timeout: float):
+        span = current_span()
+        span.set_attributes(
+            **{"llm.prompt_chars": len(system_prompt) + len(prompt), "llm.streaming": stream}
+        )
+        if stream:
+            content, stats = await stream_completion_async(
+                client,
+                model,
+                messages,
+                temperature=temperature,
+                stop_marker=stop_marker,
+                deadline=min(timeout, LLM_STREAM_DEADLINE),
+            )
+            _record_stream(span, model, purpose, stats)
+        else:
+            response = await client.with_options(max_retries=0).chat.completions.create(
+                model=model, messages=messages, temperature=temperature, timeout=timeout
+            )
+            content = _record_usage(span, model, purpose, response)
+        span.set_attribute("llm.response_chars", len(content or ""))
+        return model, content
 
-    attachments_info = ""
-    if attachments:
-        attachments_info = "\n\nAttachments (data URIs to embed):\n"
-        for att in attachments:
-            name = att.get("name", "unknown")
-            url = att.get("url", "")
-            attachments_info += f"- {name}: {url[:100]}...\n"
+    _, content = await call_with_fallback_async(purpose, tier, reason, call)
+    result = postprocess(content) if postprocess else content
+    if result is not None:
+        await asyncio.to_thread(
+            _store_response, caching, tier, system_prompt, prompt, temperature, content
+        )
+    return result
 
+
+def _attachments_info(attachments: Optional[list]) -> str:
+    if not attachments:
+        return ""
+    return (
+        "\n\nAttachments (deployed as files next to index.html):\n"
+        + describe_attachments(attachments)
+        + "\n"
+    )
+
+
+def _revision_prompt(
+    brief: str, checks: list, attachments_info: str, existing_code: str, round_num: int
+) -> str:
+    return f"""Revise this existing single-page web application (from round {round_num - 1}) to satisfy a new brief.
+
+EXISTING CODE:
+```html
+{existing_code}
+```
+
+New brief: {brief}
+
+Evaluation Checks (must all pass after your changes):
+{chr(10).join(["- " + check for check in checks])}
+{attachments_info}
+Preserve all working functionality unless the brief explicitly asks to change it.
+Load attachments from their relative file paths; never inline their contents.
+
+{PATCH_FORMAT}"""
+
+
+def _app_prompt(
+    brief: str, checks: list, attachments_info: str, existing_code: Optional[str], round_num: int
+) -> str:
     existing_context = ""
     if existing_code and round_num > 1:
         existing_context = f"""\n\nEXISTING CODE FROM ROUND {round_num - 1}:\n```html\n{existing_code}\n```\n\nIMPORTANT: Modify and enhance the existing code above according to the new brief below. Preserve all working functionality from previous rounds unless the brief explicitly asks to change it.\n"""
 
-    prompt = f"""Generate a complete, minimal single-page web application based on this brief:{existing_context}
+    return f"""Generate a complete, minimal single-page web application based on this brief:{existing_context}
 
 Brief: {brief}
 
@@ -35,7 +244,7 @@ Evaluation Checks (must all pass):
 Critical Requirements:
 1. Create a single HTML file with embedded CSS and JavaScript
 2. The app must satisfy ALL evaluation checks listed above
-3. If attachments are provided as data URIs, embed them directly in the HTML
+3. Load attachments from their relative file paths (e.g. fetch('data.csv')); never inline their contents
 4. Handle URL parameters (e.g., ?url=, ?token=) as specified in the brief
 5. Use CDN links for external libraries (Bootstrap, marked, highlight.js, etc.)
 6. Include proper error handling and user feedback
@@ -46,36 +255,9 @@ Critical Requirements:
 
 Return ONLY the complete HTML code with no explanations, no comments, no markdown formatting."""
 
-    response = client.chat.completions.create(
-        model="gemini-2.5-pro",  # Use GPT-4o-mini for OpenAI, or gemini-2.5-flash for Gemini
-        messages=[
-            {
-                "role": "system",
-                "content": "You are an expert web developer. Generate clean, functional, production-ready HTML applications that pass all specified checks.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7,
-    )
-
-    html_content = response.choices[0].message.content
-
-    if html_content is None:
-        print("No HTML content generated.")
-        return {"index.html": ""}
 
-    if "```html" in html_content:
-        html_content = html_content.split("```html")[1].split("```")[0].strip()
-    elif "```" in html_content:
-        html_content = html_content.split("```")[1].split("```")[0].strip()
-
-    return {"index.html": html_content}
-
-
-def generate_readme(task: str, brief: str, repo_url: str, pages_url: str) -> str:
-    client = get_openai_client()
-
-    prompt = f"""Generate a professional README.md for this project:
+def _readme_prompt(task: str, brief: str, repo_url: str, pages_url: str) -> str:
+    return f"""Generate a professional README.md for this project:
 
 Task: {task}
 Brief: {brief}
@@ -92,27 +274,162 @@ The README should include:
 
 Make it clear, professional, and well-structured with proper markdown formatting."""
 
-    response = client.chat.completions.create(
-        model="gemini-2.5-pro",  # Use GPT-4o-mini for OpenAI, or gemini-2.5-flash for Gemini
-        messages=[
-            {
-                "role": "system",
-                "content": "You are an expert at writing professional technical documentation.",
-            },
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7,
+
+def _strip_fence(content: str, language: str) -> str:
+    if f"```{language}" in content:
+        return content.split(f"```{language}")[1].split("```")[0].strip()
+    if "```" in content:
+        return content.split("```")[1].split("```")[0].strip()
+    return content
+
+
+def _apply_revision(existing_code: str, response: Optional[str]) -> Optional[str]:
+    try:
+        patched = patch_document(existing_code, response or "")
+    except PatchError as e:
+        print(f"Revision patch rejected ({str(e)}), falling back to full regeneration")
+        return None
+
+    print(
+        f"Applied revision patch: {len(response)} chars returned for a {len(patched)} char document"
     )
+    return patched
 
-    readme_content = response.choices[0].message.content
 
+def _app_files(html_content: Optional[str]) -> Dict[str, str]:
+    if html_content is None:
+        print("No HTML content generated.")
+        return {"index.html": ""}
+    return {"index.html": _strip_fence(html_content, "html")}
+
+
+def _readme_text(readme_content: Optional[str]) -> str:
     if readme_content is None:
         print("No README content generated.")
         return ""
+    return _strip_fence(readme_content, "markdown")
+
+
+def _use_patch(existing_code: Optional[str], round_num: int) -> bool:
+    return bool(existing_code) and round_num > 1 and LLM_REVISION_MODE == "patch"
+
+
+# The sync and async paths build identical requests from these and differ only in
+# which _complete they hand them to
+def _revision_request(
+    brief: str,
+    checks: list,
+    attachments: Optional[list],
+    attachments_info: str,
+    existing_code: str,
+    round_num: int,
+    use_cache: bool,
+) -> Dict[str, Any]:
+    tier, reason = choose_tier("code", brief, checks, attachments, round_num)
+    return dict(
+        purpose="code",
+        tier=tier,
+        reason=f"{reason}, patch",
+        system_prompt=_REVISION_SYSTEM_PROMPT,
+        prompt=_revision_prompt(brief, checks, attachments_info, existing_code, round_num),
+        temperature=0.2,
+        use_cache=use_cache,
+        postprocess=lambda response: _apply_revision(existing_code, response),
+    )
+
+
+def _revised_files(patched: Optional[str]) -> Optional[Dict[str, str]]:
+    if patched is None:
+        RETRIES.inc(operation="revision_full_rewrite")
+        return None
+    return {"index.html": patched}
+
+
+def _app_request(
+    brief: str,
+    checks: list,
+    attachments: Optional[list],
+    attachments_info: str,
+    existing_code: Optional[str],
+    round_num: int,
+    use_cache: bool,
+) -> Dict[str, Any]:
+    tier, reason = choose_tier("code", brief, checks, attachments, round_num)
+    return dict(
+        purpose="code",
+        tier=tier,
+        reason=reason,
+        system_prompt=_CODE_SYSTEM_PROMPT,
+        prompt=_app_prompt(brief, checks, attachments_info, existing_code, round_num),
+        temperature=0.7,
+        use_cache=use_cache,
+        stream=LLM_STREAMING,
+        stop_marker="</html>",
+    )
+
+
+def _readme_request(
+    task: str, brief: str, repo_url: str, pages_url: str, use_cache: bool
+) -> Dict[str, Any]:
+    tier, reason = choose_tier("readme", brief)
+    return dict(
+        purpose="readme",
+        tier=tier,
+        reason=reason,
+        system_prompt=_README_SYSTEM_PROMPT,
+        prompt=_readme_prompt(task, brief, repo_url, pages_url),
+        temperature=0.7,
+        use_cache=use_cache,
+    )
+
+
+def generate_app_code(
+    brief: str,
+    checks: list,
+    attachments: Optional[list] = None,
+    existing_code: Optional[str] = None,
+    round_num: int = 1,
+    use_cache: bool = True,
+) -> Dict[str, str]:
+    attachments_info = _attachments_info(attachments)
+    args = (brief, checks, attachments, attachments_info, existing_code, round_num, use_cache)
+
+    if _use_patch(existing_code, round_num):
+        files = _revised_files(_complete(**_revision_request(*args)))
+        if files is not None:
+            return files
+
+    return _app_files(_complete(**_app_request(*args)))
 
-    if "```markdown" in readme_content:
-        readme_content = readme_content.split("```markdown")[1].split("```")[0].strip()
-    elif "```" in readme_content:
-        readme_content = readme_content.split("```")[1].split("```")[0].strip()
 
-    return readme_content
\ No newline at end of file
+def generate_readme(
+    task: str, brief: str, repo_url: str, pages_url: str, use_cache: bool = True
+) -> str:
+    return _readme_text(_complete(**_readme_request(task, brief, repo_url, pages_url, use_cache)))
+
+
+async def generate_app_code_async(
+    brief: str,
+    checks: list,
+    attachments: Optional[list] = None,
+    existing_code: Optional[str] = None,
+    round_num: int = 1,
+    use_cache: bool = True,
+) -> Dict[str, str]:
+    attachments_info = _attachments_info(attachments)
+    args = (brief, checks, attachments, attachments_info, existing_code, round_num, use_cache)
+
+    if _use_patch(existing_code, round_num):
+        files = _revised_files(await _complete_async(**_revision_request(*args)))
+        if files is not None:
+            return files
+
+    return _app_files(await _complete_async(**_app_request(*args)))
+
+
+async def generate_readme_async(
+    task: str, brief: str, repo_url: str, pages_url: str, use_cache: bool = True
+) -> str:
+    return _readme_text(
+        await _complete_async(**_readme_request(task, brief, repo_url, pages_url, use_cache))
+    )
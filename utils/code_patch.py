@@ -0,0 +1,108 @@
+import re
+import threading
+from typing import Dict, List, Tuple
+
+# The separator only counts as a whole line inside a SEARCH block; a line of
+# "=======" elsewhere (an ASCII rule in HTML, CSS or markdown) is content
+_HUNK = re.compile(
+    r"<{7} SEARCH[ \t]*\r?\n(.*?)^={7}[ \t]*\r?\n(.*?)\r?\n?>{7} REPLACE",
+    re.DOTALL | re.MULTILINE,
+)
+_LINE_END = re.compile(r"\r?\n\Z")
+_MARKERS = ("<<<<<<< SEARCH", ">>>>>>> REPLACE")
+
+_lock = threading.Lock()
+_stats = {"attempts": 0, "applied": 0, "failed": 0, "hunks": 0}
+
+PATCH_FORMAT = """Return ONLY search/replace blocks in exactly this format, one block per change:
+<<<<<<< SEARCH
+exact lines copied from the existing code
+=======
+the lines that replace them
+>>>>>>> REPLACE
+
+Rules:
+- The SEARCH part must match the existing code exactly, including indentation, and be unique in the file
+- Keep each SEARCH part as short as possible while staying unique
+- To insert code, SEARCH for the neighbouring line and repeat it in REPLACE together with the new lines
+- Do not return the whole file and do not add explanations or markdown fences"""
+
+
+class PatchError(ValueError):
+    pass
+
+
+def parse_patch(text: str) -> List[Tuple[str, str]]:
+    hunks = [(_LINE_END.sub("", m.group(1)), m.group(2)) for m in _HUNK.finditer(text or "")]
+    if not hunks:
+        raise PatchError("response contains no search/replace blocks")
+    return hunks
+
+
+def _find_loose(source: str, search: str) -> Tuple[int, int]:
+    # Second chance for hunks whose only difference is trailing whitespace
+    source_lines = source.splitlines(keepends=True)
+    wanted = [line.rstrip() for line in search.splitlines()]
+    matches = []
+    for start in range(len(source_lines) - len(wanted) + 1):
+        window = source_lines[start:start + len(wanted)]
+        if [line.rstrip() for line in window] == wanted:
+            matches.append(start)
+    if len(matches) != 1:
+        return -1, -1
+    window = source_lines[matches[0]:matches[0] + len(wanted)]
+    begin = sum(len(line) for line in source_lines[:matches[0]])
+    # Replace up to the end of the last line's text, keeping its line break
+    length = sum(len(line) for line in window[:-1]) + len(window[-1].rstrip())
+    return begin, begin + length
+
+
+def apply_patch(source: str, hunks: List[Tuple[str, str]]) -> str:
+    for number, (search, replace) in enumerate(hunks, start=1):
+        if not search.strip():
+            raise PatchError(f"hunk {number} has an empty SEARCH part")
+        count = source.count(search)
+        if count == 1:
+            source = source.replace(search, replace, 1)
+            continue
+        if count > 1:
+            raise PatchError(f"hunk {number} matches {count} places")
+        begin, end = _find_loose(source, search)
+        if begin < 0:
+            raise PatchError(f"hunk {number} does not match the existing code")
+        source = source[:begin] + replace + source[end:]
+    return source
+
+
+def validate_document(html: str):
+    lowered = html.lower()
+    if "<html" not in lowered or "</html>" not in lowered:
+        raise PatchError("patched document is not a complete HTML page")
+    if any(marker in html for marker in _MARKERS):
+        raise PatchError("patched document still contains patch markers")
+    if lowered.count("<script") != lowered.count("</script>"):
+        raise PatchError("patched document has unbalanced <script> tags")
+    if lowered.count("<style") != lowered.count("</style>"):
+        raise PatchError("patched document has unbalanced <style> tags")
+
+
+def patch_document(source: str, response: str) -> str:
+    with _lock:
+        _stats["attempts"] += 1
+    try:
+        hunks = parse_patch(response)
+        patched = apply_patch(source, hunks)
+        validate_document(patched)
+    except PatchError:
+        with _lock:
+            _stats["failed"] += 1
+        raise
+    with _lock:
+        _stats["applied"] += 1
+        _stats["hunks"] += len(hunks)
+    return patched
+
+
+def get_revision_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
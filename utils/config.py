@@ -1,8 +1,8 @@
 import os
 import sys
+import tempfile
+import threading
 from dotenv import load_dotenv
-from openai import OpenAI
-from github import Github
 
 load_dotenv()
 
@@ -12,9 +12,108 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY", "")
 SECRET = os.getenv("SECRET", "")
 GITHUB_USERNAME = os.getenv("GITHUB_USERNAME", "")
 PORT = int(os.getenv("PORT", 5000))
+DEBUG = os.getenv("FLASK_DEBUG", "false").lower() in ("1", "true", "yes")
+# Set by gunicorn.conf.py: the app is imported once in the master and forked, so
+# background threads are started per worker by its post_fork hook instead
+PREFORK = os.getenv("PREFORK", "false").lower() in ("1", "true", "yes")
+
+# Async job mode: acknowledge immediately and run the pipeline on a worker pool
+ASYNC_JOBS = os.getenv("ASYNC_JOBS", "false").lower() in ("1", "true", "yes")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 4))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 32))
+JOB_HISTORY_SIZE = int(os.getenv("JOB_HISTORY_SIZE", 500))
+# Pipelines the ASGI app runs at once on its event loop
+ASYNC_MAX_JOBS = int(os.getenv("ASYNC_MAX_JOBS", 64))
+# Threads used to run independent pipeline steps of a single task concurrently
+PIPELINE_WORKERS = int(os.getenv("PIPELINE_WORKERS", 4))
+
+# Local state (idempotency records, caches); /tmp is the only writable path on Vercel
+STATE_DIR = os.getenv("STATE_DIR", os.path.join(tempfile.gettempdir(), "llm-deploy"))
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 24 * 3600))
+IDEMPOTENCY_STALE_AFTER = int(os.getenv("IDEMPOTENCY_STALE_AFTER", 900))
+IDEMPOTENCY_WAIT_TIMEOUT = int(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 600))
+# How long finished step outputs are kept for resuming an interrupted job
+JOB_STORE_TTL = int(os.getenv("JOB_STORE_TTL", 24 * 3600))
+
+# On-disk cache of LLM completions keyed by (model, prompts, temperature)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "true").lower() not in ("0", "false", "no", "off")
+LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 500))
+LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+# Model routing: simple briefs and READMEs go to the fast tier, the rest to the strong tier
+LLM_FAST_MODEL = os.getenv(
+    "LLM_FAST_MODEL", "gemini-2.5-flash" if GEMINI_API_KEY else "gpt-4o-mini"
+)
+LLM_STRONG_MODEL = os.getenv(
+    "LLM_STRONG_MODEL", "gemini-2.5-pro" if GEMINI_API_KEY else "gpt-4o"
+)
+LLM_FAST_TIMEOUT = float(os.getenv("LLM_FAST_TIMEOUT", 120))
+LLM_STRONG_TIMEOUT = float(os.getenv("LLM_STRONG_TIMEOUT", 300))
+# "auto" (default), or "fast"/"strong" to pin every call to one tier
+LLM_ROUTING = os.getenv("LLM_ROUTING", "auto").lower()
+# Later rounds ask for search/replace hunks against the previous code ("patch") or a full file ("full")
+LLM_REVISION_MODE = os.getenv("LLM_REVISION_MODE", "patch").lower()
+
+# Shared keep-alive HTTP transport (GitHub REST/Pages, evaluation notifier)
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", 4))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 16))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 10))
+
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+# Where Pages serves a repository; overridable so benchmarks can point at a local stand-in
+PAGES_URL_TEMPLATE = os.getenv("PAGES_URL_TEMPLATE", "https://{owner}.github.io/{repo}/")
+# Optional OpenAI-compatible endpoint (e.g. a proxy or the benchmark's fake server)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "")
+# Persistent ETag/Last-Modified cache for conditional GitHub reads
+ETAG_CACHE_MAX_ENTRIES = int(os.getenv("ETAG_CACHE_MAX_ENTRIES", 2000))
+
+# Scheduler in front of GitHub calls: token bucket for writes, queue when the budget is low
+GITHUB_WRITE_RATE = float(os.getenv("GITHUB_WRITE_RATE", 1.0))
+GITHUB_WRITE_BURST = int(os.getenv("GITHUB_WRITE_BURST", 3))
+GITHUB_RATE_RESERVE = int(os.getenv("GITHUB_RATE_RESERVE", 50))
+GITHUB_MAX_QUEUE_WAIT = float(os.getenv("GITHUB_MAX_QUEUE_WAIT", 300))
+
+# Per-request traces written as OTLP JSON lines to a rotating local file
+TRACING_ENABLED = os.getenv("TRACING", "true").lower() in ("1", "true", "yes")
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join(STATE_DIR, "traces", "traces.jsonl"))
+TRACE_MAX_BYTES = int(os.getenv("TRACE_MAX_BYTES", 10 * 1024 * 1024))
+TRACE_BACKUPS = int(os.getenv("TRACE_BACKUPS", 5))
+
+# Cache of GitHub users/repos/heads shared across requests for a short time
+GITHUB_CACHE_TTL = float(os.getenv("GITHUB_CACHE_TTL", 60))
+GITHUB_PAGES_CACHE_TTL = float(os.getenv("GITHUB_PAGES_CACHE_TTL", 3600))
+GITHUB_CACHE_MAX_ENTRIES = int(os.getenv("GITHUB_CACHE_MAX_ENTRIES", 1000))
+# Local copy of the files we last deployed per repository, used to bootstrap revisions
+DEPLOY_MIRROR_MAX_REPOS = int(os.getenv("DEPLOY_MIRROR_MAX_REPOS", 200))
+
+# Evaluation notifications go through a durable outbox retried in the background
+NOTIFY_DEADLINE = float(os.getenv("NOTIFY_DEADLINE", 600))
+NOTIFY_MAX_BACKOFF = float(os.getenv("NOTIFY_MAX_BACKOFF", 60))
+NOTIFY_WORKERS = int(os.getenv("NOTIFY_WORKERS", 4))
+
+# Hold the notification until Pages has built the pushed commit and serves 200 (0 disables)
+PAGES_READY_TIMEOUT = float(os.getenv("PAGES_READY_TIMEOUT", 300))
+PAGES_POLL_MIN = float(os.getenv("PAGES_POLL_MIN", 2))
+PAGES_POLL_MAX = float(os.getenv("PAGES_POLL_MAX", 15))
+
+# Streaming generation: consume completions incrementally and abort runaway output
+LLM_STREAMING = os.getenv("LLM_STREAMING", "false").lower() in ("1", "true", "yes")
+LLM_STREAM_DEADLINE = float(os.getenv("LLM_STREAM_DEADLINE", 240))
+LLM_STREAM_MAX_CHARS = int(os.getenv("LLM_STREAM_MAX_CHARS", 400_000))
+
+# Attachments are decoded and committed as files; the prompt only sees a short sample
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", 10 * 1024 * 1024))
+ATTACHMENT_MAX_TOTAL_BYTES = int(os.getenv("ATTACHMENT_MAX_TOTAL_BYTES", 25 * 1024 * 1024))
+ATTACHMENT_SAMPLE_CHARS = int(os.getenv("ATTACHMENT_SAMPLE_CHARS", 400))
+
+# Build the SDK clients in a background thread after boot instead of on the first request
+WARM_CLIENTS = os.getenv("WARM_CLIENTS", "true").lower() not in ("0", "false", "no", "off")
 
 _openai_client = None
+_async_openai_clients = {}
 _github_client = None
+_client_lock = threading.Lock()
 
 
 def validate_config():
@@ -51,7 +150,11 @@ def validate_config():
             f"  - Gemini API Key: {'*' * 10}{GEMINI_API_KEY[-4:] if len(GEMINI_API_KEY) > 4 else '****'}"
         )
     print(f"  - Secret: {'*' * len(SECRET)}")
-    print(f"  - Port: {PORT}\n")
+    print(f"  - Port: {PORT}")
+    print(
+        f"  - Async Jobs: {'enabled' if ASYNC_JOBS else 'disabled'} "
+        f"({JOB_WORKERS} workers, queue {JOB_QUEUE_SIZE})\n"
+    )
 
 
 def load_config():
@@ -62,12 +165,22 @@ def load_config():
         "secret": SECRET,
         "github_username": GITHUB_USERNAME,
         "port": PORT,
+        "async_jobs": ASYNC_JOBS,
+        "job_workers": JOB_WORKERS,
+        "job_queue_size": JOB_QUEUE_SIZE,
     }
 
 
 def get_openai_client():
     global _openai_client
-    if _openai_client is None:
+    if _openai_client is not None:
+        return _openai_client
+    # The SDKs are imported on first use; together they dominate cold-start import time
+    from openai import OpenAI
+
+    with _client_lock:
+        if _openai_client is not None:
+            return _openai_client
         if GEMINI_API_KEY:
             # Use Gemini via OpenAI-compatible API
             _openai_client = OpenAI(
@@ -75,16 +188,82 @@ def get_openai_client():
                 base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
             )
         elif OPENAI_API_KEY:
-            _openai_client = OpenAI(api_key=OPENAI_API_KEY)
+            _openai_client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None)
         else:
             raise ValueError("Neither OPENAI_API_KEY nor GEMINI_API_KEY is set in environment")
     return _openai_client
 
 
+def get_async_openai_client():
+    # AsyncOpenAI pools connections on the event loop it first runs on, so keep one per loop
+    import asyncio
+    from openai import AsyncOpenAI
+
+    loop = asyncio.get_running_loop()
+    with _client_lock:
+        client = _async_openai_clients.get(loop)
+        if client is None:
+            if GEMINI_API_KEY:
+                client = AsyncOpenAI(
+                    api_key=GEMINI_API_KEY,
+                    base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+                )
+            elif OPENAI_API_KEY:
+                client = AsyncOpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL or None)
+            else:
+                raise ValueError("Neither OPENAI_API_KEY nor GEMINI_API_KEY is set in environment")
+            for stale in [l for l in _async_openai_clients if l.is_closed()]:
+                del _async_openai_clients[stale]
+            _async_openai_clients[loop] = client
+    return client
+
+
+async def close_async_openai_client():
+    import asyncio
+
+    with _client_lock:
+        client = _async_openai_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.close()
+
+
 def get_github_client():
     global _github_client
-    if _github_client is None:
+    if _github_client is not None:
+        return _github_client
+    from github import Github
+
+    with _client_lock:
+        if _github_client is not None:
+            return _github_client
         if not GITHUB_TOKEN:
             raise ValueError("GITHUB_TOKEN not set in environment")
-        _github_client = Github(GITHUB_TOKEN)
-    return _github_client
\ No newline at end of file
+        # Pacing and rate-limit backoff are done by utils.github_scheduler, so
+        # PyGithub's own throttle and its sleeping retry on 403/429 are off
+        _github_client = Github(
+            GITHUB_TOKEN,
+            base_url=GITHUB_API_URL,
+            pool_size=HTTP_POOL_MAXSIZE,
+            retry=None,
+            seconds_between_requests=None,
+            seconds_between_writes=None,
+        )
+    return _github_client
+
+
+def _warm_clients():
+    for name, getter in (("OpenAI", get_openai_client), ("GitHub", get_github_client)):
+        try:
+            getter()
+        except Exception as e:
+            print(f"Warning: Could not warm {name} client: {str(e)}")
+
+
+def warm_clients():
+    if not WARM_CLIENTS:
+        return
+    if PREFORK:
+        # Before fork no request is waiting, and every worker inherits the loaded SDKs
+        _warm_clients()
+    else:
+        threading.Thread(target=_warm_clients, name="client-warmup", daemon=True).start()
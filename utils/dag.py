@@ -0,0 +1,167 @@
+import asyncio
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class Step:
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Dict[str, Any]], Any],
+        deps: Optional[List[str]] = None,
+        label: Optional[str] = None,
+        checkpoint: bool = False,
+    ):
+        self.name = name
+        self.fn = fn
+        self.deps = deps or []
+        # Human readable stage name used in error messages ("generating code", ...)
+        self.label = label or name
+        # Output is JSON-serialisable and worth persisting for resumed runs
+        self.checkpoint = checkpoint
+
+
+class StepFailed(RuntimeError):
+    def __init__(self, step: Step, cause: Exception):
+        super().__init__(str(cause))
+        self.step = step
+        self.cause = cause
+
+
+def _required_steps(steps: List[Step], completed: Dict[str, Any]) -> List[Step]:
+    # A step still has to run if it is not done and either nothing depends on it
+    # or something that still has to run depends on it
+    dependents: Dict[str, List[str]] = {step.name: [] for step in steps}
+    for step in steps:
+        for dep in step.deps:
+            dependents[dep].append(step.name)
+
+    required: Dict[str, bool] = {}
+
+    def is_required(name: str) -> bool:
+        if name not in required:
+            if name in completed:
+                required[name] = False
+            else:
+                # Provisional answer so a dependency cycle ends here; the
+                # scheduler then reports it instead of recursing forever
+                required[name] = True
+                downstream = dependents[name]
+                required[name] = not downstream or any(is_required(d) for d in downstream)
+        return required[name]
+
+    return [step for step in steps if is_required(step.name)]
+
+
+def _prepare(
+    steps: List[Step], completed: Optional[Dict[str, Any]]
+) -> Tuple[Dict[str, Any], List[Step]]:
+    by_name = {step.name: step for step in steps}
+    for step in steps:
+        for dep in step.deps:
+            if dep not in by_name:
+                raise ValueError(f"Step '{step.name}' depends on unknown step '{dep}'")
+
+    completed = {name: value for name, value in (completed or {}).items() if name in by_name}
+    return dict(completed), _required_steps(steps, completed)
+
+
+def run_dag(
+    steps: List[Step],
+    max_workers: int = 4,
+    completed: Optional[Dict[str, Any]] = None,
+    on_complete: Optional[Callable[[Step, Any], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    results, pending = _prepare(steps, completed)
+    timings: Dict[str, float] = {}
+    running = {}
+
+    def _timed(step: Step, inputs: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            return step.fn(inputs)
+        finally:
+            timings[step.name] = round(time.perf_counter() - started, 3)
+
+    pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="pipeline")
+    try:
+        while pending or running:
+            ready = [s for s in pending if all(d in results for d in s.deps)]
+            for step in ready:
+                pending.remove(step)
+                inputs = {dep: results[dep] for dep in step.deps}
+                # Each step inherits the caller's context (request-scoped caches)
+                ctx = contextvars.copy_context()
+                running[pool.submit(ctx.run, _timed, step, inputs)] = step
+
+            if not running:
+                names = ", ".join(s.name for s in pending)
+                raise ValueError(f"Dependency cycle between steps: {names}")
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                try:
+                    results[step.name] = future.result()
+                except Exception as e:
+                    raise StepFailed(step, e) from e
+                if on_complete is not None:
+                    on_complete(step, results[step.name])
+    finally:
+        # On failure return now instead of waiting for siblings that are still
+        # running; they finish in the background and their results are dropped
+        pool.shutdown(wait=not running, cancel_futures=True)
+
+    return results, timings
+
+
+async def run_dag_async(
+    steps: List[Step],
+    completed: Optional[Dict[str, Any]] = None,
+    on_complete: Optional[Callable[[Step, Any], None]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    # Same contract as run_dag, but each step fn is a coroutine function and
+    # independent steps interleave on the running event loop
+    results, pending = _prepare(steps, completed)
+    timings: Dict[str, float] = {}
+    running: Dict[asyncio.Task, Step] = {}
+
+    async def _timed(step: Step, inputs: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            return await step.fn(inputs)
+        finally:
+            timings[step.name] = round(time.perf_counter() - started, 3)
+
+    try:
+        while pending or running:
+            ready = [s for s in pending if all(d in results for d in s.deps)]
+            for step in ready:
+                pending.remove(step)
+                inputs = {dep: results[dep] for dep in step.deps}
+                # Tasks copy the current context, as ctx.run does for the thread pool
+                running[asyncio.ensure_future(_timed(step, inputs))] = step
+
+            if not running:
+                names = ", ".join(s.name for s in pending)
+                raise ValueError(f"Dependency cycle between steps: {names}")
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step = running.pop(task)
+                try:
+                    results[step.name] = task.result()
+                except Exception as e:
+                    raise StepFailed(step, e) from e
+                if on_complete is not None:
+                    # Checkpoints are sqlite writes; keep them off the event loop
+                    await asyncio.to_thread(on_complete, step, results[step.name])
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    return results, timings
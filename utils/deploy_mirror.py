@@ -0,0 +1,136 @@
+import threading
+import time
+from typing import Any, Dict, Optional, Union
+
+from .config import DEPLOY_MIRROR_MAX_REPOS
+from .state import get_connection
+
+_DB_NAME = "mirror.db"
+_lock = threading.Lock()
+_initialized = False
+_stats = {"hits": 0, "stale": 0, "misses": 0, "records": 0}
+
+
+def _db():
+    global _initialized
+    conn = get_connection(_DB_NAME)
+    if not _initialized:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS deployments (
+                repo TEXT NOT NULL,
+                branch TEXT NOT NULL,
+                commit_sha TEXT NOT NULL,
+                deployed_at REAL NOT NULL,
+                PRIMARY KEY (repo, branch)
+            )"""
+        )
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS deployed_files (
+                repo TEXT NOT NULL,
+                branch TEXT NOT NULL,
+                path TEXT NOT NULL,
+                is_text INTEGER NOT NULL,
+                content BLOB NOT NULL,
+                PRIMARY KEY (repo, branch, path)
+            )"""
+        )
+        _initialized = True
+    return conn
+
+
+def record_deployment(
+    repo: str,
+    branch: str,
+    parent_sha: str,
+    commit_sha: str,
+    files: Dict[str, Union[str, bytes]],
+):
+    with _lock:
+        conn = _db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT commit_sha FROM deployments WHERE repo = ? AND branch = ?",
+                (repo, branch),
+            ).fetchone()
+            # A commit on top of the mirrored one only touches some files; anything
+            # else means we no longer know the full file set and start over
+            if row is None or row["commit_sha"] != parent_sha:
+                conn.execute(
+                    "DELETE FROM deployed_files WHERE repo = ? AND branch = ?",
+                    (repo, branch),
+                )
+            conn.executemany(
+                """INSERT OR REPLACE INTO deployed_files (repo, branch, path, is_text, content)
+                   VALUES (?, ?, ?, ?, ?)""",
+                [
+                    (
+                        repo,
+                        branch,
+                        path,
+                        int(isinstance(content, str)),
+                        content.encode("utf-8") if isinstance(content, str) else content,
+                    )
+                    for path, content in files.items()
+                ],
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO deployments (repo, branch, commit_sha, deployed_at) VALUES (?, ?, ?, ?)",
+                (repo, branch, commit_sha, time.time()),
+            )
+            conn.execute(
+                """DELETE FROM deployments WHERE rowid NOT IN (
+                    SELECT rowid FROM deployments ORDER BY deployed_at DESC LIMIT ?
+                )""",
+                (DEPLOY_MIRROR_MAX_REPOS,),
+            )
+            conn.execute(
+                """DELETE FROM deployed_files WHERE NOT EXISTS (
+                    SELECT 1 FROM deployments d
+                    WHERE d.repo = deployed_files.repo AND d.branch = deployed_files.branch
+                )"""
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        _stats["records"] += 1
+
+
+def find_repo(name: str, branch: str) -> Optional[str]:
+    # Full name of the most recently deployed repository called `name`
+    with _lock:
+        row = _db().execute(
+            """SELECT repo FROM deployments WHERE repo LIKE ? ESCAPE '\\' AND branch = ?
+               ORDER BY deployed_at DESC LIMIT 1""",
+            ("%/" + name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_"), branch),
+        ).fetchone()
+        if row is None:
+            _stats["misses"] += 1
+    return row["repo"] if row else None
+
+
+def load_files(repo: str, branch: str, commit_sha: str) -> Optional[Dict[str, Union[str, bytes]]]:
+    with _lock:
+        conn = _db()
+        row = conn.execute(
+            "SELECT commit_sha FROM deployments WHERE repo = ? AND branch = ?",
+            (repo, branch),
+        ).fetchone()
+        if row is None or row["commit_sha"] != commit_sha:
+            _stats["stale"] += 1
+            return None
+        rows = conn.execute(
+            "SELECT path, is_text, content FROM deployed_files WHERE repo = ? AND branch = ?",
+            (repo, branch),
+        ).fetchall()
+        _stats["hits"] += 1
+    return {
+        r["path"]: bytes(r["content"]).decode("utf-8") if r["is_text"] else bytes(r["content"])
+        for r in rows
+    }
+
+
+def get_mirror_stats() -> Dict[str, Any]:
+    with _lock:
+        return dict(_stats)
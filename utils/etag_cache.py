@@ -0,0 +1,109 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from .config import ETAG_CACHE_MAX_ENTRIES
+from .state import get_connection
+
+_DB_NAME = "http_cache.db"
+_lock = threading.Lock()
+_initialized = False
+_stats = {"conditional_requests": 0, "not_modified": 0, "stores": 0}
+
+
+def _db():
+    global _initialized
+    conn = get_connection(_DB_NAME)
+    if not _initialized:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS etag_cache (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        _initialized = True
+    return conn
+
+
+def entry_key(url: str, headers: Optional[Dict[str, str]]) -> str:
+    # Responses depend on who asks (token) and in which format (Accept)
+    headers = {k.lower(): v for k, v in (headers or {}).items()}
+    identity = json.dumps([url, headers.get("authorization", ""), headers.get("accept", "")])
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+def get_entry(key: str) -> Optional[Dict[str, Any]]:
+    with _lock:
+        row = _db().execute(
+            "SELECT etag, last_modified, status, headers, body FROM etag_cache WHERE key = ?",
+            (key,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "etag": row["etag"],
+        "last_modified": row["last_modified"],
+        "status": row["status"],
+        "headers": json.loads(row["headers"]),
+        "body": bytes(row["body"]),
+    }
+
+
+def store_entry(
+    key: str,
+    url: str,
+    etag: Optional[str],
+    last_modified: Optional[str],
+    status: int,
+    headers: Dict[str, str],
+    body: bytes,
+):
+    now = time.time()
+    with _lock:
+        conn = _db()
+        conn.execute(
+            """INSERT OR REPLACE INTO etag_cache
+               (key, url, etag, last_modified, status, headers, body, last_access)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+            (key, url, etag, last_modified, status, json.dumps(headers), body, now),
+        )
+        _stats["stores"] += 1
+        count = conn.execute("SELECT COUNT(*) FROM etag_cache").fetchone()[0]
+        if count > ETAG_CACHE_MAX_ENTRIES:
+            conn.execute(
+                """DELETE FROM etag_cache WHERE key IN (
+                    SELECT key FROM etag_cache ORDER BY last_access ASC LIMIT ?
+                )""",
+                (count - ETAG_CACHE_MAX_ENTRIES,),
+            )
+
+
+def touch_entry(key: str):
+    with _lock:
+        _db().execute(
+            "UPDATE etag_cache SET last_access = ? WHERE key = ?", (time.time(), key)
+        )
+
+
+def drop_entry(key: str):
+    with _lock:
+        _db().execute("DELETE FROM etag_cache WHERE key = ?", (key,))
+
+
+def record(not_modified: bool):
+    with _lock:
+        _stats["conditional_requests"] += 1
+        _stats["not_modified"] += int(not_modified)
+
+
+def get_etag_stats() -> Dict[str, int]:
+    with _lock:
+        return dict(_stats)
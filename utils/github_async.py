@@ -0,0 +1,403 @@
+import asyncio
+import base64
+from typing import Any, Dict, Optional, Tuple, Union
+
+from .config import (
+    GITHUB_API_URL,
+    GITHUB_PAGES_CACHE_TTL,
+    PAGES_URL_TEMPLATE,
+)
+from . import deploy_mirror, github_cache, http_transport
+from .github_manager import deployment_files, git_blob_sha, github_headers
+from .github_scheduler import scheduled_request_async
+from .metrics import RETRIES
+
+# Async counterparts of the github_manager deploy path. Everything goes through
+# the REST and Git Data APIs directly (PyGithub is synchronous), paced by the
+# same scheduler budget as the sync path.
+
+_MAX_ATTEMPTS = 4
+_RETRY_STATUSES = (500, 502, 503, 504)
+_BACKOFF_BASE = 1.0
+_BACKOFF_MAX = 10.0
+
+
+class GitHubAPIError(RuntimeError):
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status} {message}")
+        self.status = status
+
+
+async def github_request(method: str, path: str, **kwargs):
+    import httpx
+
+    url = f"{GITHUB_API_URL}{path}"
+    mutating = method != "GET"
+
+    async def send():
+        if mutating:
+            return await http_transport.request_async(
+                method, url, headers=github_headers(), **kwargs
+            )
+        return await http_transport.conditional_get_async(url, headers=github_headers(), **kwargs)
+
+    for attempt in range(_MAX_ATTEMPTS):
+        error = None
+        try:
+            response = await scheduled_request_async(send, mutating=mutating)
+            if response.status_code not in _RETRY_STATUSES:
+                return response
+            error = f"{response.status_code} {response.text[:200]}"
+        except httpx.TransportError as e:
+            if attempt == _MAX_ATTEMPTS - 1:
+                raise
+            error = str(e) or type(e).__name__
+        if attempt == _MAX_ATTEMPTS - 1:
+            return response
+
+        delay = min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt)
+        print(f"GitHub {method} {path} failed ({error}), retrying in {delay:.0f}s...")
+        RETRIES.inc(operation="github_server_error")
+        await asyncio.sleep(delay)
+
+
+async def github_get(path: str, **kwargs):
+    return await github_request("GET", path, **kwargs)
+
+
+def _json_or_raise(response, *expected: int) -> Dict[str, Any]:
+    if response.status_code not in expected:
+        raise GitHubAPIError(response.status_code, response.text)
+    return response.json()
+
+
+async def get_login() -> str:
+    login = github_cache.lookup("login")
+    if login is github_cache.MISSING:
+        login = _json_or_raise(await github_get("/user"), 200)["login"]
+        github_cache.remember("login", login)
+    return login
+
+
+async def get_repo(owner: str, repo_name: str) -> Optional[Dict[str, Any]]:
+    key = f"repo-json:{owner}/{repo_name}"
+    repo = github_cache.lookup(key)
+    if repo is github_cache.MISSING:
+        r = await github_get(f"/repos/{owner}/{repo_name}")
+        if r.status_code == 404:
+            return None
+        repo = _json_or_raise(r, 200)
+        github_cache.remember(key, repo)
+    return repo
+
+
+async def find_repo(task: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    try:
+        owner = await get_login()
+    except Exception as e:
+        print(f"Failed to authenticate with GitHub: {str(e)}")
+        print("Please check your GITHUB_TOKEN in .env file")
+        raise
+    try:
+        return owner, await get_repo(owner, task)
+    except GitHubAPIError as e:
+        raise RuntimeError(f"Failed to check repository existence: {str(e)}")
+
+
+async def get_or_create_repo(
+    task: str, round_num: int, owner: Optional[str] = None, repo: Optional[Dict[str, Any]] = None
+) -> Tuple[Dict[str, Any], str]:
+    if owner is None:
+        owner, repo = await find_repo(task)
+
+    if repo is not None:
+        print(f"Repository {task} already exists, updating for round {round_num}...")
+        return repo, owner
+
+    print(f"Creating new repository {task}...")
+    # auto_init gives the repo a branch to commit on top of, as in the sync path
+    r = await github_request(
+        "POST",
+        "/user/repos",
+        json={
+            "name": task,
+            "description": f"Generated app for task: {task}",
+            "private": False,
+            "auto_init": True,
+        },
+    )
+    if r.status_code == 201:
+        repo = r.json()
+        github_cache.remember(f"repo-json:{owner}/{task}", repo)
+        print(f"Repository {task} created successfully")
+        return repo, owner
+    if r.status_code == 422 and "name already exists" in r.text.lower():
+        print(f"Repository {task} was just created by another process, fetching it...")
+        repo = await get_repo(owner, task)
+        if repo is not None:
+            return repo, owner
+        raise RuntimeError(
+            f"Repository creation race condition: cannot fetch {task} after failed create"
+        )
+    raise RuntimeError(f"Failed to create repository: {r.status_code} {r.text}")
+
+
+async def _branch_head_sha(full_name: str, branch: str) -> Optional[str]:
+    head = github_cache.lookup(f"head-sha:{full_name}/{branch}")
+    if head is not github_cache.MISSING:
+        return head[1]
+    r = await github_get(f"/repos/{full_name}/git/ref/heads/{branch}")
+    if r.status_code != 200:
+        return None
+    return r.json()["object"]["sha"]
+
+
+async def get_existing_code(task: str, path: str = "index.html") -> Optional[str]:
+    try:
+        full_name = await asyncio.to_thread(deploy_mirror.find_repo, task, "main")
+        if full_name is not None:
+            head_sha = await _branch_head_sha(full_name, "main")
+            files = head_sha and await asyncio.to_thread(
+                deploy_mirror.load_files, full_name, "main", head_sha
+            )
+            if files and isinstance(files.get(path), str):
+                print(f"Successfully retrieved {path} from {task} via local mirror (size: {len(files[path])} chars)")
+                return files[path]
+    except Exception as e:
+        print(f"Warning: Local deploy mirror unavailable: {str(e)}")
+
+    try:
+        owner = await get_login()
+        r = await github_get(f"/repos/{owner}/{task}/contents/{path}", params={"ref": "main"})
+        if r.status_code == 404:
+            print(f"File '{path}' not found in repository '{task}' (this is OK)")
+            return None
+        if r.status_code != 200:
+            print(f"Error fetching {path} from {task}: {r.status_code} {r.text}")
+            return None
+        contents = r.json()
+        if isinstance(contents, dict) and contents.get("encoding") == "base64":
+            decoded = base64.b64decode(contents["content"]).decode("utf-8")
+            source = "cache" if r.from_cache else "GitHub"
+            print(f"Successfully retrieved {path} from {task} via {source} (size: {len(decoded)} chars)")
+            return decoded
+        print(f"File {path} exists but has no content")
+        return None
+    except Exception as e:
+        print(f"Unexpected error fetching existing code from {task}: {str(e)}")
+        return None
+
+
+async def _load_head(full_name: str, branch: str) -> Tuple[bool, str, str]:
+    # (branch exists, head commit SHA, head tree SHA)
+    r = await github_get(f"/repos/{full_name}/git/ref/heads/{branch}")
+    exists = r.status_code == 200
+    if not exists:
+        if r.status_code != 404:
+            raise GitHubAPIError(r.status_code, r.text)
+        # Branch does not exist yet: build on the default branch and create the ref afterwards
+        owner, name = full_name.split("/", 1)
+        repo = await get_repo(owner, name)
+        default = (repo or {}).get("default_branch") or "main"
+        r = await github_get(f"/repos/{full_name}/git/ref/heads/{default}")
+    head_sha = _json_or_raise(r, 200)["object"]["sha"]
+    commit = _json_or_raise(await github_get(f"/repos/{full_name}/git/commits/{head_sha}"), 200)
+    return exists, head_sha, commit["tree"]["sha"]
+
+
+async def get_known_tree(full_name: str, commit_sha: str, tree_sha: str) -> Dict[str, str]:
+    # Shares the "tree:" cache entries with the sync path; both map path -> blob SHA
+    key = f"tree:{full_name}@{commit_sha}"
+    known = github_cache.lookup(key)
+    if known is github_cache.MISSING:
+        tree = _json_or_raise(
+            await github_get(f"/repos/{full_name}/git/trees/{tree_sha}", params={"recursive": "1"}),
+            200,
+        )
+        known = {e["path"]: e["sha"] for e in tree.get("tree", []) if e.get("type") == "blob"}
+        github_cache.remember(key, known)
+    return known
+
+
+async def _tree_element(full_name: str, path: str, content: Union[str, bytes]) -> Dict[str, Any]:
+    if isinstance(content, str):
+        return {"path": path, "mode": "100644", "type": "blob", "content": content}
+    r = await github_request(
+        "POST",
+        f"/repos/{full_name}/git/blobs",
+        json={"content": base64.b64encode(content).decode("ascii"), "encoding": "base64"},
+    )
+    return {"path": path, "mode": "100644", "type": "blob", "sha": _json_or_raise(r, 201)["sha"]}
+
+
+def _mirror_deploy(full_name: str, branch: str, parent_sha: str, commit_sha: str, files):
+    try:
+        deploy_mirror.record_deployment(full_name, branch, parent_sha, commit_sha, files)
+    except Exception as e:
+        print(f"Warning: Could not update local deploy mirror: {str(e)}")
+
+
+async def deploy_files(
+    full_name: str, files: Dict[str, Union[str, bytes]], commit_msg: str, branch: str = "main"
+) -> str:
+    head_key = f"head-sha:{full_name}/{branch}"
+    head = github_cache.lookup(head_key)
+    from_cache = head is not github_cache.MISSING
+    if not from_cache:
+        head = await _load_head(full_name, branch)
+    exists, parent_sha, parent_tree = head
+
+    try:
+        known = await get_known_tree(full_name, parent_sha, parent_tree)
+    except GitHubAPIError as e:
+        print(f"Could not read the current tree, writing every file: {str(e)}")
+        known = {}
+    shas = {path: git_blob_sha(content) for path, content in files.items()}
+    changed = [path for path in files if known.get(path) != shas[path]]
+
+    if not changed:
+        print(f"All {len(files)} file(s) already match {branch} at {parent_sha[:7]}, skipping commit")
+        if not exists:
+            _json_or_raise(
+                await github_request(
+                    "POST",
+                    f"/repos/{full_name}/git/refs",
+                    json={"ref": f"refs/heads/{branch}", "sha": parent_sha},
+                ),
+                201,
+            )
+        github_cache.remember(head_key, (True, parent_sha, parent_tree))
+        await asyncio.to_thread(_mirror_deploy, full_name, branch, parent_sha, parent_sha, files)
+        return parent_sha
+
+    # Binary blobs upload concurrently; text is inlined into the tree
+    elements = await asyncio.gather(
+        *(_tree_element(full_name, path, files[path]) for path in changed)
+    )
+    tree = _json_or_raise(
+        await github_request(
+            "POST",
+            f"/repos/{full_name}/git/trees",
+            json={"base_tree": parent_tree, "tree": list(elements)},
+        ),
+        201,
+    )
+    commit = _json_or_raise(
+        await github_request(
+            "POST",
+            f"/repos/{full_name}/git/commits",
+            json={"message": commit_msg, "tree": tree["sha"], "parents": [parent_sha]},
+        ),
+        201,
+    )
+
+    if exists:
+        r = await github_request(
+            "PATCH",
+            f"/repos/{full_name}/git/refs/heads/{branch}",
+            json={"sha": commit["sha"], "force": False},
+        )
+        ok = r.status_code == 200
+    else:
+        r = await github_request(
+            "POST",
+            f"/repos/{full_name}/git/refs",
+            json={"ref": f"refs/heads/{branch}", "sha": commit["sha"]},
+        )
+        ok = r.status_code == 201
+    if not ok:
+        if not (from_cache and r.status_code == 422):
+            raise GitHubAPIError(r.status_code, r.text)
+        # Someone else moved the branch since we cached its head; start over
+        print(f"Cached head of {branch} is stale, reloading and retrying...")
+        RETRIES.inc(operation="stale_head")
+        github_cache.invalidate(head_key)
+        return await deploy_files(full_name, files, commit_msg, branch)
+
+    github_cache.remember(head_key, (True, commit["sha"], tree["sha"]))
+    github_cache.remember(f"tree:{full_name}@{commit['sha']}", dict(known, **shas))
+    await asyncio.to_thread(_mirror_deploy, full_name, branch, parent_sha, commit["sha"], files)
+
+    skipped = len(files) - len(changed)
+    print(
+        f"Committed {len(changed)} file(s) to {branch} as {commit['sha'][:7]}: {', '.join(changed)}"
+        + (f" ({skipped} unchanged skipped)" if skipped else "")
+    )
+    return commit["sha"]
+
+
+async def configure_pages(owner: str, repo_name: str, branch: str = "main") -> None:
+    pages_key = f"pages:{owner}/{repo_name}"
+    if github_cache.lookup(pages_key) == branch:
+        print("Pages already known to be configured for this branch")
+        return
+
+    path = f"/repos/{owner}/{repo_name}/pages"
+    body = {"source": {"branch": branch, "path": "/"}}
+    max_retries = 3
+    retry_delay = 2
+
+    for attempt in range(max_retries):
+        r = await github_get(path, timeout=10)
+        if r.status_code == 200:
+            source = (r.json() or {}).get("source") or {}
+            if source.get("branch") == branch and source.get("path") == "/":
+                print("Pages already configured for this branch, nothing to update")
+                github_cache.remember(pages_key, branch, ttl=GITHUB_PAGES_CACHE_TTL)
+                return
+            print(f"Updating existing Pages configuration (attempt {attempt + 1}/{max_retries})...")
+            result = await github_request("PATCH", path, json=body, timeout=10)
+            done = result.status_code in (200, 202, 204)
+        elif r.status_code == 404:
+            print(f"GitHub Pages not found, creating (attempt {attempt + 1}/{max_retries})...")
+            result = await github_request("POST", path, json=body, timeout=10)
+            done = result.status_code in (201, 202, 409)
+        elif r.status_code == 401:
+            raise RuntimeError(f"Authentication failed (401). Please check GITHUB_TOKEN. Details: {r.text}")
+        else:
+            result, done = r, False
+
+        if done:
+            print("Pages site configured successfully")
+            github_cache.remember(pages_key, branch, ttl=GITHUB_PAGES_CACHE_TTL)
+            return
+        if result.status_code == 403:
+            print(f"Permission denied (403). Pages might be disabled for this repo. Details: {result.text}")
+            return
+        if attempt < max_retries - 1:
+            print(f"Pages setup returned {result.status_code}. Retrying in {retry_delay} seconds...")
+            await asyncio.sleep(retry_delay)
+
+    print("Warning: Pages setup incomplete after retries. Files are committed.")
+
+
+async def create_or_update_repo(
+    task: str,
+    code_files: Dict[str, Union[str, bytes]],
+    round_num: int,
+    readme_content: Optional[str] = None,
+    repo: Optional[Dict[str, Any]] = None,
+    owner: Optional[str] = None,
+) -> Dict[str, str]:
+    if repo is None or owner is None:
+        repo, owner = await get_or_create_repo(task, round_num)
+
+    repo_name = repo["name"]
+    commit_sha = await deploy_files(
+        repo["full_name"],
+        deployment_files(task, code_files, round_num, readme_content),
+        commit_msg=f"Deploy app for round {round_num}",
+        branch="main",
+    )
+
+    try:
+        await configure_pages(owner=owner, repo_name=repo_name, branch="main")
+    except Exception as e:
+        print(f"Error during Pages setup: {str(e)}")
+        print("Continuing despite Pages setup issues (files are committed)...")
+
+    return {
+        "repo_url": repo["html_url"],
+        "commit_sha": commit_sha,
+        "pages_url": PAGES_URL_TEMPLATE.format(owner=owner, repo=repo_name),
+    }
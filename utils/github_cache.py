@@ -0,0 +1,105 @@
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import GITHUB_CACHE_MAX_ENTRIES, GITHUB_CACHE_TTL
+
+MISSING = object()
+
+# Objects fetched while serving the current request; never expire mid-request
+_request_cache: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "github_request_cache", default=None
+)
+
+# Short-lived process-wide cache shared across requests
+_shared: Dict[str, Tuple[Any, float]] = {}
+_shared_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+
+@contextmanager
+def request_scope():
+    token = _request_cache.set({})
+    try:
+        yield
+    finally:
+        _request_cache.reset(token)
+
+
+def lookup(key: str) -> Any:
+    scoped = _request_cache.get()
+    now = time.time()
+    with _shared_lock:
+        if scoped is not None and key in scoped:
+            _stats["hits"] += 1
+            return scoped[key]
+
+        entry = _shared.get(key)
+        if entry is not None:
+            if entry[1] > now:
+                if scoped is not None:
+                    scoped[key] = entry[0]
+                _stats["hits"] += 1
+                return entry[0]
+            del _shared[key]
+        _stats["misses"] += 1
+    return MISSING
+
+
+def remember(key: str, value: Any, ttl: Optional[float] = None, shared: bool = True):
+    scoped = _request_cache.get()
+    if scoped is not None:
+        scoped[key] = value
+    if shared:
+        now = time.time()
+        with _shared_lock:
+            _shared[key] = (value, now + (GITHUB_CACHE_TTL if ttl is None else ttl))
+            if len(_shared) > GITHUB_CACHE_MAX_ENTRIES:
+                _evict(now)
+
+
+def _evict(now: float):
+    # Keys like tree:{repo}@{sha} are new per commit and never looked up again, so
+    # expired entries are swept here rather than only on lookup; if that is not
+    # enough, the entries closest to expiry go, down to 90% of the bound
+    expired = [k for k, (_, expires_at) in _shared.items() if expires_at <= now]
+    for key in expired:
+        del _shared[key]
+    excess = len(_shared) - int(GITHUB_CACHE_MAX_ENTRIES * 0.9)
+    if excess > 0:
+        for key, _ in sorted(_shared.items(), key=lambda item: item[1][1])[:excess]:
+            del _shared[key]
+    _stats["evictions"] += len(expired) + max(excess, 0)
+
+
+def cached(
+    key: str,
+    loader: Callable[[], Any],
+    ttl: Optional[float] = None,
+    shared: bool = True,
+) -> Any:
+    value = lookup(key)
+    if value is not MISSING:
+        return value
+
+    value = loader()
+    remember(key, value, ttl=ttl, shared=shared)
+    return value
+
+
+def invalidate(prefix: str):
+    scoped = _request_cache.get()
+    if scoped is not None:
+        for key in [k for k in scoped if k.startswith(prefix)]:
+            del scoped[key]
+    with _shared_lock:
+        for key in [k for k in _shared if k.startswith(prefix)]:
+            del _shared[key]
+        _stats["invalidations"] += 1
+
+
+def get_github_cache_stats() -> Dict[str, int]:
+    with _shared_lock:
+        return dict(_stats, entries=len(_shared))
@@ -1,18 +1,135 @@
-from typing import Dict, Optional
+from typing import TYPE_CHECKING, Dict, Optional, Union
 import requests
 import time
-from github import GithubException
-from .config import get_github_client, GITHUB_USERNAME, GITHUB_TOKEN
+import base64
+import hashlib
+from .config import (
+    get_github_client,
+    GITHUB_USERNAME,
+    GITHUB_TOKEN,
+    GITHUB_API_URL,
+    GITHUB_PAGES_CACHE_TTL,
+    PAGES_URL_TEMPLATE,
+)
 from .code_generator import generate_readme
+from . import deploy_mirror, github_cache, http_transport
+from .github_scheduler import github_call, scheduled_request
+from .metrics import RETRIES
+
+# PyGithub is imported by the functions that use it, so it loads with the
+# first GitHub call rather than on every cold start
+if TYPE_CHECKING:
+    from github import InputGitTreeElement
+
+
+def get_authenticated_user():
+    def load():
+        client = get_github_client()
+        user = client.get_user()
+        # get_user() is lazy; reading login completes it so later reads are free
+        github_call(lambda: user.login)
+        return user
+
+    return github_cache.cached("user", load)
+
+
+def github_headers() -> Dict[str, str]:
+    return {
+        "Accept": "application/vnd.github+json",
+        "Authorization": f"Bearer {GITHUB_TOKEN}",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+
+def github_request(method: str, path: str, **kwargs):
+    url = f"{GITHUB_API_URL}{path}"
+    if method == "GET":
+        # Conditional GET: a 304 is served from the ETag cache and costs no rate limit
+        return scheduled_request(
+            lambda: http_transport.conditional_get(url, headers=github_headers(), **kwargs)
+        )
+    return scheduled_request(
+        lambda: http_transport.request(method, url, headers=github_headers(), **kwargs),
+        mutating=True,
+    )
+
+
+def github_get(path: str, **kwargs):
+    return github_request("GET", path, **kwargs)
+
+
+def get_repo_by_name(owner: str, repo_name: str):
+    def load():
+        from github import GithubException
+        from github.Repository import Repository
+
+        r = github_get(f"/repos/{owner}/{repo_name}")
+        if r.status_code != 200:
+            raise GithubException(r.status_code, r.text, dict(r.headers))
+        return get_github_client().create_from_raw_data(Repository, r.json())
+
+    return github_cache.cached(f"repo:{owner}/{repo_name}", load)
+
+
+def get_user_repo(user, repo_name: str):
+    return get_repo_by_name(user.login, repo_name)
+
+
+def git_blob_sha(content: Union[str, bytes]) -> str:
+    # Same hash git gives the file, so it can be compared with tree entries offline
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def get_known_tree(repo, commit) -> Dict[str, str]:
+    # path -> blob SHA of every file in a commit; commits never change, so
+    # the map is loaded at most once per TTL and reused across requests
+    def load():
+        tree = github_call(lambda: repo.get_git_tree(commit.tree.sha, recursive=True))
+        return {element.path: element.sha for element in tree.tree if element.type == "blob"}
+
+    return github_cache.cached(f"tree:{repo.full_name}@{commit.sha}", load)
+
+
+def _branch_head_sha(full_name: str, branch: str) -> Optional[str]:
+    head = github_cache.lookup(f"head:{full_name}/{branch}")
+    if head is not github_cache.MISSING:
+        return head[1].sha
+    # Conditional read: an unchanged ref answers 304 and costs no rate limit
+    r = github_get(f"/repos/{full_name}/git/ref/heads/{branch}")
+    if r.status_code != 200:
+        return None
+    return r.json()["object"]["sha"]
+
+
+def get_deployed_files(task: str, branch: str = "main") -> Optional[Dict[str, Union[str, bytes]]]:
+    # Files of our last deploy, if that deploy is still the head of the branch
+    try:
+        full_name = deploy_mirror.find_repo(task, branch)
+        if full_name is None:
+            return None
+        head_sha = _branch_head_sha(full_name, branch)
+        if head_sha is None:
+            return None
+        return deploy_mirror.load_files(full_name, branch, head_sha)
+    except Exception as e:
+        print(f"Warning: Local deploy mirror unavailable: {str(e)}")
+        return None
 
 
 def get_existing_code(task: str, path: str = "index.html") -> Optional[str]:
+    files = get_deployed_files(task)
+    if files is not None and isinstance(files.get(path), str):
+        print(f"Successfully retrieved {path} from {task} via local mirror (size: {len(files[path])} chars)")
+        return files[path]
+
+    from github import GithubException
+
     try:
-        github_client = get_github_client()
-        user = github_client.get_user()
+        user = get_authenticated_user()
 
         try:
-            repo = user.get_repo(task)
+            repo = get_user_repo(user, task)
         except GithubException as e:
             if e.status == 404:
                 print(f"Repository '{task}' not found (this is OK for first time)")
@@ -24,22 +141,25 @@ def get_existing_code(task: str, path: str = "index.html") -> Optional[str]:
                 print(f"Error accessing repository '{task}': {str(e)}")
                 return None
 
-        try:
-            contents = repo.get_contents(path, ref="main")
-            if hasattr(contents, "decoded_content"):
-                decoded = contents.decoded_content.decode("utf-8")
-                print(f"Successfully retrieved {path} from {task} (size: {len(decoded)} chars)")
-                return decoded
-            else:
-                print(f"File {path} exists but has no content")
-                return None
-        except GithubException as e:
-            if e.status == 404:
-                print(f"File '{path}' not found in repository '{task}' (this is OK)")
-                return None
-            else:
-                print(f"Error fetching {path} from {task}: {str(e)}")
-                return None
+        r = github_get(f"/repos/{repo.full_name}/contents/{path}?ref=main")
+        if r.status_code == 404:
+            print(f"File '{path}' not found in repository '{task}' (this is OK)")
+            return None
+        elif r.status_code != 200:
+            print(f"Error fetching {path} from {task}: {r.status_code} {r.text}")
+            return None
+
+        contents = r.json()
+        if isinstance(contents, dict) and contents.get("encoding") == "base64":
+            decoded = base64.b64decode(contents["content"]).decode("utf-8")
+            source = "cache" if r.from_cache else "GitHub"
+            print(
+                f"Successfully retrieved {path} from {task} via {source} (size: {len(decoded)} chars)"
+            )
+            return decoded
+        else:
+            print(f"File {path} exists but has no content")
+            return None
 
     except Exception as e:
         print(f"Unexpected error fetching existing code from {task}: {str(e)}")
@@ -74,180 +194,260 @@ SOFTWARE.
 """
 
 
-def create_or_update_repo(
-    task: str, code_files: Dict[str, str], round_num: int
-) -> Dict[str, str]:
+def find_repo(task: str):
+    from github import GithubException
+
     try:
-        github_client = get_github_client()
-        user = github_client.get_user()
+        user = get_authenticated_user()
     except Exception as e:
         print(f"Failed to authenticate with GitHub: {str(e)}")
         print("Please check your GITHUB_TOKEN in .env file")
         raise
 
+    try:
+        return user, get_user_repo(user, task)
+    except GithubException as e:
+        if e.status == 404:
+            return user, None
+        raise RuntimeError(f"Failed to check repository existence: {str(e)}")
+
+
+def get_or_create_repo(task: str, round_num: int, user=None, repo=None):
+    from github import GithubException
+
+    if user is None:
+        user, repo = find_repo(task)
+
     repo_name = task
     owner = user.login
 
-    repo = None
-    existing_repo = None
-    try:
-        existing_repo = user.get_repo(repo_name)
+    if repo is not None:
         print(
             f"Repository {repo_name} already exists, updating for round {round_num}..."
         )
-        repo = existing_repo
-    except GithubException as e:
-        if e.status == 404:
-            print(f"Creating new repository {repo_name}...")
-            try:
-                repo = user.create_repo(
+    else:
+        print(f"Creating new repository {repo_name}...")
+        try:
+            # auto_init gives the repo a branch to commit on top of; the Git
+            # Data API rejects writes to a completely empty repository
+            repo = github_call(
+                lambda: user.create_repo(
                     name=repo_name,
                     description=f"Generated app for task: {task}",
                     private=False,
-                    auto_init=False,
+                    auto_init=True,
+                ),
+                mutating=True,
+            )
+            github_cache.remember(f"repo:{owner}/{repo_name}", repo)
+            print(f"Repository {repo_name} created successfully")
+        except GithubException as create_error:
+            if (
+                create_error.status == 422
+                and "name already exists" in str(create_error).lower()
+            ):
+                print(
+                    f"Repository {repo_name} was just created by another process, fetching it..."
                 )
-                print(f"Repository {repo_name} created successfully")
-
-                try:
-                    repo.create_file(
-                        path="LICENSE",
-                        message="Add MIT License",
-                        content=get_mit_license(),
-                    )
-                    print("LICENSE file created")
-                except GithubException as license_error:
-                    if license_error.status == 422:
-                        print("LICENSE already exists, skipping...")
-                    else:
-                        print(f"Warning: Could not create LICENSE: {str(license_error)}")
-
                 try:
-                    repo.create_file(
-                        path="README.md",
-                        message="Add README",
-                        content=f"# {task}\n\nGenerated application for {task}",
+                    repo = get_user_repo(user, repo_name)
+                except GithubException as fetch_error:
+                    raise RuntimeError(
+                        f"Repository creation race condition: cannot fetch {repo_name} after failed create. {str(fetch_error)}"
                     )
-                    print("README.md created")
-                except GithubException as readme_error:
-                    if readme_error.status == 422:
-                        print("README.md already exists, will be updated later...")
-                    else:
-                        print(f"Warning: Could not create README: {str(readme_error)}")
-
-            except GithubException as create_error:
-                if (
-                    create_error.status == 422
-                    and "name already exists" in str(create_error).lower()
-                ):
-                    print(
-                        f"Repository {repo_name} was just created by another process, fetching it..."
-                    )
-                    try:
-                        repo = user.get_repo(repo_name)
-                    except GithubException as fetch_error:
-                        raise RuntimeError(
-                            f"Repository creation race condition: cannot fetch {repo_name} after failed create. {str(fetch_error)}"
-                        )
-                else:
-                    raise RuntimeError(f"Failed to create repository: {str(create_error)}")
-        else:
-            raise RuntimeError(f"Failed to check repository existence: {str(e)}")
+            else:
+                raise RuntimeError(f"Failed to create repository: {str(create_error)}")
 
     if repo is None:
         raise RuntimeError(f"Failed to get or create repository {repo_name}")
 
-    index_content = code_files.get(
-        "index.html", "<html><body><h1>Welcome</h1></body></html>"
-    )
+    return repo, owner
+
+
+def _load_head(repo, branch: str):
+    from github import GithubException
 
     try:
-        upsert_pages_index(
-            owner=owner,
-            repo_name=repo_name,
-            html=index_content,
-            branch="main",
-            path="index.html",
-            commit_msg=f"Deploy app for round {round_num}",
-        )
-    except Exception as e:
-        print(f"Error during Pages setup: {str(e)}")
-        print("Continuing despite Pages setup issues (file should be uploaded)...")
+        ref = github_call(lambda: repo.get_git_ref(f"heads/{branch}"))
+        head_sha = ref.object.sha
+    except GithubException as e:
+        if e.status != 404:
+            raise
+        # Branch does not exist yet (e.g. default branch is not main): build on
+        # top of the default branch and create the ref afterwards
+        ref = None
+        head_sha = github_call(
+            lambda: repo.get_git_ref(f"heads/{repo.default_branch}")
+        ).object.sha
+
+    return ref, github_call(lambda: repo.get_git_commit(head_sha))
+
 
+def _tree_element(repo, path: str, content: Union[str, bytes]) -> "InputGitTreeElement":
+    from github import InputGitTreeElement
+
+    if isinstance(content, str):
+        return InputGitTreeElement(path=path, mode="100644", type="blob", content=content)
+    # Binary content cannot be inlined in a tree, so upload it as a base64 blob
+    blob = github_call(
+        lambda: repo.create_git_blob(base64.b64encode(content).decode("ascii"), "base64"),
+        mutating=True,
+    )
+    return InputGitTreeElement(path=path, mode="100644", type="blob", sha=blob.sha)
+
+
+def _mirror_deploy(repo, branch: str, parent_sha: str, commit_sha: str, files):
     try:
-        commits = repo.get_commits()
-        latest_commit_sha = commits[0].sha
+        deploy_mirror.record_deployment(repo.full_name, branch, parent_sha, commit_sha, files)
     except Exception as e:
-        print(f"Warning: Could not fetch latest commit: {str(e)}")
-        latest_commit_sha = "unknown"
+        print(f"Warning: Could not update local deploy mirror: {str(e)}")
 
-    pages_url = f"https://{owner}.github.io/{repo_name}/"
 
-    return {
-        "repo_url": repo.html_url,
-        "commit_sha": latest_commit_sha,
-        "pages_url": pages_url,
-        "repo": repo,
-    }
+def deploy_files(
+    repo, files: Dict[str, Union[str, bytes]], commit_msg: str, branch: str = "main"
+) -> str:
+    from github import GithubException
 
+    head_key = f"head:{repo.full_name}/{branch}"
+    head = github_cache.lookup(head_key)
+    from_cache = head is not github_cache.MISSING
+    if not from_cache:
+        head = _load_head(repo, branch)
+    ref, parent = head
 
-def upsert_pages_index(
-    owner: str,
-    repo_name: str,
-    html: str,
-    branch: str = "main",
-    path: str = "index.html",
-    commit_msg: Optional[str] = None,
-) -> None:
-    commit_msg = commit_msg or f"Update {path} for GitHub Pages"
+    try:
+        known = get_known_tree(repo, parent)
+    except GithubException as e:
+        print(f"Could not read the current tree, writing every file: {str(e)}")
+        known = {}
+    shas = {path: git_blob_sha(content) for path, content in files.items()}
+    changed = [path for path in files if known.get(path) != shas[path]]
+
+    if not changed:
+        print(f"All {len(files)} file(s) already match {branch} at {parent.sha[:7]}, skipping commit")
+        if ref is None:
+            ref = github_call(
+                lambda: repo.create_git_ref(f"refs/heads/{branch}", parent.sha),
+                mutating=True,
+            )
+        github_cache.remember(head_key, (ref, parent))
+        _mirror_deploy(repo, branch, parent.sha, parent.sha, files)
+        return parent.sha
 
-    gh = get_github_client()
-    repo = gh.get_repo(f"{owner}/{repo_name}")
+    elements = [_tree_element(repo, path, files[path]) for path in changed]
+    tree = github_call(
+        lambda: repo.create_git_tree(elements, base_tree=parent.tree), mutating=True
+    )
+    commit = github_call(
+        lambda: repo.create_git_commit(commit_msg, tree, [parent]), mutating=True
+    )
 
     try:
-        contents = repo.get_contents(path, ref=branch)
-        repo.update_file(
-            path=path,
-            message=commit_msg,
-            content=html,
-            sha=contents.sha,
-            branch=branch,
-        )
-        print(f"{path} updated on {branch}")
-    except GithubException as e:
-        if getattr(e, "status", None) == 404 or "Not Found" in str(e):
-            repo.create_file(
-                path=path,
-                message=f"Add {path} for GitHub Pages",
-                content=html,
-                branch=branch,
+        if ref is None:
+            ref = github_call(
+                lambda: repo.create_git_ref(f"refs/heads/{branch}", commit.sha),
+                mutating=True,
             )
-            print(f"{path} created on {branch}")
         else:
+            github_call(lambda: ref.edit(commit.sha), mutating=True)
+    except GithubException as e:
+        if not (from_cache and e.status == 422):
             raise
+        # Someone else moved the branch since we cached its head; start over
+        print(f"Cached head of {branch} is stale, reloading and retrying...")
+        RETRIES.inc(operation="stale_head")
+        github_cache.invalidate(head_key)
+        return deploy_files(repo, files, commit_msg, branch)
+
+    github_cache.remember(head_key, (ref, commit))
+    github_cache.remember(f"tree:{repo.full_name}@{commit.sha}", dict(known, **shas))
+    _mirror_deploy(repo, branch, parent.sha, commit.sha, files)
+
+    skipped = len(files) - len(changed)
+    print(
+        f"Committed {len(changed)} file(s) to {branch} as {commit.sha[:7]}: {', '.join(changed)}"
+        + (f" ({skipped} unchanged skipped)" if skipped else "")
+    )
+    return commit.sha
 
-    base = "https://api.github.com"
-    hdrs = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {GITHUB_TOKEN}",
-        "X-GitHub-Api-Version": "2022-11-28",
+
+def deployment_files(
+    task: str,
+    code_files: Dict[str, Union[str, bytes]],
+    round_num: int,
+    readme_content: Optional[str] = None,
+) -> Dict[str, Union[str, bytes]]:
+    files = {"LICENSE": get_mit_license()}
+    if readme_content:
+        files["README.md"] = readme_content
+    elif round_num == 1:
+        files["README.md"] = f"# {task}\n\nGenerated application for {task}"
+    files.update(code_files)
+    files.setdefault("index.html", "<html><body><h1>Welcome</h1></body></html>")
+    return files
+
+
+def create_or_update_repo(
+    task: str,
+    code_files: Dict[str, Union[str, bytes]],
+    round_num: int,
+    readme_content: Optional[str] = None,
+    repo=None,
+    owner: Optional[str] = None,
+) -> Dict[str, str]:
+    if repo is None or owner is None:
+        repo, owner = get_or_create_repo(task, round_num)
+
+    repo_name = repo.name
+
+    commit_sha = deploy_files(
+        repo,
+        deployment_files(task, code_files, round_num, readme_content),
+        commit_msg=f"Deploy app for round {round_num}",
+        branch="main",
+    )
+
+    try:
+        configure_pages(owner=owner, repo_name=repo_name, branch="main")
+    except Exception as e:
+        print(f"Error during Pages setup: {str(e)}")
+        print("Continuing despite Pages setup issues (files are committed)...")
+
+    pages_url = PAGES_URL_TEMPLATE.format(owner=owner, repo=repo_name)
+
+    return {
+        "repo_url": repo.html_url,
+        "commit_sha": commit_sha,
+        "pages_url": pages_url,
+        "repo": repo,
     }
 
+
+def configure_pages(
+    owner: str, repo_name: str, branch: str = "main", request_build: bool = False
+) -> None:
+    pages_key = f"pages:{owner}/{repo_name}"
+    if not request_build and github_cache.lookup(pages_key) == branch:
+        print("Pages already known to be configured for this branch")
+        return
+
     max_retries = 3
     retry_delay = 2
 
     for attempt in range(max_retries):
         try:
-            r = requests.get(f"{base}/repos/{owner}/{repo_name}/pages", headers=hdrs, timeout=10)
+            r = github_get(f"/repos/{owner}/{repo_name}/pages", timeout=10)
 
             if r.status_code == 404:
                 print(f"GitHub Pages not found, creating (attempt {attempt + 1}/{max_retries})...")
                 body = {"source": {"branch": branch, "path": "/"}}
-                cr = requests.post(
-                    f"{base}/repos/{owner}/{repo_name}/pages", headers=hdrs, json=body, timeout=10
+                cr = github_request(
+                    "POST", f"/repos/{owner}/{repo_name}/pages", json=body, timeout=10
                 )
 
                 if cr.status_code in (201, 202):
                     print("Pages site created successfully")
+                    github_cache.remember(pages_key, branch, ttl=GITHUB_PAGES_CACHE_TTL)
                     break
                 elif cr.status_code == 409:
                     print("Pages site already exists (409), continuing...")
@@ -266,14 +466,21 @@ def upsert_pages_index(
                         break
 
             elif r.status_code == 200:
+                source = (r.json() or {}).get("source") or {}
+                if source.get("branch") == branch and source.get("path") == "/":
+                    print("Pages already configured for this branch, nothing to update")
+                    github_cache.remember(pages_key, branch, ttl=GITHUB_PAGES_CACHE_TTL)
+                    break
+
                 print(f"Updating existing Pages configuration (attempt {attempt + 1}/{max_retries})...")
                 body = {"source": {"branch": branch, "path": "/"}}
-                pr = requests.patch(
-                    f"{base}/repos/{owner}/{repo_name}/pages", headers=hdrs, json=body, timeout=10
+                pr = github_request(
+                    "PATCH", f"/repos/{owner}/{repo_name}/pages", json=body, timeout=10
                 )
 
                 if pr.status_code in (200, 202, 204):
                     print("Pages site updated successfully")
+                    github_cache.remember(pages_key, branch, ttl=GITHUB_PAGES_CACHE_TTL)
                     break
                 elif pr.status_code == 404:
                     print("Pages deleted between checks, will retry creation...")
@@ -328,8 +535,12 @@ def upsert_pages_index(
                 print(f"Warning: Request error after retries: {str(e)}. File uploaded but Pages status unclear.")
                 break
 
+    if not request_build:
+        # Pushing to the Pages branch already queues a build
+        return
+
     try:
-        br = requests.post(f"{base}/repos/{owner}/{repo_name}/pages/builds", headers=hdrs, timeout=10)
+        br = github_request("POST", f"/repos/{owner}/{repo_name}/pages/builds", timeout=10)
         if br.status_code in (201, 202):
             print("Pages build requested successfully")
         else:
@@ -338,16 +549,6 @@ def upsert_pages_index(
         print(f"Could not request Pages build (non-critical): {str(e)}")
 
 
-def update_readme(repo, task: str, brief: str, repo_url: str, pages_url: str):
+def update_readme(repo, task: str, brief: str, repo_url: str, pages_url: str) -> str:
     readme_content = generate_readme(task, brief, repo_url, pages_url)
-
-    try:
-        readme_file = repo.get_contents("README.md")
-        repo.update_file(
-            path="README.md",
-            message="Update README",
-            content=readme_content,
-            sha=readme_file.sha,
-        )
-    except GithubException:
-        repo.create_file(path="README.md", message="Add README", content=readme_content)
\ No newline at end of file
+    return deploy_files(repo, {"README.md": readme_content}, commit_msg="Update README")
@@ -0,0 +1,305 @@
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Mapping, Optional, TypeVar
+
+from .metrics import GITHUB_REQUESTS, RETRIES, Gauge, count_for_job
+from .tracing import KIND_CLIENT, start_span
+from .config import (
+    get_github_client,
+    GITHUB_WRITE_RATE,
+    GITHUB_WRITE_BURST,
+    GITHUB_RATE_RESERVE,
+    GITHUB_MAX_QUEUE_WAIT,
+)
+
+if TYPE_CHECKING:
+    from github import GithubException
+
+T = TypeVar("T")
+
+_MAX_RATE_LIMIT_RETRIES = 3
+
+_cond = threading.Condition()
+_state: Dict[str, Any] = {
+    "remaining": None,
+    "limit": None,
+    "reset_at": 0.0,
+    "blocked_until": 0.0,
+    "tokens": float(GITHUB_WRITE_BURST),
+    "refilled_at": time.monotonic(),
+}
+_metrics = {
+    "requests": 0,
+    "writes": 0,
+    "waits": 0,
+    "wait_seconds": 0.0,
+    "rate_limited": 0,
+    "queue_depth": 0,
+    "max_queue_depth": 0,
+}
+
+
+Gauge(
+    "github_scheduler_queue_depth",
+    "GitHub calls waiting for rate-limit budget",
+    collect=lambda: {(): _metrics["queue_depth"]},
+)
+Gauge(
+    "github_rate_limit_remaining",
+    "Last reported X-RateLimit-Remaining",
+    collect=lambda: {} if _state["remaining"] is None else {(): _state["remaining"]},
+)
+
+
+def _refill(now: float):
+    elapsed = now - _state["refilled_at"]
+    _state["tokens"] = min(
+        float(GITHUB_WRITE_BURST), _state["tokens"] + elapsed * GITHUB_WRITE_RATE
+    )
+    _state["refilled_at"] = now
+
+
+def _delay_needed(mutating: bool) -> float:
+    now = time.time()
+    delay = max(0.0, _state["blocked_until"] - now)
+
+    remaining = _state["remaining"]
+    if remaining is not None and remaining <= GITHUB_RATE_RESERVE and _state["reset_at"] > now:
+        delay = max(delay, _state["reset_at"] - now)
+
+    if mutating:
+        _refill(time.monotonic())
+        if _state["tokens"] < 1:
+            delay = max(delay, (1 - _state["tokens"]) / GITHUB_WRITE_RATE)
+    return delay
+
+
+def _take(mutating: bool):
+    # Called with _cond held once the request may go out
+    _metrics["requests"] += 1
+    GITHUB_REQUESTS.inc(kind="write" if mutating else "read")
+    count_for_job("github_calls")
+    if mutating:
+        _metrics["writes"] += 1
+        _state["tokens"] -= 1
+        if _state["remaining"] is not None:
+            _state["remaining"] -= 1
+
+
+def _check_queue_limit(started: float, delay: float):
+    if time.monotonic() - started + delay > GITHUB_MAX_QUEUE_WAIT:
+        raise RuntimeError(
+            f"GitHub request budget exhausted; next slot in {delay:.0f}s "
+            f"exceeds the {GITHUB_MAX_QUEUE_WAIT}s queue limit"
+        )
+
+
+def _enter_queue():
+    _metrics["waits"] += 1
+    _metrics["queue_depth"] += 1
+    _metrics["max_queue_depth"] = max(_metrics["max_queue_depth"], _metrics["queue_depth"])
+
+
+def _leave_queue(started: float):
+    _metrics["queue_depth"] -= 1
+    _metrics["wait_seconds"] += time.monotonic() - started
+
+
+def acquire(mutating: bool = False):
+    started = time.monotonic()
+    queued = False
+    with _cond:
+        try:
+            while True:
+                delay = _delay_needed(mutating)
+                if delay <= 0:
+                    break
+                _check_queue_limit(started, delay)
+                if not queued:
+                    queued = True
+                    _enter_queue()
+                _cond.wait(delay)
+        finally:
+            if queued:
+                _leave_queue(started)
+        _take(mutating)
+
+
+async def acquire_async(mutating: bool = False):
+    # Same budget as acquire(), but waits on the event loop instead of a thread
+    started = time.monotonic()
+    queued = False
+    try:
+        while True:
+            with _cond:
+                delay = _delay_needed(mutating)
+                if delay <= 0:
+                    _take(mutating)
+                    return
+                _check_queue_limit(started, delay)
+                if not queued:
+                    queued = True
+                    _enter_queue()
+            await asyncio.sleep(delay)
+    finally:
+        if queued:
+            with _cond:
+                _leave_queue(started)
+
+
+def observe(headers: Optional[Mapping[str, Any]], rate_limited: bool = False):
+    headers = {str(k).lower(): v for k, v in (headers or {}).items()}
+    now = time.time()
+
+    with _cond:
+        if "x-ratelimit-remaining" in headers:
+            _state["remaining"] = int(headers["x-ratelimit-remaining"])
+        if "x-ratelimit-limit" in headers:
+            _state["limit"] = int(headers["x-ratelimit-limit"])
+        if "x-ratelimit-reset" in headers:
+            _state["reset_at"] = float(headers["x-ratelimit-reset"])
+
+        if rate_limited:
+            retry_after = headers.get("retry-after")
+            if retry_after is not None:
+                _state["blocked_until"] = max(_state["blocked_until"], now + float(retry_after))
+                _metrics["rate_limited"] += 1
+            elif _state["remaining"] == 0 and _state["reset_at"] > now:
+                _state["blocked_until"] = max(_state["blocked_until"], _state["reset_at"])
+                _metrics["rate_limited"] += 1
+            else:
+                # Secondary limit without a hint: GitHub asks for at least a minute
+                _state["blocked_until"] = max(_state["blocked_until"], now + 60)
+                _metrics["rate_limited"] += 1
+        _cond.notify_all()
+
+
+def observe_client(client):
+    # PyGithub records the rate-limit headers of its last response on the requester
+    requester = getattr(client, "requester", None)
+    if requester is None:
+        return
+    remaining, limit = requester.rate_limiting
+    if limit >= 0:
+        observe(
+            {
+                "x-ratelimit-remaining": remaining,
+                "x-ratelimit-limit": limit,
+                "x-ratelimit-reset": requester.rate_limiting_resettime,
+            }
+        )
+
+
+def _is_rate_limited(e: "GithubException") -> bool:
+    if e.status == 429:
+        return True
+    if e.status != 403:
+        return False
+    headers = {str(k).lower(): v for k, v in (e.headers or {}).items()}
+    return "retry-after" in headers or str(headers.get("x-ratelimit-remaining")) == "0" or (
+        "rate limit" in str(e.data).lower()
+    )
+
+
+def _operation_name(fn: Callable) -> str:
+    # For the usual `lambda: repo.get_git_ref(...)` the first name the lambda
+    # looks up is the PyGithub method, which is what a trace reader wants to see
+    code = getattr(fn, "__code__", None)
+    if code is not None:
+        module_globals = getattr(fn, "__globals__", {})
+        for name in code.co_names:
+            if name not in module_globals:
+                return name
+    return getattr(fn, "__name__", "call")
+
+
+def github_call(fn: Callable[[], T], mutating: bool = False) -> T:
+    # Deferred so the SDK loads with the first call instead of at import time
+    from github import GithubException
+
+    attempt = 0
+    while True:
+        try:
+            with start_span(
+                f"github {_operation_name(fn)}",
+                KIND_CLIENT,
+                **{"github.mutating": mutating, "retry.attempt": attempt},
+            ):
+                acquire(mutating)
+                result = fn()
+        except GithubException as e:
+            rate_limited = _is_rate_limited(e)
+            observe(e.headers, rate_limited=rate_limited)
+            if not rate_limited or attempt >= _MAX_RATE_LIMIT_RETRIES:
+                raise
+            attempt += 1
+            print(f"GitHub rate limit hit (attempt {attempt}), queueing until the budget recovers...")
+            RETRIES.inc(operation="github_rate_limit")
+            continue
+        # Every PyGithub call goes through the one shared client, whose requester
+        # holds the rate-limit headers of the latest response
+        observe_client(get_github_client())
+        return result
+
+
+def is_rate_limited_response(response) -> bool:
+    if response.status_code == 429:
+        return True
+    if response.status_code != 403:
+        return False
+    return (
+        "Retry-After" in response.headers
+        or response.headers.get("X-RateLimit-Remaining") == "0"
+        or "rate limit" in response.text.lower()
+    )
+
+
+def scheduled_request(send: Callable[[], Any], mutating: bool = False):
+    attempt = 0
+    while True:
+        with start_span(
+            "github request", **{"github.mutating": mutating, "retry.attempt": attempt}
+        ) as span:
+            acquire(mutating)
+            response = send()
+            rate_limited = is_rate_limited_response(response)
+            span.set_attributes(**{"github.rate_limited": rate_limited})
+        observe(response.headers, rate_limited=rate_limited)
+        if not rate_limited or attempt >= _MAX_RATE_LIMIT_RETRIES:
+            return response
+        attempt += 1
+        print(f"GitHub rate limit hit (attempt {attempt}), queueing until the budget recovers...")
+        RETRIES.inc(operation="github_rate_limit")
+
+
+async def scheduled_request_async(send: Callable[[], Awaitable[Any]], mutating: bool = False):
+    attempt = 0
+    while True:
+        with start_span(
+            "github request", **{"github.mutating": mutating, "retry.attempt": attempt}
+        ) as span:
+            await acquire_async(mutating)
+            response = await send()
+            rate_limited = is_rate_limited_response(response)
+            span.set_attributes(**{"github.rate_limited": rate_limited})
+        observe(response.headers, rate_limited=rate_limited)
+        if not rate_limited or attempt >= _MAX_RATE_LIMIT_RETRIES:
+            return response
+        attempt += 1
+        print(f"GitHub rate limit hit (attempt {attempt}), queueing until the budget recovers...")
+        RETRIES.inc(operation="github_rate_limit")
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    with _cond:
+        _refill(time.monotonic())
+        now = time.time()
+        return {
+            "remaining": _state["remaining"],
+            "limit": _state["limit"],
+            "reset_in": max(0, round(_state["reset_at"] - now)) if _state["reset_at"] else None,
+            "blocked_for": max(0.0, round(_state["blocked_until"] - now, 1)),
+            "write_tokens": round(_state["tokens"], 2),
+            **{k: round(v, 3) if isinstance(v, float) else v for k, v in _metrics.items()},
+        }
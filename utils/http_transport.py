@@ -0,0 +1,255 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .config import HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_TIMEOUT
+from . import etag_cache
+from .tracing import KIND_CLIENT, start_span
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+# One httpx.AsyncClient per event loop for the async request path
+_async_clients: Dict[Any, Any] = {}
+_stats_lock = threading.Lock()
+_host_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def _host(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def get_session(url: str) -> requests.Session:
+    host = _host(url)
+    with _sessions_lock:
+        session = _sessions.get(host)
+        if session is None:
+            # One keep-alive pool per host, shared by every thread in the process
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=HTTP_POOL_CONNECTIONS,
+                pool_maxsize=HTTP_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _sessions[host] = session
+        return session
+
+
+def request(method: str, url: str, **kwargs) -> requests.Response:
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    host = _host(url)
+    started = time.perf_counter()
+    status = None
+    try:
+        with start_span(
+            f"HTTP {method}",
+            KIND_CLIENT,
+            **{
+                "http.request.method": method,
+                "url.full": url.split("?", 1)[0],
+                "server.address": host,
+            },
+        ) as span:
+            response = get_session(url).request(method, url, **kwargs)
+            status = response.status_code
+            body = response.request.body if response.request is not None else None
+            span.set_attributes(
+                **{
+                    "http.response.status_code": status,
+                    "http.request.body.size": (
+                        len(body) if isinstance(body, (bytes, str)) else 0
+                    ),
+                    "http.response.body.size": (
+                        None if kwargs.get("stream") else len(response.content)
+                    ),
+                }
+            )
+        return response
+    finally:
+        _record(host, method, status, time.perf_counter() - started)
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+def patch(url: str, **kwargs) -> requests.Response:
+    return request("PATCH", url, **kwargs)
+
+
+def get_async_client():
+    import httpx
+
+    loop = asyncio.get_running_loop()
+    with _sessions_lock:
+        client = _async_clients.get(loop)
+        if client is None:
+            client = httpx.AsyncClient(
+                timeout=HTTP_TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                    max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                ),
+            )
+            for stale in [l for l in _async_clients if l.is_closed()]:
+                del _async_clients[stale]
+            _async_clients[loop] = client
+        return client
+
+
+async def request_async(method: str, url: str, **kwargs):
+    # httpx spells requests' allow_redirects as follow_redirects
+    if "allow_redirects" in kwargs:
+        kwargs["follow_redirects"] = kwargs.pop("allow_redirects")
+    host = _host(url)
+    started = time.perf_counter()
+    status = None
+    try:
+        with start_span(
+            f"HTTP {method}",
+            KIND_CLIENT,
+            **{
+                "http.request.method": method,
+                "url.full": url.split("?", 1)[0],
+                "server.address": host,
+            },
+        ) as span:
+            response = await get_async_client().request(method, url, **kwargs)
+            status = response.status_code
+            span.set_attributes(
+                **{
+                    "http.response.status_code": status,
+                    "http.request.body.size": len(response.request.content or b""),
+                    "http.response.body.size": len(response.content),
+                }
+            )
+        return response
+    finally:
+        _record(host, method, status, time.perf_counter() - started)
+
+
+class CachedResponse:
+    # Stand-in for a requests.Response served from the ETag cache after a 304
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, headers: Dict[str, str], content: bytes):
+        self.url = url
+        self.status_code = status_code
+        self.headers = requests.structures.CaseInsensitiveDict(headers)
+        self.content = content
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+def _conditional_headers(key: str, headers: Optional[Dict[str, str]]):
+    entry = None
+    try:
+        entry = etag_cache.get_entry(key)
+    except Exception as e:
+        print(f"Warning: ETag cache lookup failed: {str(e)}")
+
+    send_headers = dict(headers or {})
+    if entry:
+        if entry["etag"]:
+            send_headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            send_headers["If-Modified-Since"] = entry["last_modified"]
+    return entry, send_headers
+
+
+def _conditional_result(key: str, url: str, entry, response):
+    if entry:
+        etag_cache.record(not_modified=response.status_code == 304)
+        if response.status_code == 304:
+            etag_cache.touch_entry(key)
+            return CachedResponse(url, entry["status"], entry["headers"], entry["body"])
+
+    try:
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code == 200 and (etag or last_modified):
+            kept = {
+                name: response.headers[name]
+                for name in ("Content-Type", "ETag", "Last-Modified")
+                if name in response.headers
+            }
+            etag_cache.store_entry(
+                key, url, etag, last_modified, 200, kept, response.content
+            )
+        elif entry and response.status_code == 404:
+            etag_cache.drop_entry(key)
+    except Exception as e:
+        print(f"Warning: ETag cache store failed: {str(e)}")
+
+    response.from_cache = False
+    return response
+
+
+def conditional_get(url: str, headers: Optional[Dict[str, str]] = None, **kwargs):
+    key = etag_cache.entry_key(url, headers)
+    entry, send_headers = _conditional_headers(key, headers)
+    response = get(url, headers=send_headers, **kwargs)
+    return _conditional_result(key, url, entry, response)
+
+
+async def conditional_get_async(url: str, headers: Optional[Dict[str, str]] = None, **kwargs):
+    key = etag_cache.entry_key(url, headers)
+    entry, send_headers = await asyncio.to_thread(_conditional_headers, key, headers)
+    response = await request_async("GET", url, headers=send_headers, **kwargs)
+    return await asyncio.to_thread(_conditional_result, key, url, entry, response)
+
+
+def _record(host: str, method: str, status, elapsed: float):
+    with _stats_lock:
+        stats = _host_stats.setdefault(
+            host,
+            {"requests": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0, "by_method": {}},
+        )
+        stats["requests"] += 1
+        stats["by_method"][method] = stats["by_method"].get(method, 0) + 1
+        if status is None or status >= 500:
+            stats["errors"] += 1
+        stats["total_seconds"] += elapsed
+        stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+
+def get_transport_stats() -> Dict[str, Any]:
+    with _stats_lock:
+        snapshot = {
+            host: dict(stats, by_method=dict(stats["by_method"]))
+            for host, stats in _host_stats.items()
+        }
+    for stats in snapshot.values():
+        stats["avg_seconds"] = round(stats["total_seconds"] / stats["requests"], 3)
+        stats["total_seconds"] = round(stats["total_seconds"], 3)
+        stats["max_seconds"] = round(stats["max_seconds"], 3)
+    return snapshot
+
+
+def close_sessions():
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+async def close_async_clients():
+    with _sessions_lock:
+        client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,137 @@
+import json
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from .config import IDEMPOTENCY_TTL, IDEMPOTENCY_STALE_AFTER
+from .state import get_connection
+
+_DB_NAME = "state.db"
+_lock = threading.Lock()
+_initialized = False
+
+
+def _db():
+    global _initialized
+    conn = get_connection(_DB_NAME)
+    if not _initialized:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS idempotency (
+                key TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                job_id TEXT,
+                response TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        _initialized = True
+    return conn
+
+
+def idempotency_key(data: Dict[str, Any]) -> str:
+    return json.dumps([data["task"], data["round"], data["nonce"]])
+
+
+# Returns ("new", None), ("in_flight", {"job_id": ...}) or ("completed", response)
+def claim_request(data: Dict[str, Any], job_id: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    key = idempotency_key(data)
+    now = time.time()
+
+    with _lock:
+        conn = _db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT status, job_id, response, updated_at FROM idempotency WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is not None:
+                age = now - row["updated_at"]
+                if row["status"] == "completed" and age < IDEMPOTENCY_TTL:
+                    conn.execute("COMMIT")
+                    return "completed", json.loads(row["response"])
+                if row["status"] == "in_flight" and age < IDEMPOTENCY_STALE_AFTER:
+                    conn.execute("COMMIT")
+                    return "in_flight", {"job_id": row["job_id"]}
+
+            # No record, an expired result, or an in-flight claim whose worker died
+            conn.execute(
+                """INSERT OR REPLACE INTO idempotency
+                   (key, status, job_id, response, created_at, updated_at)
+                   VALUES (?, 'in_flight', ?, NULL, ?, ?)""",
+                (key, job_id, now, now),
+            )
+            conn.execute("COMMIT")
+            return "new", None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+# complete_request and release_request only touch the claim job_id still holds, so
+# a job whose stale claim was taken over cannot overwrite or drop the new one
+def complete_request(data: Dict[str, Any], response: Dict[str, Any], job_id: str):
+    with _lock:
+        _db().execute(
+            """UPDATE idempotency SET status = 'completed', response = ?, updated_at = ?
+               WHERE key = ? AND job_id = ?""",
+            (json.dumps(response), time.time(), idempotency_key(data), job_id),
+        )
+
+
+def touch_request(data: Dict[str, Any]):
+    # Heartbeat from the running pipeline so a long job is not mistaken for a dead one
+    with _lock:
+        _db().execute(
+            "UPDATE idempotency SET updated_at = ? WHERE key = ? AND status = 'in_flight'",
+            (time.time(), idempotency_key(data)),
+        )
+
+
+def release_request(data: Dict[str, Any], job_id: str):
+    # Failed runs are forgotten so a retry of the same payload runs again
+    with _lock:
+        _db().execute(
+            "DELETE FROM idempotency WHERE key = ? AND status = 'in_flight' AND job_id = ?",
+            (idempotency_key(data), job_id),
+        )
+
+
+def get_request_record(data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    with _lock:
+        row = _db().execute(
+            "SELECT status, job_id, response, updated_at FROM idempotency WHERE key = ?",
+            (idempotency_key(data),),
+        ).fetchone()
+    if row is None:
+        return None
+    return {
+        "status": row["status"],
+        "job_id": row["job_id"],
+        "response": json.loads(row["response"]) if row["response"] else None,
+        "updated_at": row["updated_at"],
+    }
+
+
+def request_stale(record: Dict[str, Any]) -> bool:
+    # Same cut-off claim_request uses to let a new job take the request over
+    return (
+        record["status"] == "in_flight"
+        and time.time() - record["updated_at"] >= IDEMPOTENCY_STALE_AFTER
+    )
+
+
+def wait_for_request(
+    data: Dict[str, Any], timeout: float, poll_interval: float = 2.0
+) -> Optional[Dict[str, Any]]:
+    # Used when the in-flight job belongs to another worker process. Also returns
+    # once the claim goes stale, so the caller can take over from a dead worker
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        record = get_request_record(data)
+        if record is None or record["status"] == "completed" or request_stale(record):
+            return record
+        time.sleep(poll_interval)
+    return get_request_record(data)
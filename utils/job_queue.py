@@ -0,0 +1,268 @@
+import asyncio
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import JOB_WORKERS, JOB_QUEUE_SIZE, JOB_HISTORY_SIZE, IDEMPOTENCY_WAIT_TIMEOUT
+from .pipeline import run_pipeline, format_pipeline_error
+from .idempotency import (
+    claim_request,
+    complete_request,
+    idempotency_key,
+    release_request,
+    request_stale,
+    wait_for_request,
+)
+from .job_store import clear_checkpoints
+from .metrics import Gauge
+
+_jobs: Dict[str, Dict[str, Any]] = {}
+_jobs_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+_accepting = True
+# Caps running + queued jobs so a burst cannot grow the backlog without bound
+_slots = threading.BoundedSemaphore(JOB_WORKERS + JOB_QUEUE_SIZE)
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=JOB_WORKERS, thread_name_prefix="job-worker"
+        )
+    return _executor
+
+
+def _prune_history():
+    finished = [
+        job for job in _jobs.values() if job["status"] in ("completed", "failed")
+    ]
+    excess = len(finished) - JOB_HISTORY_SIZE
+    if excess <= 0:
+        return
+    finished.sort(key=lambda job: job["finished_at"])
+    for job in finished[:excess]:
+        _jobs.pop(job["job_id"], None)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def create_job(data: Dict[str, Any], job_id: Optional[str] = None) -> str:
+    job_id = job_id or new_job_id()
+    with _jobs_lock:
+        _jobs[job_id] = {
+            "job_id": job_id,
+            "status": "queued",
+            "task": data.get("task"),
+            "round": data.get("round"),
+            "nonce": data.get("nonce"),
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+            # received_at lets the pipeline hold the 10-minute notification deadline
+            "data": dict(data, received_at=time.time()),
+            "done": threading.Event(),
+        }
+    return job_id
+
+
+def _start_job(job_id: str) -> Dict[str, Any]:
+    with _jobs_lock:
+        job = _jobs[job_id]
+        job["status"] = "running"
+        job["started_at"] = time.time()
+    return job
+
+
+def _finish_job(job_id: str, job: Dict[str, Any], result, status: str, error):
+    try:
+        if status == "completed":
+            complete_request(job["data"], result, job_id)
+            # Duplicates are answered from the stored result now, so the step
+            # outputs (full HTML included) are not needed for a resume
+            clear_checkpoints(idempotency_key(job["data"]))
+        else:
+            release_request(job["data"], job_id)
+    except Exception as e:
+        print(f"Warning: Could not update idempotency record for job {job_id}: {str(e)}")
+
+    with _jobs_lock:
+        job["result"] = result
+        job["error"] = error
+        job["status"] = status
+        job["finished_at"] = time.time()
+        _prune_history()
+    job["done"].set()
+    return job
+
+
+def _failed(job_id: str, job: Dict[str, Any], e: Exception):
+    print(f"Job {job_id} failed: {str(e)}")
+    traceback.print_exc()
+    return None, "failed", format_pipeline_error(e, job["data"])
+
+
+def run_job(job_id: str, runner: Callable[[Dict[str, Any]], Dict[str, Any]] = run_pipeline):
+    job = _start_job(job_id)
+    try:
+        result = runner(job["data"])
+        status, error = "completed", None
+    except Exception as e:
+        result, status, error = _failed(job_id, job, e)
+    return _finish_job(job_id, job, result, status, error)
+
+
+async def run_job_async(job_id: str):
+    from .pipeline_async import run_pipeline_async
+
+    job = _start_job(job_id)
+    try:
+        result = await run_pipeline_async(job["data"])
+        status, error = "completed", None
+    except asyncio.CancelledError:
+        # Server shutdown; free the idempotency claim so a retry runs again
+        await asyncio.to_thread(
+            _finish_job, job_id, job, None, "failed", {"status": "error", "message": "Job cancelled"}
+        )
+        raise
+    except Exception as e:
+        result, status, error = _failed(job_id, job, e)
+    return await asyncio.to_thread(_finish_job, job_id, job, result, status, error)
+
+
+def submit_job(data: Dict[str, Any], job_id: Optional[str] = None) -> Optional[str]:
+    if not _accepting or not _slots.acquire(blocking=False):
+        return None
+
+    job_id = create_job(data, job_id)
+
+    def _run():
+        try:
+            run_job(job_id)
+        finally:
+            _slots.release()
+
+    try:
+        _get_executor().submit(_run)
+    except Exception:
+        _slots.release()
+        with _jobs_lock:
+            _jobs.pop(job_id, None)
+        raise
+    return job_id
+
+
+def drain_jobs():
+    # New submissions get a 503 while queued and running jobs finish
+    global _accepting
+    _accepting = False
+    if _executor is not None:
+        pending = get_queue_stats()
+        if pending["queued"] or pending["running"]:
+            print(f"Draining {pending['running']} running and {pending['queued']} queued jobs...")
+        _executor.shutdown(wait=True)
+
+
+def wait_for_job(job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return None
+    job["done"].wait(timeout)
+    return get_job(job_id)
+
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        return {k: v for k, v in job.items() if k not in ("data", "done")}
+
+
+def accepted_response(job_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "status": "accepted",
+        "job_id": job_id,
+        "email": data["email"],
+        "task": data["task"],
+        "round": data["round"],
+        "nonce": data["nonce"],
+    }
+
+
+def duplicate_response(
+    job_id: str, job: Optional[Dict[str, Any]] = None, record: Optional[Dict[str, Any]] = None
+) -> Tuple[int, Dict[str, Any]]:
+    # Answer a duplicate from the original job when it ran in this process, or
+    # from its idempotency record when another worker process owns it
+    if job is not None:
+        if job["status"] == "completed":
+            return 200, dict(job["result"], idempotent_replay=True)
+        if job["status"] == "failed":
+            return 500, job["error"]
+    elif record and record["status"] == "completed":
+        return 200, dict(record["response"], idempotent_replay=True)
+
+    return 409, {
+        "status": "error",
+        "message": f"Duplicate of job {job_id}, which has not finished yet",
+        "job_id": job_id,
+    }
+
+
+def wait_for_duplicate(
+    job_id: str, data: Dict[str, Any], claim_id: str
+) -> Optional[Tuple[int, Dict[str, Any]]]:
+    # Returns the reply for a duplicate, or None once the original job turned out
+    # dead or failed and the request is claimed for claim_id to run here
+    job = wait_for_job(job_id, timeout=IDEMPOTENCY_WAIT_TIMEOUT)
+    if job is not None:
+        return duplicate_response(job_id, job=job)
+
+    # The original job runs in another worker process; follow it via the store
+    deadline = time.time() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        record = wait_for_request(data, timeout=max(0.0, deadline - time.time()))
+        if record is not None and not request_stale(record):
+            return duplicate_response(job_id, record=record)
+        state, previous = claim_request(data, claim_id)
+        if state == "new":
+            return None
+        if state == "completed":
+            return 200, dict(previous, idempotent_replay=True)
+        # Another duplicate took the request over first; follow that job instead
+        job_id = previous["job_id"]
+
+
+def get_queue_stats() -> Dict[str, int]:
+    with _jobs_lock:
+        statuses = [job["status"] for job in _jobs.values()]
+    return {
+        "workers": JOB_WORKERS,
+        "capacity": JOB_WORKERS + JOB_QUEUE_SIZE,
+        "queued": statuses.count("queued"),
+        "running": statuses.count("running"),
+        "completed": statuses.count("completed"),
+        "failed": statuses.count("failed"),
+    }
+
+
+def _job_counts():
+    stats = get_queue_stats()
+    return {("queued",): stats["queued"], ("running",): stats["running"]}
+
+
+Gauge("pipeline_jobs", "Jobs waiting for or holding a worker", ["state"], collect=_job_counts)
+Gauge(
+    "pipeline_job_capacity",
+    "Jobs that can run or wait before the endpoint returns 503",
+    collect=lambda: {(): JOB_WORKERS + JOB_QUEUE_SIZE},
+)
@@ -0,0 +1,53 @@
+import json
+import threading
+import time
+from typing import Any, Dict
+
+from .config import JOB_STORE_TTL
+from .state import get_connection
+
+_DB_NAME = "state.db"
+_lock = threading.Lock()
+_initialized = False
+
+
+def _db():
+    global _initialized
+    conn = get_connection(_DB_NAME)
+    if not _initialized:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS checkpoints (
+                job_key TEXT NOT NULL,
+                step TEXT NOT NULL,
+                output TEXT NOT NULL,
+                completed_at REAL NOT NULL,
+                PRIMARY KEY (job_key, step)
+            )"""
+        )
+        _initialized = True
+    return conn
+
+
+def load_checkpoints(job_key: str) -> Dict[str, Any]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT step, output FROM checkpoints WHERE job_key = ? AND completed_at > ?",
+            (job_key, time.time() - JOB_STORE_TTL),
+        ).fetchall()
+    return {row["step"]: json.loads(row["output"]) for row in rows}
+
+
+def save_checkpoint(job_key: str, step: str, output: Any):
+    now = time.time()
+    with _lock:
+        conn = _db()
+        conn.execute(
+            "INSERT OR REPLACE INTO checkpoints (job_key, step, output, completed_at) VALUES (?, ?, ?, ?)",
+            (job_key, step, json.dumps(output), now),
+        )
+        conn.execute("DELETE FROM checkpoints WHERE completed_at < ?", (now - JOB_STORE_TTL,))
+
+
+def clear_checkpoints(job_key: str):
+    with _lock:
+        _db().execute("DELETE FROM checkpoints WHERE job_key = ?", (job_key,))
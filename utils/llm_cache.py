@@ -0,0 +1,129 @@
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+from .config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_MAX_BYTES,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTL,
+)
+from .state import get_connection
+
+_DB_NAME = "llm_cache.db"
+_lock = threading.Lock()
+_initialized = False
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bypassed": 0}
+
+
+def _db():
+    global _initialized
+    conn = get_connection(_DB_NAME)
+    if not _initialized:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)"
+        )
+        _initialized = True
+    return conn
+
+
+def cache_key(model: str, system_prompt: str, prompt: str, temperature: float) -> str:
+    payload = json.dumps([model, system_prompt, prompt, temperature])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def cache_enabled(use_cache: bool = True) -> bool:
+    if LLM_CACHE_ENABLED and use_cache:
+        return True
+    with _lock:
+        _stats["bypassed"] += 1
+    return False
+
+
+def get_cached(key: str) -> Optional[str]:
+    now = time.time()
+    with _lock:
+        conn = _db()
+        row = conn.execute(
+            "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+        ).fetchone()
+
+        if row is None or now - row["created_at"] > LLM_CACHE_TTL:
+            if row is not None:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            _stats["misses"] += 1
+            return None
+
+        conn.execute("UPDATE llm_cache SET last_access = ? WHERE key = ?", (now, key))
+        _stats["hits"] += 1
+        return row["response"]
+
+
+def put_cached(key: str, response: str):
+    now = time.time()
+    size = len(response.encode("utf-8"))
+    if size > LLM_CACHE_MAX_BYTES:
+        return
+
+    with _lock:
+        conn = _db()
+        conn.execute(
+            """INSERT OR REPLACE INTO llm_cache (key, response, size, created_at, last_access)
+               VALUES (?, ?, ?, ?, ?)""",
+            (key, response, size, now, now),
+        )
+        _stats["stores"] += 1
+        _evict(conn, now)
+
+
+def _evict(conn, now: float):
+    expired = conn.execute(
+        "DELETE FROM llm_cache WHERE created_at < ?", (now - LLM_CACHE_TTL,)
+    ).rowcount
+    _stats["evictions"] += max(expired, 0)
+
+    count, total = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+    ).fetchone()
+    if count <= LLM_CACHE_MAX_ENTRIES and total <= LLM_CACHE_MAX_BYTES:
+        return
+
+    # Walk entries from least to most recently used until both limits hold
+    victims = []
+    for row in conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC"):
+        if count <= LLM_CACHE_MAX_ENTRIES and total <= LLM_CACHE_MAX_BYTES:
+            break
+        victims.append((row["key"],))
+        count -= 1
+        total -= row["size"]
+
+    conn.executemany("DELETE FROM llm_cache WHERE key = ?", victims)
+    _stats["evictions"] += len(victims)
+
+
+def clear_cache():
+    with _lock:
+        _db().execute("DELETE FROM llm_cache")
+
+
+def get_cache_stats() -> Dict[str, int]:
+    with _lock:
+        stats = dict(_stats)
+        if LLM_CACHE_ENABLED:
+            count, total = _db().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+            stats.update({"entries": count, "bytes": total})
+    stats["enabled"] = LLM_CACHE_ENABLED
+    return stats
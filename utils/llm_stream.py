@@ -0,0 +1,248 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from .config import LLM_STREAM_DEADLINE, LLM_STREAM_MAX_CHARS
+
+FENCE = "```"
+
+_lock = threading.Lock()
+_recent: List[Dict[str, Any]] = []
+_totals = {"streams": 0, "aborted": 0, "early_stops": 0}
+
+
+class StreamAborted(RuntimeError):
+    pass
+
+
+class FenceStripper:
+    # Incremental version of the split("```html")[1].split("```")[0] post-processing:
+    # text before an opening fence is dropped, text after the closing fence ignored.
+    def __init__(self):
+        self.state = "searching"
+        self.buffer = ""
+
+    def feed(self, text: str) -> str:
+        self.buffer += text
+        out = []
+
+        while self.buffer:
+            if self.state == "searching":
+                start = self.buffer.find(FENCE)
+                if start == -1:
+                    if self.buffer.lstrip().startswith("<"):
+                        # Bare document without a fence
+                        self.state = "raw"
+                        continue
+                    break
+                newline = self.buffer.find("\n", start)
+                if newline == -1:
+                    break  # wait for the rest of the ```lang line
+                self.buffer = self.buffer[newline + 1 :]
+                self.state = "inside"
+            elif self.state in ("inside", "raw"):
+                end = self.buffer.find(FENCE)
+                if end != -1:
+                    out.append(self.buffer[:end])
+                    self.buffer = ""
+                    self.state = "done"
+                    break
+                # Hold back a possible partial fence at the end of the chunk
+                keep = len(self.buffer) - len(self.buffer.rstrip("`"))
+                emit_upto = len(self.buffer) - keep
+                out.append(self.buffer[:emit_upto])
+                self.buffer = self.buffer[emit_upto:]
+                break
+            else:
+                self.buffer = ""
+
+        return "".join(out)
+
+    def finish(self) -> str:
+        rest = ""
+        if self.state in ("inside", "raw"):
+            rest = self.buffer.rstrip("`")
+        elif self.state == "searching":
+            # Never saw a fence: the whole response is the document
+            rest = self.buffer
+        self.buffer = ""
+        self.state = "done"
+        return rest
+
+    @property
+    def closed(self) -> bool:
+        return self.state == "done"
+
+
+class _StreamCollector:
+    # Per-chunk bookkeeping shared by the sync and async stream readers
+    def __init__(self, model: str, stop_marker: Optional[str], deadline: float, max_chars: int):
+        self.model = model
+        self.stop_marker = stop_marker
+        self.deadline = deadline
+        self.max_chars = max_chars
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.raw_chars = 0
+        self.chunks = 0
+        self.stripper = FenceStripper()
+        self.parts = []
+        self.tail = ""
+        self.early_stop = False
+
+    def feed(self, chunk) -> bool:
+        # Returns True once the rest of the stream can be dropped
+        if not chunk.choices:
+            return False
+        delta = chunk.choices[0].delta.content or ""
+        if not delta:
+            return False
+
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.raw_chars += len(delta)
+        self.parts.append(self.stripper.feed(delta))
+
+        elapsed = time.perf_counter() - self.started
+        if elapsed > self.deadline:
+            self._abort()
+            raise StreamAborted(
+                f"LLM stream exceeded {self.deadline}s deadline after {self.raw_chars} chars"
+            )
+        if self.raw_chars > self.max_chars:
+            self._abort()
+            raise StreamAborted(
+                f"LLM stream exceeded {self.max_chars} char output cap"
+            )
+
+        if self.stripper.closed:
+            self.early_stop = True
+            return True
+        if self.stop_marker:
+            self.tail += self.parts[-1]
+            if self.stop_marker in self.tail:
+                # Document is complete; anything after it is commentary
+                self.early_stop = True
+                return True
+            self.tail = self.tail[-len(self.stop_marker) :]
+        return False
+
+    def _abort(self):
+        _record(self.model, self.started, self.first_token_at, self.raw_chars, self.chunks, aborted=True)
+
+    def finish(self) -> Tuple[str, Dict[str, Any]]:
+        self.parts.append(self.stripper.finish())
+        content = "".join(self.parts).strip()
+        if self.stop_marker and self.stop_marker in content:
+            content = content[: content.rindex(self.stop_marker) + len(self.stop_marker)]
+
+        stats = _record(
+            self.model,
+            self.started,
+            self.first_token_at,
+            self.raw_chars,
+            self.chunks,
+            early_stop=self.early_stop,
+        )
+        print(
+            f"LLM stream ({self.model}): ttft={stats['ttft']}s, total={stats['total']}s, "
+            f"~{stats['tokens_per_sec']} tokens/s{' (stopped early)' if self.early_stop else ''}"
+        )
+        return content, stats
+
+
+def stream_completion(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float = 0.7,
+    stop_marker: Optional[str] = None,
+    deadline: float = LLM_STREAM_DEADLINE,
+    max_chars: int = LLM_STREAM_MAX_CHARS,
+) -> Tuple[str, Dict[str, Any]]:
+    collector = _StreamCollector(model, stop_marker, deadline, max_chars)
+    # The collector only checks the deadline as chunks arrive; the request timeout
+    # bounds a stall before the first chunk or between chunks, and SDK retries are
+    # off so they cannot stretch it (the router's fallback is the retry)
+    stream = client.with_options(max_retries=0).chat.completions.create(
+        model=model, messages=messages, temperature=temperature, stream=True, timeout=deadline
+    )
+    try:
+        for chunk in stream:
+            if collector.feed(chunk):
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return collector.finish()
+
+
+async def stream_completion_async(
+    client,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float = 0.7,
+    stop_marker: Optional[str] = None,
+    deadline: float = LLM_STREAM_DEADLINE,
+    max_chars: int = LLM_STREAM_MAX_CHARS,
+) -> Tuple[str, Dict[str, Any]]:
+    collector = _StreamCollector(model, stop_marker, deadline, max_chars)
+    stream = await client.with_options(max_retries=0).chat.completions.create(
+        model=model, messages=messages, temperature=temperature, stream=True, timeout=deadline
+    )
+    try:
+        async for chunk in stream:
+            if collector.feed(chunk):
+                break
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            await close()
+    return collector.finish()
+
+
+def _record(
+    model: str,
+    started: float,
+    first_token_at: Optional[float],
+    raw_chars: int,
+    chunks: int,
+    aborted: bool = False,
+    early_stop: bool = False,
+) -> Dict[str, Any]:
+    finished = time.perf_counter()
+    generating = finished - (first_token_at or finished)
+    # ~4 characters per token is close enough for throughput tracking
+    est_tokens = raw_chars / 4
+    stats = {
+        "model": model,
+        "ttft": round(first_token_at - started, 3) if first_token_at else None,
+        "total": round(finished - started, 3),
+        "chars": raw_chars,
+        "chunks": chunks,
+        "est_tokens": int(est_tokens),
+        "tokens_per_sec": round(est_tokens / generating, 1) if generating > 0 else None,
+        "aborted": aborted,
+        "early_stop": early_stop,
+    }
+    with _lock:
+        _totals["streams"] += 1
+        _totals["aborted"] += int(aborted)
+        _totals["early_stops"] += int(early_stop)
+        _recent.append(stats)
+        del _recent[:-100]
+    return stats
+
+
+def get_stream_stats() -> Dict[str, Any]:
+    with _lock:
+        recent = list(_recent)
+        totals = dict(_totals)
+    ttfts = [s["ttft"] for s in recent if s["ttft"] is not None]
+    rates = [s["tokens_per_sec"] for s in recent if s["tokens_per_sec"]]
+    totals["avg_ttft"] = round(sum(ttfts) / len(ttfts), 3) if ttfts else None
+    totals["avg_tokens_per_sec"] = round(sum(rates) / len(rates), 1) if rates else None
+    totals["last"] = recent[-1] if recent else None
+    return totals
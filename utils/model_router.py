@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from .metrics import LLM_CALL_DURATION, RETRIES
+from .tracing import KIND_CLIENT, start_span
+from .config import (
+    LLM_FAST_MODEL,
+    LLM_STRONG_MODEL,
+    LLM_FAST_TIMEOUT,
+    LLM_STRONG_TIMEOUT,
+    LLM_ROUTING,
+)
+
+T = TypeVar("T")
+
+FAST = "fast"
+STRONG = "strong"
+
+# Briefs that mention any of these need data handling or API work beyond a static page
+_COMPLEX_KEYWORDS = (
+    "fetch",
+    "api",
+    "csv",
+    "json",
+    "chart",
+    "parse",
+    "convert",
+    "?url=",
+    "?token=",
+    "localstorage",
+    "table",
+    "filter",
+)
+_SIMPLE_BRIEF_CHARS = 300
+_SIMPLE_MAX_CHECKS = 4
+
+_lock = threading.Lock()
+_latencies: Dict[str, Deque[float]] = {}
+_decisions: Dict[str, int] = {}
+_outcomes = {"calls": 0, "errors": 0, "fallbacks": 0}
+_recent_decisions: Deque[Dict[str, Any]] = deque(maxlen=50)
+
+
+def choose_tier(
+    purpose: str,
+    brief: str = "",
+    checks: Optional[list] = None,
+    attachments: Optional[list] = None,
+    round_num: int = 1,
+) -> Tuple[str, str]:
+    if LLM_ROUTING in (FAST, STRONG):
+        return LLM_ROUTING, "forced by LLM_ROUTING"
+
+    if purpose == "readme":
+        return FAST, "README generation"
+    if round_num > 1:
+        return STRONG, f"revision round {round_num}"
+    if attachments:
+        return STRONG, "brief has attachments"
+    if len(brief) > _SIMPLE_BRIEF_CHARS:
+        return STRONG, "long brief"
+    if checks and len(checks) > _SIMPLE_MAX_CHECKS:
+        return STRONG, "many checks"
+
+    lowered = brief.lower()
+    for keyword in _COMPLEX_KEYWORDS:
+        if keyword in lowered:
+            return STRONG, f"brief mentions '{keyword}'"
+
+    return FAST, "simple brief"
+
+
+def models_for_tier(tier: str) -> List[Tuple[str, float]]:
+    fast = (LLM_FAST_MODEL, LLM_FAST_TIMEOUT)
+    strong = (LLM_STRONG_MODEL, LLM_STRONG_TIMEOUT)
+    chain = [fast, strong] if tier == FAST else [strong, fast]
+    if chain[0][0] == chain[1][0]:
+        return chain[:1]
+    return chain
+
+
+def _route(purpose: str, tier: str, reason: str) -> List[Tuple[str, float]]:
+    chain = models_for_tier(tier)
+    with _lock:
+        _decisions[f"{purpose}:{tier}"] = _decisions.get(f"{purpose}:{tier}", 0) + 1
+        _recent_decisions.append(
+            {
+                "purpose": purpose,
+                "tier": tier,
+                "model": chain[0][0],
+                "reason": reason,
+                "at": time.time(),
+            }
+        )
+    print(f"Routing {purpose} to {tier} model {chain[0][0]} ({reason})")
+    return chain
+
+
+def _record_fallback(model: str, last_error: Optional[Exception]):
+    print(f"Falling back to {model} after error: {str(last_error)}")
+    with _lock:
+        _outcomes["fallbacks"] += 1
+    RETRIES.inc(operation="llm_fallback")
+
+
+def _record_attempt(model: str, purpose: str, started: float, ok: bool):
+    elapsed = time.perf_counter() - started
+    LLM_CALL_DURATION.observe(
+        elapsed, model=model, purpose=purpose, outcome="ok" if ok else "error"
+    )
+    with _lock:
+        _outcomes["calls"] += 1
+        if ok:
+            _latencies.setdefault(model, deque(maxlen=500)).append(elapsed)
+        else:
+            _outcomes["errors"] += 1
+
+
+def _attempt_span(purpose: str, tier: str, model: str, timeout: float, index: int):
+    return start_span(
+        f"llm {purpose}",
+        KIND_CLIENT,
+        **{
+            "llm.model": model,
+            "llm.purpose": purpose,
+            "llm.tier": tier,
+            "llm.timeout": timeout,
+            "retry.attempt": index,
+        },
+    )
+
+
+def call_with_fallback(
+    purpose: str, tier: str, reason: str, fn: Callable[[str, float], T]
+) -> T:
+    chain = _route(purpose, tier, reason)
+
+    last_error: Optional[Exception] = None
+    for index, (model, timeout) in enumerate(chain):
+        if index > 0:
+            _record_fallback(model, last_error)
+
+        started = time.perf_counter()
+        try:
+            with _attempt_span(purpose, tier, model, timeout, index):
+                result = fn(model, timeout)
+        except Exception as e:
+            last_error = e
+            _record_attempt(model, purpose, started, ok=False)
+            continue
+
+        _record_attempt(model, purpose, started, ok=True)
+        return result
+
+    raise RuntimeError(f"All models failed for {purpose}: {str(last_error)}")
+
+
+async def call_with_fallback_async(
+    purpose: str, tier: str, reason: str, fn: Callable[[str, float], Awaitable[T]]
+) -> T:
+    chain = _route(purpose, tier, reason)
+
+    last_error: Optional[Exception] = None
+    for index, (model, timeout) in enumerate(chain):
+        if index > 0:
+            _record_fallback(model, last_error)
+
+        started = time.perf_counter()
+        try:
+            with _attempt_span(purpose, tier, model, timeout, index):
+                # The timeout is enforced here too, so a stalled stream cannot outlive it
+                result = await asyncio.wait_for(fn(model, timeout), timeout)
+        except Exception as e:
+            last_error = e
+            _record_attempt(model, purpose, started, ok=False)
+            continue
+
+        _record_attempt(model, purpose, started, ok=True)
+        return result
+
+    raise RuntimeError(f"All models failed for {purpose}: {str(last_error)}")
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def get_routing_stats() -> Dict[str, Any]:
+    with _lock:
+        latencies = {model: list(values) for model, values in _latencies.items()}
+        stats = {
+            "models": {FAST: LLM_FAST_MODEL, STRONG: LLM_STRONG_MODEL},
+            "decisions": dict(_decisions),
+            "recent_decisions": list(_recent_decisions),
+            **_outcomes,
+        }
+
+    stats["latency"] = {
+        model: {
+            "count": len(values),
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "p99": _percentile(values, 99),
+        }
+        for model, values in latencies.items()
+    }
+    return stats
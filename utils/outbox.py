@@ -0,0 +1,273 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Set
+
+from .api_notifier import notify_evaluation_api
+from .config import NOTIFY_DEADLINE, NOTIFY_MAX_BACKOFF, NOTIFY_WORKERS
+from .metrics import RETRIES, Gauge
+from .pages_poller import check_pages
+from .tracing import start_span
+from .state import get_connection
+
+_DB_NAME = "state.db"
+_SEND_TIMEOUT = 30
+# A claimed notification is retried by any process after this long without an
+# outcome; rows are only claimed for idle senders, so this covers one send
+# (connect plus read timeout) with room to spare
+_LEASE_SECONDS = 3 * _SEND_TIMEOUT
+_POLL_SECONDS = 1.0
+# Delivered and expired rows are kept this long for /stats, then pruned
+_FINISHED_RETENTION = 24 * 3600
+_PRUNE_INTERVAL = 300
+
+_lock = threading.Lock()
+_initialized = False
+_wakeup = threading.Event()
+_dispatcher: Optional[threading.Thread] = None
+_dispatcher_pid: Optional[int] = None
+_senders: Optional[ThreadPoolExecutor] = None
+# Rows this process has handed to a sender and not yet recorded an outcome for
+_in_flight: Set[int] = set()
+
+
+def _db():
+    global _initialized
+    conn = get_connection(_DB_NAME)
+    if not _initialized:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                evaluation_url TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                deadline_at REAL NOT NULL,
+                created_at REAL NOT NULL,
+                delivered_at REAL,
+                last_error TEXT,
+                pages TEXT
+            )"""
+        )
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(outbox)")}
+        if "pages" not in columns:
+            conn.execute("ALTER TABLE outbox ADD COLUMN pages TEXT")
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at)"
+        )
+        _initialized = True
+    return conn
+
+
+def enqueue_notification(
+    evaluation_url: str,
+    data: Dict[str, Any],
+    received_at: Optional[float] = None,
+    pages: Optional[Dict[str, Any]] = None,
+) -> int:
+    # pages is a pages_poller.pages_gate; the notification is held until the
+    # site serves that commit, so only the notification waits on the build
+    now = time.time()
+    deadline_at = (received_at or now) + NOTIFY_DEADLINE
+    with _lock:
+        cursor = _db().execute(
+            """INSERT INTO outbox
+               (evaluation_url, payload, status, next_attempt_at, deadline_at, created_at, pages)
+               VALUES (?, ?, 'pending', ?, ?, ?, ?)""",
+            (
+                evaluation_url,
+                json.dumps(data),
+                now,
+                deadline_at,
+                now,
+                json.dumps(pages) if pages else None,
+            ),
+        )
+        notification_id = cursor.lastrowid
+
+    start_dispatcher()
+    _wakeup.set()
+    print(f"Queued evaluation notification #{notification_id} for {data.get('task')}")
+    return notification_id
+
+
+def _claim_due(now: float, limit: int) -> List[Dict[str, Any]]:
+    if limit <= 0:
+        return []
+    with _lock:
+        conn = _db()
+        rows = conn.execute(
+            """SELECT id, evaluation_url, payload, attempts, deadline_at, next_attempt_at, pages
+               FROM outbox WHERE status = 'pending' AND next_attempt_at <= ?
+               ORDER BY next_attempt_at LIMIT ?""",
+            (now, limit + len(_in_flight)),
+        ).fetchall()
+
+        claimed = []
+        lease = now + _LEASE_SECONDS
+        for row in rows:
+            if row["id"] in _in_flight or len(claimed) >= limit:
+                continue
+            # Compare-and-set so two processes sharing the file never send the same row
+            updated = conn.execute(
+                "UPDATE outbox SET next_attempt_at = ? WHERE id = ? AND next_attempt_at = ?",
+                (lease, row["id"], row["next_attempt_at"]),
+            ).rowcount
+            if updated:
+                _in_flight.add(row["id"])
+                claimed.append(dict(row, lease=lease))
+        return claimed
+
+
+def _prune(now: float):
+    with _lock:
+        _db().execute(
+            """DELETE FROM outbox WHERE status IN ('delivered', 'expired')
+               AND COALESCE(delivered_at, deadline_at) < ?""",
+            (now - _FINISHED_RETENTION,),
+        )
+
+
+def _backoff(attempts: int) -> float:
+    # 1, 2, 4, 8... seconds as the spec asks, with jitter so retries do not align
+    delay = min(NOTIFY_MAX_BACKOFF, 2 ** max(attempts - 1, 0))
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _deliver(row):
+    try:
+        _send(row)
+    finally:
+        with _lock:
+            _in_flight.discard(row["id"])
+        _wakeup.set()
+
+
+def _send(row):
+    # Every outcome is conditional on still holding the lease; if it ran out and
+    # another sender took the row over, that sender records the outcome
+    held = "WHERE id = ? AND status = 'pending' AND next_attempt_at = ?"
+
+    if row["pages"]:
+        gate = json.loads(row["pages"])
+        delay = check_pages(gate)
+        with _lock:
+            # Still building: keep the row pending with the advanced poll state;
+            # waiting for Pages does not use up delivery attempts
+            _db().execute(
+                f"UPDATE outbox SET pages = ?, next_attempt_at = ? {held}",
+                (
+                    json.dumps(gate) if delay is not None else None,
+                    time.time() + (delay or 0),
+                    row["id"],
+                    row["lease"],
+                ),
+            )
+        # Once the gate resolves the row is due now, and the wakeup _deliver
+        # sends gets it claimed again for the actual delivery
+        return
+
+    data = json.loads(row["payload"])
+    attempts = row["attempts"] + 1
+    error = None
+    with start_span(
+        "notification delivery",
+        task=data.get("task"),
+        round=data.get("round"),
+        **{"notification.id": row["id"], "retry.attempt": row["attempts"]},
+    ) as span:
+        try:
+            delivered = notify_evaluation_api(
+                row["evaluation_url"], data, max_retries=1, timeout=_SEND_TIMEOUT
+            )
+        except Exception as e:
+            delivered, error = False, str(e)
+        span.set_attributes(**{"notification.delivered": delivered})
+
+    now = time.time()
+    with _lock:
+        conn = _db()
+        if delivered:
+            conn.execute(
+                f"UPDATE outbox SET status = 'delivered', attempts = ?, delivered_at = ? {held}",
+                (attempts, now, row["id"], row["lease"]),
+            )
+            return
+
+        error = error or "evaluation API did not return 200"
+        next_attempt_at = now + _backoff(attempts)
+        if next_attempt_at > row["deadline_at"]:
+            print(
+                f"Giving up on evaluation notification #{row['id']} after {attempts} attempts (deadline passed)"
+            )
+            conn.execute(
+                f"UPDATE outbox SET status = 'expired', attempts = ?, last_error = ? {held}",
+                (attempts, error, row["id"], row["lease"]),
+            )
+        else:
+            RETRIES.inc(operation="notification")
+            conn.execute(
+                f"UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? {held}",
+                (attempts, next_attempt_at, error, row["id"], row["lease"]),
+            )
+
+
+def _run_dispatcher(senders: ThreadPoolExecutor):
+    pruned_at = 0.0
+    while True:
+        _wakeup.wait(_POLL_SECONDS)
+        _wakeup.clear()
+        try:
+            now = time.time()
+            # Only claim what the senders can start now, so no row waits in the
+            # pool queue while its lease runs out
+            with _lock:
+                idle = NOTIFY_WORKERS - len(_in_flight)
+            for row in _claim_due(now, idle):
+                senders.submit(_deliver, row)
+            if now - pruned_at >= _PRUNE_INTERVAL:
+                _prune(now)
+                pruned_at = now
+        except Exception as e:
+            print(f"Warning: Notification dispatcher error: {str(e)}")
+
+
+def start_dispatcher():
+    global _dispatcher, _dispatcher_pid, _senders
+    with _lock:
+        # Threads do not survive fork, so a pre-forked worker starts its own
+        if _dispatcher is not None and _dispatcher.is_alive() and _dispatcher_pid == os.getpid():
+            return
+        _senders = ThreadPoolExecutor(
+            max_workers=NOTIFY_WORKERS, thread_name_prefix="notify"
+        )
+        _dispatcher = threading.Thread(
+            target=_run_dispatcher,
+            args=(_senders,),
+            name="notification-dispatcher",
+            daemon=True,
+        )
+        _dispatcher_pid = os.getpid()
+        _dispatcher.start()
+
+
+def get_outbox_stats() -> Dict[str, int]:
+    with _lock:
+        rows = _db().execute(
+            "SELECT status, COUNT(*) AS n FROM outbox GROUP BY status"
+        ).fetchall()
+    stats = {"pending": 0, "delivered": 0, "expired": 0}
+    stats.update({row["status"]: row["n"] for row in rows})
+    return stats
+
+
+Gauge(
+    "notifications",
+    "Evaluation notifications in the outbox by status",
+    ["status"],
+    collect=lambda: {(status,): n for status, n in get_outbox_stats().items()},
+)
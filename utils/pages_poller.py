@@ -0,0 +1,179 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+from .config import PAGES_READY_TIMEOUT, PAGES_POLL_MIN, PAGES_POLL_MAX
+from .github_manager import github_get
+from . import http_transport
+
+# Typical build time before we have observed any; refined from real builds
+_DEFAULT_BUILD_SECONDS = 40.0
+_SMOOTHING = 0.3
+
+_lock = threading.Lock()
+_expected_build = _DEFAULT_BUILD_SECONDS
+_stats = {
+    "waits": 0,
+    "live": 0,
+    "timeouts": 0,
+    "errored": 0,
+    "superseded": 0,
+    "build_polls": 0,
+    "site_probes": 0,
+    "total_wait_seconds": 0.0,
+}
+
+
+def _next_delay(elapsed: float, overdue_delay: Optional[float]) -> float:
+    # Sleep through most of the expected build in one go, poll closely around
+    # the expected finish, then back off once the build runs long
+    with _lock:
+        expected = _expected_build
+    if overdue_delay is not None:
+        return min(PAGES_POLL_MAX, overdue_delay * 1.5)
+    remaining = expected - elapsed
+    return max(PAGES_POLL_MIN, min(PAGES_POLL_MAX, remaining / 2))
+
+
+def _observe_build(seconds: float):
+    global _expected_build
+    with _lock:
+        _expected_build += _SMOOTHING * (seconds - _expected_build)
+
+
+def _build_from_response(r) -> Optional[Dict[str, Any]]:
+    with _lock:
+        _stats["build_polls"] += 1
+    if r.status_code == 404:
+        # No build has been queued yet
+        return None
+    if r.status_code != 200:
+        print(f"Pages build status returned {r.status_code}: {r.text}")
+        return None
+    return r.json() or None
+
+
+def _latest_build(owner: str, repo_name: str) -> Optional[Dict[str, Any]]:
+    return _build_from_response(
+        github_get(f"/repos/{owner}/{repo_name}/pages/builds/latest", timeout=10)
+    )
+
+
+def _site_is_live(pages_url: str, commit_sha: str) -> bool:
+    with _lock:
+        _stats["site_probes"] += 1
+    try:
+        # A query string unique to the commit sidesteps a stale CDN copy of the page
+        r = http_transport.get(
+            pages_url, params={"v": commit_sha[:12]}, timeout=10, allow_redirects=True
+        )
+        return r.status_code == 200
+    except requests.exceptions.RequestException as e:
+        print(f"Pages probe failed: {str(e)}")
+        return False
+
+
+def _superseded(owner: str, repo_name: str, branch: str, commit_sha: str) -> bool:
+    # A later round pushed on top of this commit, so Pages will only ever build that one
+    r = github_get(f"/repos/{owner}/{repo_name}/git/ref/heads/{branch}", timeout=10)
+    return r.status_code == 200 and r.json()["object"]["sha"] != commit_sha
+
+
+def pages_gate(
+    owner: str,
+    repo_name: str,
+    commit_sha: str,
+    pages_url: str,
+    timeout: Optional[float] = None,
+    branch: str = "main",
+) -> Optional[Dict[str, Any]]:
+    # Poll state stored with a notification that is held until Pages serves the
+    # commit; the outbox dispatcher advances it with check_pages
+    timeout = PAGES_READY_TIMEOUT if timeout is None else timeout
+    if timeout <= 0:
+        return None
+    now = time.time()
+    with _lock:
+        _stats["waits"] += 1
+    print(f"Holding the notification until GitHub Pages serves {commit_sha[:7]}...")
+    return {
+        "owner": owner,
+        "repo": repo_name,
+        "commit_sha": commit_sha,
+        "branch": branch,
+        "pages_url": pages_url,
+        "started_at": now,
+        "deadline": now + timeout,
+        "built": False,
+        "overdue_delay": None,
+    }
+
+
+def check_pages(gate: Dict[str, Any]) -> Optional[float]:
+    # One readiness poll. Returns the delay before the next one, or None once
+    # waiting is over, with gate["status"] saying why (live, errored or timeout)
+    commit_sha = gate["commit_sha"]
+    elapsed = time.time() - gate["started_at"]
+
+    if not gate["built"]:
+        try:
+            build = _latest_build(gate["owner"], gate["repo"])
+            if (
+                build
+                and build.get("commit") != commit_sha
+                and build.get("status") == "built"
+                and _superseded(gate["owner"], gate["repo"], gate["branch"], commit_sha)
+            ):
+                print(f"Commit {commit_sha[:7]} was superseded on {gate['branch']}, notifying now")
+                return _finish(gate, "superseded")
+        except requests.exceptions.RequestException as e:
+            print(f"Pages build status check failed: {str(e)}")
+            build = None
+        if build and build.get("commit") == commit_sha:
+            if build.get("status") == "built":
+                gate["built"] = True
+                _observe_build(elapsed)
+                print(f"Pages build for {commit_sha[:7]} finished after {elapsed:.1f}s")
+            elif build.get("status") == "errored":
+                error = (build.get("error") or {}).get("message")
+                print(f"Pages build for {commit_sha[:7]} errored: {error}")
+                return _finish(gate, "errored")
+
+    if gate["built"] and _site_is_live(gate["pages_url"], commit_sha):
+        return _finish(gate, "live")
+
+    remaining = gate["deadline"] - time.time()
+    if remaining <= 0:
+        return _finish(gate, "timeout")
+
+    delay = _next_delay(elapsed, gate["overdue_delay"])
+    with _lock:
+        overdue = elapsed >= _expected_build
+    if overdue or gate["built"]:
+        gate["overdue_delay"] = delay
+    # One last look right at the deadline rather than giving up early
+    return min(delay, remaining)
+
+
+def _finish(gate: Dict[str, Any], status: str) -> None:
+    gate["status"] = status
+    seconds = round(time.time() - gate["started_at"], 3)
+    with _lock:
+        _stats[status if status != "timeout" else "timeouts"] += 1
+        _stats["total_wait_seconds"] += seconds
+
+    if status == "live":
+        print(f"Pages site is live at {gate['pages_url']} after {seconds:.1f}s")
+    elif status == "timeout":
+        print(f"Warning: Pages not confirmed live within {seconds:.0f}s, notifying anyway")
+    return None
+
+
+def get_pages_stats() -> Dict[str, Any]:
+    with _lock:
+        stats = dict(_stats)
+        stats["expected_build_seconds"] = round(_expected_build, 1)
+    stats["total_wait_seconds"] = round(stats["total_wait_seconds"], 3)
+    return stats
@@ -0,0 +1,360 @@
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .attachments import attachment_files, decode_attachments
+from .code_generator import generate_app_code, generate_readme
+from .github_manager import (
+    create_or_update_repo,
+    find_repo,
+    get_existing_code,
+    get_or_create_repo,
+)
+from .outbox import enqueue_notification
+from .pages_poller import pages_gate
+from .config import (
+    NOTIFY_DEADLINE,
+    PAGES_READY_TIMEOUT,
+    PAGES_URL_TEMPLATE,
+    PIPELINE_WORKERS,
+)
+from .dag import Step, StepFailed, run_dag
+from .github_cache import request_scope
+from .tracing import start_span
+from .idempotency import idempotency_key, touch_request
+from .job_store import load_checkpoints, save_checkpoint
+from .metrics import (
+    GITHUB_CALLS_PER_JOB,
+    JOB_DURATION,
+    JOBS,
+    STEP_DURATION,
+    job_scope,
+)
+
+
+class PipelineError(RuntimeError):
+    def __init__(self, step: str, message: str):
+        super().__init__(message)
+        self.step = step
+
+
+def _measured(step: Step, **attributes) -> Step:
+    fn = step.fn
+
+    def run(inputs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with start_span(f"step {step.name}", stage=step.label, **attributes):
+                result = fn(inputs)
+            outcome = "ok"
+            return result
+        finally:
+            STEP_DURATION.observe(
+                time.perf_counter() - started,
+                step=step.name,
+                stage=step.label,
+                outcome=outcome,
+            )
+
+    step.fn = run
+    return step
+
+
+def _pages_timeout(data: Dict[str, Any]) -> float:
+    # Leave the outbox at least a minute of its deadline to deliver in
+    received_at = data.get("received_at") or time.time()
+    budget = received_at + NOTIFY_DEADLINE - 60 - time.time()
+    return max(0.0, min(PAGES_READY_TIMEOUT, budget))
+
+
+def _queue_notification(data: Dict[str, Any], repo_info: Dict[str, Any]) -> Dict[str, Any]:
+    eval_data = _eval_data(data, repo_info)
+    # The outbox holds the notification until Pages serves the commit, so neither
+    # the response nor a job worker waits on the build
+    gate = pages_gate(
+        repo_info["owner"],
+        data["task"],
+        repo_info["commit_sha"],
+        repo_info["pages_url"],
+        timeout=_pages_timeout(data),
+    )
+    print("Queueing evaluation API notification...")
+    notification_id = enqueue_notification(
+        data["evaluation_url"], eval_data, received_at=data.get("received_at"), pages=gate
+    )
+    return {
+        "eval_data": eval_data,
+        "notification_id": notification_id,
+        "status": "waiting_for_pages" if gate else "queued",
+    }
+
+
+def _eval_data(data: Dict[str, Any], repo_info: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "email": data["email"],
+        "task": data["task"],
+        "round": data["round"],
+        "nonce": data["nonce"],
+        "repo_url": repo_info["repo_url"],
+        "commit_sha": repo_info["commit_sha"],
+        "pages_url": repo_info["pages_url"],
+    }
+
+
+def _checkpoints(
+    data: Dict[str, Any],
+) -> Tuple[Dict[str, Any], Callable[[Step, Any], None]]:
+    # Outputs of steps a previous attempt at this (task, round, nonce) already
+    # finished, so a retry after a crash picks up where it stopped
+    job_key = idempotency_key(data)
+    try:
+        completed = load_checkpoints(job_key)
+    except Exception as e:
+        print(f"Warning: Could not load checkpoints: {str(e)}")
+        completed = {}
+    if completed:
+        print(f"Resuming with completed steps: {', '.join(sorted(completed))}")
+
+    def on_complete(step, output):
+        # The in-flight claim goes stale IDEMPOTENCY_STALE_AFTER seconds after the
+        # last finished step, not after the claim, so only a single step has to fit
+        try:
+            touch_request(data)
+        except Exception as e:
+            print(f"Warning: Could not refresh idempotency claim: {str(e)}")
+        # A None output is a step that gave up (README generation failing soft);
+        # leave it out so a resumed run tries it again
+        if not step.checkpoint or output is None:
+            return
+        try:
+            save_checkpoint(job_key, step.name, output)
+        except Exception as e:
+            print(f"Warning: Could not checkpoint step '{step.name}': {str(e)}")
+
+    return completed, on_complete
+
+
+@contextmanager
+def _job(data: Dict[str, Any], completed: Dict[str, Any]):
+    started = time.perf_counter()
+    outcome = "failed"
+    with job_scope() as counts, start_span(
+        "pipeline",
+        task=data["task"],
+        round=data["round"],
+        nonce=data["nonce"],
+        **{
+            "attachments.count": len(data.get("attachments", [])),
+            "resumed.steps": len(completed),
+        },
+    ) as root:
+        try:
+            with request_scope():
+                yield root
+            outcome = "completed"
+        except StepFailed as e:
+            raise PipelineError(e.step.label, str(e)) from e.cause
+        finally:
+            JOBS.inc(outcome=outcome)
+            JOB_DURATION.observe(time.perf_counter() - started, outcome=outcome)
+            GITHUB_CALLS_PER_JOB.observe(counts.get("github_calls", 0))
+            root.set_attributes(**{"github.calls": counts.get("github_calls", 0)})
+
+
+def _response(
+    results: Dict[str, Any],
+    timings: Dict[str, float],
+    trace_id: Optional[str],
+    completed: Dict[str, Any],
+) -> Dict[str, Any]:
+    print(
+        "Step timings: "
+        + ", ".join(f"{name}={seconds:.2f}s" for name, seconds in timings.items())
+    )
+
+    notification_id = results["notify"]["notification_id"]
+    response_data = dict(results["notify"]["eval_data"])
+    response_data["timings"] = timings
+    response_data["notification"] = {
+        "id": notification_id,
+        "status": results["notify"].get("status", "queued"),
+    }
+    if trace_id:
+        response_data["trace_id"] = trace_id
+    if completed:
+        response_data["resumed_steps"] = sorted(completed)
+
+    return response_data
+
+
+def _steps(fns: Dict[str, Callable[[Dict[str, Any]], Any]]) -> List[Step]:
+    # Code and README generation are both long LLM calls that only need the
+    # inputs known up front, so they run side by side with the GitHub lookups
+    return [
+        Step("repo", fns["repo"], label="creating/updating repository"),
+        Step(
+            "existing_code",
+            fns["existing_code"],
+            label="fetching existing code",
+            checkpoint=True,
+        ),
+        Step("attachments", fns["attachments"], label="decoding attachments"),
+        Step(
+            "code",
+            fns["code"],
+            ["existing_code", "attachments"],
+            label="generating code",
+            checkpoint=True,
+        ),
+        Step(
+            "readme",
+            fns["readme"],
+            ["repo"],
+            label="updating README",
+            checkpoint=True,
+        ),
+        Step(
+            "deploy",
+            fns["deploy"],
+            ["repo", "attachments", "code", "readme"],
+            label="creating/updating repository",
+            checkpoint=True,
+        ),
+        Step(
+            "notify",
+            fns["notify"],
+            ["deploy"],
+            label="notifying evaluation API",
+            checkpoint=True,
+        ),
+    ]
+
+
+def run_pipeline(data: Dict[str, Any]) -> Dict[str, Any]:
+    email = data["email"]
+    task = data["task"]
+    round_num = data["round"]
+    brief = data["brief"]
+    checks = data["checks"]
+    attachments = data.get("attachments", [])
+
+    print(f"Processing request for {email}, task: {task}, round: {round_num}")
+
+    def lookup_repo(_):
+        return find_repo(task)
+
+    def fetch_existing_code(_):
+        if round_num <= 1:
+            return ""
+        try:
+            existing_code = get_existing_code(task)
+            if existing_code:
+                print(f"Successfully fetched existing code from Round {round_num - 1}")
+            else:
+                print(
+                    f"No existing code found (this is OK for first-time Round {round_num})"
+                )
+            return existing_code or ""
+        except Exception as e:
+            print(f"Warning: Could not fetch existing code: {str(e)}")
+            print("Continuing without existing code (generating fresh)...")
+            return ""
+
+    def load_attachments(_):
+        return decode_attachments(attachments)
+
+    def generate_code(inputs):
+        print("Generating app code with LLM...")
+        try:
+            return generate_app_code(
+                brief,
+                checks,
+                inputs["attachments"],
+                inputs["existing_code"],
+                round_num,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Code generation failed: {str(e)}")
+
+    def generate_readme_content(inputs):
+        user, repo = inputs["repo"]
+        repo_url = repo.html_url if repo else f"https://github.com/{user.login}/{task}"
+        pages_url = PAGES_URL_TEMPLATE.format(owner=user.login, repo=task)
+        print("Generating README...")
+        try:
+            return generate_readme(task, brief, repo_url, pages_url)
+        except Exception as e:
+            print(f"Warning: README generation failed: {str(e)}")
+            return None
+
+    def deploy(inputs):
+        user, repo = inputs["repo"]
+        print("Deploying files in a single commit...")
+        try:
+            repo, owner = get_or_create_repo(task, round_num, user=user, repo=repo)
+            # Generated files win over an attachment that happens to share a name
+            files = dict(attachment_files(inputs["attachments"]), **inputs["code"])
+            repo_info = create_or_update_repo(
+                task,
+                files,
+                round_num,
+                readme_content=inputs["readme"],
+                repo=repo,
+                owner=owner,
+            )
+            return {
+                "owner": owner,
+                "repo_url": repo_info["repo_url"],
+                "commit_sha": repo_info["commit_sha"],
+                "pages_url": repo_info["pages_url"],
+            }
+        except Exception as e:
+            raise RuntimeError(f"Repository operation failed: {str(e)}")
+
+    def notify(inputs):
+        return _queue_notification(data, inputs["deploy"])
+
+    steps = _steps(
+        {
+            "repo": lookup_repo,
+            "existing_code": fetch_existing_code,
+            "attachments": load_attachments,
+            "code": generate_code,
+            "readme": generate_readme_content,
+            "deploy": deploy,
+            "notify": notify,
+        }
+    )
+
+    completed, on_complete = _checkpoints(data)
+    with _job(data, completed) as root:
+        results, timings = run_dag(
+            [_measured(step, task=task, round=round_num) for step in steps],
+            max_workers=PIPELINE_WORKERS,
+            completed=completed,
+            on_complete=on_complete,
+        )
+
+    return _response(results, timings, root.trace_id, completed)
+
+
+def format_pipeline_error(error: Exception, data: Dict[str, Any]) -> Dict[str, Any]:
+    step = getattr(error, "step", "initialization")
+    error_message = str(error)
+    if step != "initialization":
+        error_message = f"Failed at step '{step}': {error_message}"
+
+    error_response = {"status": "error", "message": error_message}
+
+    if data and all(k in data for k in ["email", "task", "round", "nonce"]):
+        error_response.update(
+            {
+                "email": data["email"],
+                "task": data["task"],
+                "round": data["round"],
+                "nonce": data["nonce"],
+            }
+        )
+
+    return error_response
@@ -0,0 +1,144 @@
+import asyncio
+import time
+from typing import Any, Dict
+
+from . import github_async
+from .attachments import attachment_files, decode_attachments
+from .code_generator import generate_app_code_async, generate_readme_async
+from .config import PAGES_URL_TEMPLATE
+from .dag import Step, run_dag_async
+from .metrics import STEP_DURATION
+from .pipeline import _checkpoints, _job, _queue_notification, _response, _steps
+from .tracing import start_span
+
+
+def _measured_async(step: Step, **attributes) -> Step:
+    fn = step.fn
+
+    async def run(inputs):
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            with start_span(f"step {step.name}", stage=step.label, **attributes):
+                result = await fn(inputs)
+            outcome = "ok"
+            return result
+        finally:
+            STEP_DURATION.observe(
+                time.perf_counter() - started,
+                step=step.name,
+                stage=step.label,
+                outcome=outcome,
+            )
+
+    step.fn = run
+    return step
+
+
+async def run_pipeline_async(data: Dict[str, Any]) -> Dict[str, Any]:
+    email = data["email"]
+    task = data["task"]
+    round_num = data["round"]
+    brief = data["brief"]
+    checks = data["checks"]
+    attachments = data.get("attachments", [])
+
+    print(f"Processing request for {email}, task: {task}, round: {round_num}")
+
+    async def lookup_repo(_):
+        return await github_async.find_repo(task)
+
+    async def fetch_existing_code(_):
+        if round_num <= 1:
+            return ""
+        try:
+            existing_code = await github_async.get_existing_code(task)
+            if existing_code:
+                print(f"Successfully fetched existing code from Round {round_num - 1}")
+            else:
+                print(
+                    f"No existing code found (this is OK for first-time Round {round_num})"
+                )
+            return existing_code or ""
+        except Exception as e:
+            print(f"Warning: Could not fetch existing code: {str(e)}")
+            print("Continuing without existing code (generating fresh)...")
+            return ""
+
+    async def load_attachments(_):
+        return await asyncio.to_thread(decode_attachments, attachments)
+
+    async def generate_code(inputs):
+        print("Generating app code with LLM...")
+        try:
+            return await generate_app_code_async(
+                brief,
+                checks,
+                inputs["attachments"],
+                inputs["existing_code"],
+                round_num,
+            )
+        except Exception as e:
+            raise RuntimeError(f"Code generation failed: {str(e)}")
+
+    async def generate_readme_content(inputs):
+        owner, repo = inputs["repo"]
+        repo_url = repo["html_url"] if repo else f"https://github.com/{owner}/{task}"
+        pages_url = PAGES_URL_TEMPLATE.format(owner=owner, repo=task)
+        print("Generating README...")
+        try:
+            return await generate_readme_async(task, brief, repo_url, pages_url)
+        except Exception as e:
+            print(f"Warning: README generation failed: {str(e)}")
+            return None
+
+    async def deploy(inputs):
+        owner, repo = inputs["repo"]
+        print("Deploying files in a single commit...")
+        try:
+            repo, owner = await github_async.get_or_create_repo(
+                task, round_num, owner=owner, repo=repo
+            )
+            # Generated files win over an attachment that happens to share a name
+            files = dict(attachment_files(inputs["attachments"]), **inputs["code"])
+            repo_info = await github_async.create_or_update_repo(
+                task,
+                files,
+                round_num,
+                readme_content=inputs["readme"],
+                repo=repo,
+                owner=owner,
+            )
+            return {
+                "owner": owner,
+                "repo_url": repo_info["repo_url"],
+                "commit_sha": repo_info["commit_sha"],
+                "pages_url": repo_info["pages_url"],
+            }
+        except Exception as e:
+            raise RuntimeError(f"Repository operation failed: {str(e)}")
+
+    async def notify(inputs):
+        return await asyncio.to_thread(_queue_notification, data, inputs["deploy"])
+
+    steps = _steps(
+        {
+            "repo": lookup_repo,
+            "existing_code": fetch_existing_code,
+            "attachments": load_attachments,
+            "code": generate_code,
+            "readme": generate_readme_content,
+            "deploy": deploy,
+            "notify": notify,
+        }
+    )
+
+    completed, on_complete = await asyncio.to_thread(_checkpoints, data)
+    with _job(data, completed) as root:
+        results, timings = await run_dag_async(
+            [_measured_async(step, task=task, round=round_num) for step in steps],
+            completed=completed,
+            on_complete=on_complete,
+        )
+
+    return _response(results, timings, root.trace_id, completed)
@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import threading
+
+from .config import STATE_DIR
+
+# One connection per thread and database: sqlite connections must not interleave
+# transactions from different threads
+_local = threading.local()
+
+
+def state_path(name: str) -> str:
+    os.makedirs(STATE_DIR, exist_ok=True)
+    return os.path.join(STATE_DIR, name)
+
+
+def reset_connections():
+    # A forked worker must not share the parent's sqlite handles; drop them unclosed
+    # so the parent's copies are left alone
+    global _local
+    _local = threading.local()
+
+
+def get_connection(name: str) -> sqlite3.Connection:
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(name)
+    if conn is None:
+        conn = sqlite3.connect(state_path(name), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        # WAL lets several threads and worker processes read while one writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        connections[name] = conn
+    return conn
@@ -0,0 +1,31 @@
+from typing import Any, Dict
+
+from .code_patch import get_revision_stats
+from .deploy_mirror import get_mirror_stats
+from .etag_cache import get_etag_stats
+from .github_cache import get_github_cache_stats
+from .github_scheduler import get_scheduler_stats
+from .http_transport import get_transport_stats
+from .job_queue import get_queue_stats
+from .llm_cache import get_cache_stats
+from .llm_stream import get_stream_stats
+from .model_router import get_routing_stats
+from .outbox import get_outbox_stats
+from .pages_poller import get_pages_stats
+
+
+def collect_stats() -> Dict[str, Any]:
+    return {
+        "jobs": get_queue_stats(),
+        "llm_cache": get_cache_stats(),
+        "llm_stream": get_stream_stats(),
+        "llm_routing": get_routing_stats(),
+        "llm_revisions": get_revision_stats(),
+        "http": get_transport_stats(),
+        "github_cache": get_github_cache_stats(),
+        "etag_cache": get_etag_stats(),
+        "deploy_mirror": get_mirror_stats(),
+        "github_scheduler": get_scheduler_stats(),
+        "notifications": get_outbox_stats(),
+        "pages": get_pages_stats(),
+    }
@@ -0,0 +1,194 @@
+import contextvars
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from typing import Any, Dict, List, Optional
+
+from .config import TRACING_ENABLED, TRACE_FILE, TRACE_MAX_BYTES, TRACE_BACKUPS
+
+SERVICE_NAME = "llm-code-deployment"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+_STATUS_OK = 1
+_STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "current_span", default=None
+)
+_lock = threading.Lock()
+# Finished spans wait here until their trace's root span ends
+_pending: Dict[str, List[Dict[str, Any]]] = {}
+_logger: Optional[logging.Logger] = None
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        # OTLP JSON encodes 64-bit integers as strings
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [
+        {"key": key, "value": _otlp_value(value)}
+        for key, value in attributes.items()
+        if value is not None
+    ]
+
+
+class Span:
+    def __init__(self, name: str, parent: Optional["Span"], kind: int, attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent.span_id if parent else None
+        self.kind = kind
+        self.attributes = dict(attributes)
+        self.events: List[Dict[str, Any]] = []
+        self.status_code = _STATUS_OK
+        self.status_message = ""
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_exception(self, error: BaseException):
+        self.status_code = _STATUS_ERROR
+        self.status_message = str(error)
+        self.events.append(
+            {
+                "timeUnixNano": str(time.time_ns()),
+                "name": "exception",
+                "attributes": _otlp_attributes(
+                    {"exception.type": type(error).__name__, "exception.message": str(error)}
+                ),
+            }
+        )
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status_code},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            span["status"]["message"] = self.status_message
+        if self.events:
+            span["events"] = self.events
+        return span
+
+
+class _NoopSpan:
+    trace_id = None
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _get_logger() -> logging.Logger:
+    global _logger
+    if _logger is None:
+        os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+        handler = RotatingFileHandler(
+            TRACE_FILE, maxBytes=TRACE_MAX_BYTES, backupCount=TRACE_BACKUPS, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger = logging.getLogger("llm_deploy.traces")
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+def _export(spans: List[Dict[str, Any]]):
+    # One OTLP ExportTraceServiceRequest per line, as the collector's file exporter writes
+    payload = {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": _otlp_attributes(
+                        {"service.name": SERVICE_NAME, "process.pid": os.getpid()}
+                    )
+                },
+                "scopeSpans": [{"scope": {"name": __name__}, "spans": spans}],
+            }
+        ]
+    }
+    try:
+        _get_logger().info(json.dumps(payload, separators=(",", ":")))
+    except Exception as e:
+        print(f"Warning: Could not write trace: {str(e)}")
+
+
+def _finish(span: Span):
+    span.end_ns = time.time_ns()
+    finished = span.to_otlp()
+    with _lock:
+        if span.parent_span_id is None:
+            spans = _pending.pop(span.trace_id, [])
+            spans.append(finished)
+        elif span.trace_id in _pending:
+            _pending[span.trace_id].append(finished)
+            return
+        else:
+            # Straggler that outlived its root (e.g. a cancelled sibling step)
+            spans = [finished]
+    _export(spans)
+
+
+@contextmanager
+def start_span(name: str, kind: int = KIND_INTERNAL, **attributes):
+    if not TRACING_ENABLED:
+        yield _NOOP
+        return
+
+    parent = _current_span.get()
+    span = Span(name, parent, kind, attributes)
+    if parent is None:
+        with _lock:
+            _pending[span.trace_id] = []
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(span)
+
+
+def current_span():
+    return _current_span.get() or _NOOP